@@ -0,0 +1,119 @@
+import os
+import sys
+import math
+import time
+import numpy as np
+from scipy.spatial.distance import euclidean
+from fastdtw import fastdtw
+
+import metrics
+from metrics import dtw
+import vla_metric
+import vln_metric
+
+# nDTW实现对比：原fastdtw实现、精确DTW逐个episode计算（metrics/dtw.py）、精确DTW批量计算（metrics.ndtw）
+# 用法: python dtw_benchmark.py vla|vln [trajectories_dir]
+# 默认使用对应评测脚本的TRAJECTORIES_DIR（完整测试集的评测结果）。
+# vla为位置和航向加权的nDTW（预测轨迹取评测区间，不做停止截断），vln只使用位置。
+
+
+def scalar_angle_difference(a, b):
+    """原实现的角度差"""
+    diff = abs(a - b)
+    return min(diff, 2 * math.pi - diff)
+
+
+def fastdtw_ndtw(seq_a, seq_b, alpha, is_angle=False):
+    """原实现：fastdtw + scipy euclidean / angle_difference回调，逐点Python循环"""
+    if len(seq_a) == 0 or len(seq_b) == 0:
+        return 0.0, 0.0
+    arr_a = np.array(seq_a).reshape(-1, 1) if is_angle else np.array(seq_a)
+    arr_b = np.array(seq_b).reshape(-1, 1) if is_angle else np.array(seq_b)
+    dist_func = scalar_angle_difference if is_angle else euclidean
+    distance, _ = fastdtw(arr_a, arr_b, dist=dist_func)
+    if is_angle:
+        L = sum(scalar_angle_difference(seq_b[i], seq_b[i - 1]) for i in range(1, len(seq_b)))
+    else:
+        L = sum(euclidean(seq_b[i], seq_b[i - 1]) for i in range(1, len(seq_b)))
+    L = max(L, 1e-5)
+    return math.exp(-distance / (alpha * L)), L
+
+
+def weighted_ndtw(calculate_ndtw, pred, gt, thresholds, use_yaw):
+    """逐个episode计算nDTW，use_yaw时位置和航向按参考路径长度加权"""
+    ndtw_pos, L_pos = calculate_ndtw(pred[:, :3].tolist(), gt[:, :3].tolist(), thresholds.alpha)
+    if not use_yaw:
+        return ndtw_pos
+    ndtw_ang, L_ang = calculate_ndtw(pred[:, 3].tolist(), gt[:, 3].tolist(), thresholds.alpha, is_angle=True)
+    L_pos = L_pos / thresholds.position_scale
+    if L_pos + L_ang > 0:
+        return (L_pos * ndtw_pos + L_ang * ndtw_ang) / (L_pos + L_ang)
+    return 0.5 * ndtw_pos + 0.5 * ndtw_ang
+
+
+def load_vla_episode(json_path):
+    """vla的评测区间，不做停止截断"""
+    episode = vla_metric.load_episode(json_path)
+    if episode is None:
+        return None
+    episode_key, pred, gt = episode
+    return episode_key, pred[vla_metric.PRED_START : vla_metric.PRED_END], gt
+
+
+def load_episodes(name, trajectories_dir):
+    load = vln_metric.load_episode if name == "vln" else load_vla_episode
+    episodes = []
+    for filename in sorted(os.listdir(trajectories_dir)):
+        if not filename.endswith(".json") or filename == "final_results.json":
+            continue
+        try:
+            episode = load(os.path.join(trajectories_dir, filename))
+        except Exception as e:
+            print(f"Skipping {filename}: {e}")
+            continue
+        if episode is not None and len(episode[1]) and len(episode[2]):
+            episodes.append(episode)
+    return episodes
+
+
+def main(name, trajectories_dir=None):
+    module = {"vla": vla_metric, "vln": vln_metric}[name]
+    thresholds = module.THRESHOLDS
+    use_yaw = name == "vla"
+    trajectories_dir = trajectories_dir or module.TRAJECTORIES_DIR
+    episodes = load_episodes(name, trajectories_dir)
+    print(f"{len(episodes)} episodes in {trajectories_dir}")
+    if not episodes:
+        return
+
+    timings = {}
+    values = {}
+    for impl, calculate_ndtw in [("fastdtw", fastdtw_ndtw), ("exact", dtw.calculate_ndtw)]:
+        start = time.perf_counter()
+        values[impl] = np.array([
+            weighted_ndtw(calculate_ndtw, pred, gt, thresholds, use_yaw) for _, pred, gt in episodes
+        ])
+        timings[impl] = time.perf_counter() - start
+
+    # 批量计算包含补齐的耗时
+    start = time.perf_counter()
+    _, pred_seqs, gt_seqs = zip(*episodes)
+    pred, pred_len = metrics.pad(pred_seqs)
+    gt, gt_len = metrics.pad(gt_seqs)
+    values["batched"] = metrics.ndtw(pred, pred_len, gt, gt_len, thresholds, use_yaw=use_yaw)
+    timings["batched"] = time.perf_counter() - start
+
+    print(f"\n=== {name} nDTW ({len(episodes)} episodes) ===")
+    print(f"{'':<10} {'nDTW time':>10} {'speedup':>8} {'avg nDTW':>9}")
+    for impl, seconds in timings.items():
+        speedup = timings["fastdtw"] / max(seconds, 1e-9)
+        print(f"{impl:<10} {seconds:>9.2f}s {speedup:>7.1f}x {values[impl].mean():>9.4f}")
+    # fastdtw只是近似，规整路径不一定最优，nDTW偏低
+    diff = values["exact"] - values["fastdtw"]
+    print(f"nDTW exact - fastdtw: mean {diff.mean():.5f}, max {diff.max():.5f}, "
+          f"{np.mean(np.abs(diff) > 1e-9) * 100:.1f}% of episodes differ")
+    print(f"nDTW batched - exact: max abs {np.abs(values['batched'] - values['exact']).max():.2e}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,149 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import functools
+from multiprocessing import Pool
+import numpy as np
+
+# GT索引：所有posture序列的列式存储 + vla_ins的source区间表
+# 只需构建一次，之后各评测进程以内存映射方式加载，不再逐个解析JSON。
+#   postures.npy   (N, 4)   所有轨迹的 [x, y, z, yaw(弧度)] 依次拼接
+#   offsets.npy    (K + 1,) 第k条轨迹为 postures[offsets[k]:offsets[k + 1]]
+#   traj_keys.npy  (K,)     "scene/env/traj"
+#   ins_keys.npy   (M,)     "scene/env/traj/vla_file"
+#   ins_spans.npy  (M, 3)   [轨迹编号, source[0] - 1, source[1]]，即该轨迹内的切片区间
+
+POSTURE_DIR = "without_screenshot"
+VLA_INS_DIR = "vla_ins"
+# 索引缓存目录（不写入数据集目录），可用环境变量 VLA_GT_INDEX_CACHE 指定
+CACHE_DIR = os.environ.get("VLA_GT_INDEX_CACHE", os.path.expanduser("~/.cache/eval_metric/gt_index"))
+
+
+def load_posture(posture_path):
+    """读取posture.json，返回 (n, 4) 数组，yaw转换为弧度"""
+    with open(posture_path, "r") as f:
+        posture = np.array(json.load(f), dtype=np.float64).reshape(-1, 4)
+    posture[:, 3] = posture[:, 3] * np.pi / 180.0
+    return posture
+
+
+def load_source(vla_ins_path):
+    """读取vla_ins文件中的source（1-based，包含终点）"""
+    with open(vla_ins_path, "r", encoding="gbk") as f:
+        return json.load(f)["source"]
+
+
+def _find_files(root, match):
+    """root下所有满足条件的文件，返回相对路径（以/分隔）"""
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if match(filename):
+                paths.append(os.path.relpath(os.path.join(dirpath, filename), root).replace(os.sep, "/"))
+    return sorted(paths)
+
+
+def _dataset_files(dataset_root):
+    """数据集中的posture.json和vla_ins文件（相对于各自目录的路径）"""
+    posture_files = _find_files(os.path.join(dataset_root, POSTURE_DIR), lambda name: name == "posture.json")
+    ins_files = _find_files(os.path.join(dataset_root, VLA_INS_DIR), lambda name: name.endswith(".json"))
+    return posture_files, ins_files
+
+
+def index_dir_for(dataset_root, cache_dir=CACHE_DIR):
+    """数据集对应的索引目录: cache_dir/<数据集路径的哈希>/<文件列表、大小和mtime的哈希>
+
+    数据集中的文件增删或修改后哈希随之改变，下次加载时自动重建索引。
+    """
+    dataset_root = os.path.abspath(dataset_root)
+    fingerprint = hashlib.sha256()
+    for subdir, files in zip((POSTURE_DIR, VLA_INS_DIR), _dataset_files(dataset_root)):
+        for path in files:
+            stat = os.stat(os.path.join(dataset_root, subdir, path))
+            fingerprint.update(f"{subdir}/{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    dataset_key = hashlib.sha256(dataset_root.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, dataset_key, fingerprint.hexdigest()[:16])
+
+
+def build(dataset_root, index_dir, num_workers=None):
+    """解析数据集中的所有posture.json和vla_ins文件，写入index_dir"""
+    posture_root = os.path.join(dataset_root, POSTURE_DIR)
+    vla_ins_root = os.path.join(dataset_root, VLA_INS_DIR)
+    posture_files, ins_files = _dataset_files(dataset_root)
+    print(f"Building GT index: {len(posture_files)} posture files, {len(ins_files)} vla_ins files")
+
+    with Pool(num_workers) as pool:
+        postures = pool.map(load_posture, [os.path.join(posture_root, p) for p in posture_files], chunksize=16)
+        sources = pool.map(load_source, [os.path.join(vla_ins_root, p) for p in ins_files], chunksize=64)
+
+    traj_keys = [os.path.dirname(p) for p in posture_files]
+    traj_ids = {key: i for i, key in enumerate(traj_keys)}
+    ins_keys = []
+    ins_spans = []
+    for ins_file, source in zip(ins_files, sources):
+        traj_key = os.path.dirname(ins_file)
+        if traj_key not in traj_ids:
+            print(f"Warning: no posture.json for {ins_file}")
+            continue
+        ins_keys.append(ins_file)
+        ins_spans.append([traj_ids[traj_key], source[0] - 1, source[1]])
+
+    # 先写入临时目录，完成后再替换，避免并发读到不完整的索引
+    tmp_dir = index_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, "postures.npy"), np.concatenate(postures or [np.zeros((0, 4))]))
+    np.save(os.path.join(tmp_dir, "offsets.npy"), np.cumsum([0] + [len(p) for p in postures], dtype=np.int64))
+    np.save(os.path.join(tmp_dir, "traj_keys.npy"), np.array(traj_keys, dtype=str))
+    np.save(os.path.join(tmp_dir, "ins_keys.npy"), np.array(ins_keys, dtype=str))
+    np.save(os.path.join(tmp_dir, "ins_spans.npy"), np.array(ins_spans, dtype=np.int64).reshape(-1, 3))
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.rename(tmp_dir, index_dir)
+    print(f"GT index saved to {index_dir}")
+
+
+class GTIndex:
+    """内存映射加载的GT索引"""
+
+    def __init__(self, index_dir):
+        def load(name):
+            return np.load(os.path.join(index_dir, name), mmap_mode="r")
+
+        self.postures = load("postures.npy")
+        self.offsets = load("offsets.npy")
+        self.ins_spans = load("ins_spans.npy")
+        self.traj_ids = {key: i for i, key in enumerate(load("traj_keys.npy").tolist())}
+        self.ins_ids = {key: i for i, key in enumerate(load("ins_keys.npy").tolist())}
+
+    def _trajectory(self, i):
+        return self.postures[self.offsets[i] : self.offsets[i + 1]]
+
+    def posture(self, traj_key):
+        """整条轨迹的posture序列 (n, 4)，traj_key为 "scene/env/traj" """
+        return self._trajectory(self.traj_ids[traj_key.strip("/")])
+
+    def instruction(self, ins_key):
+        """vla_ins条目对应的gt序列，ins_key为 "scene/env/traj/vla_file" """
+        traj, start, end = self.ins_spans[self.ins_ids[ins_key.strip("/")]]
+        return self._trajectory(traj)[start:end]
+
+
+@functools.lru_cache(maxsize=None)
+def load_or_build(dataset_root, cache_dir=CACHE_DIR):
+    """加载数据集当前文件对应的GT索引，不存在时先构建，并删除该数据集的旧索引"""
+    index_dir = index_dir_for(dataset_root, cache_dir)
+    if not os.path.exists(index_dir):
+        build(dataset_root, index_dir)
+        dataset_dir = os.path.dirname(index_dir)
+        for name in os.listdir(dataset_dir):
+            if not name.endswith(".tmp") and os.path.join(dataset_dir, name) != index_dir:
+                shutil.rmtree(os.path.join(dataset_dir, name), ignore_errors=True)
+    return GTIndex(index_dir)
+
+
+if __name__ == "__main__":
+    # 预先构建索引
+    # 用法: python gt_index.py <dataset_root> [<cache_dir>]
+    load_or_build(*sys.argv[1:3])
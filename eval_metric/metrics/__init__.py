@@ -0,0 +1,22 @@
+"""评测指标库，离线评测 (eval_metric) 和在线评测 (online_eval) 共用
+
+轨迹和参考轨迹补齐为 (N, T, 4) 数组 [x, y, z, yaw(弧度)] 后批量计算SR、OSR、NE和nDTW，
+阈值统一由Thresholds配置。
+"""
+
+from .batch import last_points
+from .batch import navigation_error
+from .batch import ndtw
+from .batch import oracle_success
+from .batch import pad
+from .batch import path_length
+from .batch import stop_index
+from .batch import success
+from .batch import success_rate
+from .batch import truncate
+from .batch import valid_mask
+from .batch import window
+from .dtw import angle_difference
+from .thresholds import VLA
+from .thresholds import VLN
+from .thresholds import Thresholds
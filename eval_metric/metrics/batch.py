@@ -0,0 +1,152 @@
+import numpy as np
+
+from . import dtw
+
+# 批量评测：所有episode补齐为 (N, T, 4) 数组 [x, y, z, yaw(弧度)]，配合长度数组 (N,) 使用，
+# 每个指标对全部episode做一次数组运算。
+
+
+def pad(sequences, dim=4):
+    """
+    将长度不同的序列补齐为 (N, T, dim) 数组，补齐部分重复最后一个点
+    :param sequences: 序列列表，每个为 (n, dim)
+    :return: (补齐后的数组, 长度数组)
+    """
+    lengths = np.array([len(seq) for seq in sequences], dtype=np.int64)
+    padded = np.zeros((len(sequences), max(lengths.max(initial=0), 1), dim))
+    for i, seq in enumerate(sequences):
+        if lengths[i] > 0:
+            padded[i, : lengths[i]] = seq
+            padded[i, lengths[i] :] = padded[i, lengths[i] - 1]
+    return padded, lengths
+
+
+def valid_mask(lengths, num_steps):
+    """(N, num_steps)，有效点为True"""
+    return np.arange(num_steps) < np.asarray(lengths)[:, None]
+
+
+def last_points(trajectories, lengths):
+    """每条轨迹的最后一个有效点 (N, 4)"""
+    index = np.maximum(np.asarray(lengths) - 1, 0)
+    return trajectories[np.arange(len(trajectories)), index]
+
+
+def window(trajectories, lengths, start, end):
+    """
+    取每条轨迹的 [start, end) 区间，相当于逐条切片 seq[start:end]
+    :return: (N, end - start) 的轨迹和新的长度数组，原长度不足start时长度为0
+    """
+    window_lengths = np.clip(np.asarray(lengths) - start, 0, end - start)
+    # 超出数组长度的部分取最后一个点，与pad的补齐方式一致
+    index = np.minimum(np.arange(start, end), trajectories.shape[1] - 1)
+    return trajectories[:, index], window_lengths
+
+
+def position_distance(a, b):
+    return np.linalg.norm(a[..., :3] - b[..., :3], axis=-1)
+
+
+def yaw_difference(a, b):
+    return dtw.angle_difference(a[..., 3], b[..., 3])
+
+
+def _within(a, b, thresholds):
+    """位置和航向均在成功阈值内"""
+    dist = position_distance(a, b)
+    angle = yaw_difference(a, b)
+    if thresholds.inclusive:
+        return (dist <= thresholds.success_dist) & (angle <= thresholds.success_angle)
+    return (dist < thresholds.success_dist) & (angle < thresholds.success_angle)
+
+
+def stop_index(trajectories, lengths, thresholds):
+    """
+    停止检测：第一个与下一个点的距离和航向变化均小于停止阈值的点
+    :param trajectories: (N, T, 4)
+    :param lengths: 有效长度 (N,)
+    :return: 停止点的索引 (N,)，没有停止时为-1
+    """
+    if trajectories.shape[1] < 2:
+        return np.full(len(trajectories), -1)
+    step_dist = np.linalg.norm(np.diff(trajectories[..., :3], axis=1), axis=-1)
+    step_angle = dtw.angle_difference(trajectories[:, 1:, 3], trajectories[:, :-1, 3])
+    stopped = (
+        (step_dist < thresholds.stop_dist)
+        & (step_angle < thresholds.stop_angle)
+        & valid_mask(np.asarray(lengths) - 1, step_dist.shape[1])
+    )
+    return np.where(stopped.any(axis=1), stopped.argmax(axis=1), -1)
+
+
+def truncate(lengths, stop):
+    """截断到停止点（包含停止点），没有停止时保持原长度"""
+    return np.where(stop >= 0, stop + 1, lengths)
+
+
+def navigation_error(trajectories, lengths, goals):
+    """NE：终点与目标的距离 (N,)"""
+    return position_distance(last_points(trajectories, lengths), goals)
+
+
+def success(trajectories, lengths, goals, thresholds):
+    """SR：终点在成功阈值内 (N,)"""
+    return _within(last_points(trajectories, lengths), goals, thresholds)
+
+
+def oracle_success(trajectories, lengths, goals, thresholds):
+    """OSR：轨迹上任意一点在成功阈值内 (N,)"""
+    within = _within(trajectories, goals[:, None], thresholds)
+    return (within & valid_mask(lengths, trajectories.shape[1])).any(axis=1)
+
+
+def success_rate(successes):
+    """成功标记的平均值，没有episode时为0"""
+    successes = np.asarray(successes, dtype=np.float64)
+    return float(successes.mean()) if successes.size else 0.0
+
+
+def path_length(sequences, lengths, is_angle=False):
+    """补齐序列的路径长度 (N,)，sequences为 (N, T, 3) 或角度 (N, T)"""
+    if is_angle:
+        steps = dtw.angle_difference(sequences[:, 1:], sequences[:, :-1])
+    else:
+        steps = np.linalg.norm(np.diff(sequences, axis=1), axis=-1)
+    return np.where(valid_mask(np.asarray(lengths) - 1, steps.shape[1]), steps, 0.0).sum(axis=1)
+
+
+def _ndtw(pred, pred_lengths, gt, gt_lengths, alpha, is_angle):
+    """单一分量（位置或航向）的nDTW和参考路径长度，与dtw.calculate_ndtw逐个计算的结果一致"""
+    distance = dtw.dtw(dtw.cost_matrix(pred, gt, is_angle=is_angle), pred_lengths, gt_lengths)
+    # 避免除以零
+    length = np.maximum(path_length(gt, gt_lengths, is_angle=is_angle), 1e-5)
+    empty = (pred_lengths == 0) | (gt_lengths == 0)
+    return np.where(empty, 0.0, np.exp(-distance / (alpha * length))), np.where(empty, 0.0, length)
+
+
+def ndtw(pred, pred_lengths, gt, gt_lengths, thresholds, use_yaw=True, chunk_size=256):
+    """
+    nDTW (N,)
+    use_yaw=True时为位置nDTW和航向nDTW按参考路径长度加权（位置长度除以position_scale），否则只用位置
+    按chunk_size分批计算，代价矩阵的内存为 chunk_size * T_pred * T_gt
+    """
+    pred_lengths = np.asarray(pred_lengths)
+    gt_lengths = np.asarray(gt_lengths)
+    values = np.zeros(len(pred))
+    for start in range(0, len(pred), chunk_size):
+        batch = slice(start, start + chunk_size)
+        p, p_len, g, g_len = pred[batch], pred_lengths[batch], gt[batch], gt_lengths[batch]
+        ndtw_pos, length_pos = _ndtw(p[..., :3], p_len, g[..., :3], g_len, thresholds.alpha, is_angle=False)
+        if not use_yaw:
+            values[batch] = ndtw_pos
+            continue
+        ndtw_ang, length_ang = _ndtw(p[..., 3], p_len, g[..., 3], g_len, thresholds.alpha, is_angle=True)
+
+        # 计算权重 (避免除零错误)
+        length_pos = length_pos / thresholds.position_scale
+        total = length_pos + length_ang
+        safe_total = np.where(total > 0, total, 1.0)
+        weight_pos = np.where(total > 0, length_pos / safe_total, 0.5)
+        weight_ang = np.where(total > 0, length_ang / safe_total, 0.5)
+        values[batch] = weight_pos * ndtw_pos + weight_ang * ndtw_ang
+    return values
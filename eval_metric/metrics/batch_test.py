@@ -0,0 +1,129 @@
+import math
+
+import numpy as np
+
+import metrics
+from metrics import dtw
+
+
+def pairwise_stop_index(seq, thresholds):
+    """原实现的逐点停止检测：第一个与下一个点足够接近的点，没有停止时为-1"""
+    for i in range(1, len(seq)):
+        dist = math.dist(seq[i - 1][:3], seq[i][:3])
+        angle = float(dtw.angle_difference(seq[i - 1][3], seq[i][3]))
+        if dist < thresholds.stop_dist and angle < thresholds.stop_angle:
+            return i - 1
+    return -1
+
+
+def random_episodes(rng, num_episodes, max_length):
+    """随机游走的轨迹，步长和航向变化在停止阈值附近，部分episode会停止"""
+    episodes = []
+    for _ in range(num_episodes):
+        length = int(rng.integers(0, max_length + 1))
+        steps = rng.normal(scale=[0.1, 0.1, 0.05, 0.2], size=(length, 4))
+        episodes.append(np.cumsum(steps, axis=0))
+    return episodes
+
+
+def test_pad():
+    padded, lengths = metrics.pad([np.ones((2, 4)), np.zeros((0, 4)), np.arange(12.0).reshape(3, 4)])
+    np.testing.assert_array_equal(lengths, [2, 0, 3])
+    assert padded.shape == (3, 3, 4)
+    # 补齐部分重复最后一个点，空序列为0
+    np.testing.assert_array_equal(padded[0], np.ones((3, 4)))
+    np.testing.assert_array_equal(padded[1], np.zeros((3, 4)))
+    np.testing.assert_array_equal(padded[2], np.arange(12.0).reshape(3, 4))
+
+    padded, lengths = metrics.pad([np.zeros((0, 4))])
+    assert padded.shape == (1, 1, 4)
+    np.testing.assert_array_equal(lengths, [0])
+
+
+def test_window_matches_slicing():
+    rng = np.random.default_rng(0)
+    episodes = [rng.normal(size=(length, 4)) for length in [0, 1, 2, 3, 10, 16, 20]]
+    padded, lengths = metrics.pad(episodes)
+    windowed, window_lengths = metrics.window(padded, lengths, 2, 16)
+    assert windowed.shape == (len(episodes), 14, 4)
+    for i, seq in enumerate(episodes):
+        expected = seq[2:16]
+        assert window_lengths[i] == len(expected)
+        np.testing.assert_array_equal(windowed[i, : len(expected)], expected)
+
+
+def test_stop_index_matches_pairwise_loop():
+    rng = np.random.default_rng(1)
+    episodes = random_episodes(rng, 200, 14)
+    padded, lengths = metrics.pad(episodes)
+    stop = metrics.stop_index(padded, lengths, metrics.VLA)
+    expected = [pairwise_stop_index(seq, metrics.VLA) for seq in episodes]
+    np.testing.assert_array_equal(stop, expected)
+    assert (stop >= 0).any() and (stop < 0).any()
+
+
+def test_stop_index_edge_cases():
+    hover = np.zeros((3, 4))
+    moving = np.cumsum(np.ones((5, 4)), axis=0)
+    padded, lengths = metrics.pad([np.zeros((0, 4)), np.zeros((1, 4)), hover, moving])
+    stop = metrics.stop_index(padded, lengths, metrics.VLA)
+    # 空轨迹和单点轨迹没有相邻点，一直移动的轨迹不会停止；补齐部分不算停止
+    np.testing.assert_array_equal(stop, [-1, -1, 0, -1])
+    np.testing.assert_array_equal(metrics.truncate(lengths, stop), [0, 1, 1, 5])
+
+    # 所有轨迹都不足两个点
+    padded, lengths = metrics.pad([np.zeros((1, 4)), np.zeros((0, 4))])
+    np.testing.assert_array_equal(metrics.stop_index(padded, lengths, metrics.VLA), [-1, -1])
+
+
+def test_success_and_oracle_success():
+    goal = np.array([[0.0, 0.0, 0.0, 0.0]])
+    # 经过目标后离开：终点不成功，途中成功
+    passing = np.array([[2.0, 0.0, 0.0, 0.0], [0.1, 0.0, 0.0, 0.0], [2.0, 0.0, 0.0, 0.0]])
+    padded, lengths = metrics.pad([passing])
+    assert not metrics.success(padded, lengths, goal, metrics.VLA)[0]
+    assert metrics.oracle_success(padded, lengths, goal, metrics.VLA)[0]
+    # 补齐部分不参与OSR
+    assert not metrics.oracle_success(padded, np.array([1]), goal, metrics.VLA)[0]
+
+    # 距离正好等于阈值：inclusive时成功
+    on_threshold = np.array([[metrics.VLA.success_dist, 0.0, 0.0, 0.0]])
+    exclusive = metrics.Thresholds(success_dist=0.5, success_angle=math.pi / 4, alpha=1)
+    inclusive = metrics.Thresholds(success_dist=0.5, success_angle=math.pi / 4, alpha=1, inclusive=True)
+    padded, lengths = metrics.pad([on_threshold])
+    assert not metrics.success(padded, lengths, goal, exclusive)[0]
+    assert metrics.success(padded, lengths, goal, inclusive)[0]
+    assert not metrics.oracle_success(padded, lengths, goal, exclusive)[0]
+    assert metrics.oracle_success(padded, lengths, goal, inclusive)[0]
+
+    assert metrics.success_rate([True, False, True, True]) == 0.75
+    assert metrics.success_rate([]) == 0.0
+
+
+def weighted_ndtw(pred, gt, thresholds):
+    """逐个episode计算的位置+航向加权nDTW"""
+    ndtw_pos, length_pos = dtw.calculate_ndtw(pred[:, :3], gt[:, :3], thresholds.alpha)
+    ndtw_ang, length_ang = dtw.calculate_ndtw(pred[:, 3], gt[:, 3], thresholds.alpha, is_angle=True)
+    length_pos = length_pos / thresholds.position_scale
+    if length_pos + length_ang > 0:
+        return (length_pos * ndtw_pos + length_ang * ndtw_ang) / (length_pos + length_ang)
+    return 0.5 * ndtw_pos + 0.5 * ndtw_ang
+
+
+def test_ndtw_matches_per_episode():
+    rng = np.random.default_rng(2)
+    preds = random_episodes(rng, 50, 14)
+    gts = random_episodes(rng, 50, 30)
+    pred, pred_lengths = metrics.pad(preds)
+    gt, gt_lengths = metrics.pad(gts)
+
+    values = metrics.ndtw(pred, pred_lengths, gt, gt_lengths, metrics.VLA)
+    # 分批计算与一次计算的结果相同
+    np.testing.assert_array_equal(metrics.ndtw(pred, pred_lengths, gt, gt_lengths, metrics.VLA, chunk_size=7), values)
+    for i in range(len(preds)):
+        assert abs(values[i] - weighted_ndtw(preds[i], gts[i], metrics.VLA)) < 1e-12
+
+    values = metrics.ndtw(pred, pred_lengths, gt, gt_lengths, metrics.VLN, use_yaw=False, chunk_size=16)
+    for i in range(len(preds)):
+        expected, _ = dtw.calculate_ndtw(preds[i][:, :3], gts[i][:, :3], metrics.VLN.alpha)
+        assert abs(values[i] - expected) < 1e-12
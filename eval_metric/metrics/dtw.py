@@ -0,0 +1,88 @@
+import math
+import numpy as np
+
+# 精确DTW / nDTW（向量化实现，替代fastdtw）
+# 代价矩阵用NumPy广播一次算出，累积代价矩阵按较短序列逐行递推，
+# 行内的最小值递推化为累加和与np.minimum.accumulate，整行向量化计算。
+# 支持前导batch维度，长度不同的序列补齐后在各自的终点取值。
+
+
+def angle_difference(a, b):
+    """两个角度之间的最小差异（考虑圆周性），支持数组"""
+    return np.abs((np.asarray(a) - np.asarray(b) + np.pi) % (2 * np.pi) - np.pi)
+
+
+def cost_matrix(seq_a, seq_b, is_angle=False):
+    """
+    两个序列之间的逐点代价矩阵
+    :param seq_a: 序列A，形状 (..., n, d)，角度序列为 (..., n)
+    :param seq_b: 序列B，形状 (..., m, d)，角度序列为 (..., m)
+    :param is_angle: 是否为角度序列
+    :return: 代价矩阵 (..., n, m)
+    """
+    arr_a = np.asarray(seq_a, dtype=np.float64)
+    arr_b = np.asarray(seq_b, dtype=np.float64)
+    if is_angle:
+        return angle_difference(arr_a[..., :, None], arr_b[..., None, :])
+    return np.linalg.norm(arr_a[..., :, None, :] - arr_b[..., None, :, :], axis=-1)
+
+
+def dtw(cost, len_a=None, len_b=None):
+    """
+    精确DTW距离（最优规整路径上的代价之和）
+    :param cost: 代价矩阵 (..., n, m)
+    :param len_a: 序列A的有效长度 (...)，默认为n
+    :param len_b: 序列B的有效长度 (...)，默认为m
+    :return: DTW距离 (...)
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.shape[-2] > cost.shape[-1]:
+        # DTW对两个序列对称，按较短的序列逐行递推
+        return dtw(np.swapaxes(cost, -1, -2), len_b, len_a)
+    n, m = cost.shape[-2:]
+    # 累积代价矩阵多一行一列作为边界，acc[i + 1, j + 1]对应cost[i, j]
+    acc = np.full((*cost.shape[:-2], n + 1, m + 1), np.inf)
+    acc[..., 0, 0] = 0.0
+    for i in range(n):
+        row = cost[..., i, :]
+        # 来自上一行（上方、左上方）的候选
+        v = row + np.minimum(acc[..., i, 1:], acc[..., i, :-1])
+        # 行内递推 x[j] = min(v[j], row[j] + x[j - 1]) 的闭式解：
+        # x[j] = C[j] + min_{k <= j}(v[k] - C[k])，C为row的累加和
+        cumsum = np.cumsum(row, axis=-1)
+        acc[..., i + 1, 1:] = cumsum + np.minimum.accumulate(v - cumsum, axis=-1)
+    if len_a is None and len_b is None:
+        return acc[..., n, m]
+    len_a = np.broadcast_to(n if len_a is None else len_a, cost.shape[:-2])
+    len_b = np.broadcast_to(m if len_b is None else len_b, cost.shape[:-2])
+    return np.take_along_axis(
+        acc.reshape(*cost.shape[:-2], -1), (len_a * (m + 1) + len_b)[..., None], axis=-1
+    )[..., 0]
+
+
+def path_length(seq, is_angle=False):
+    """序列相邻点之间的距离之和（路径长度）"""
+    arr = np.asarray(seq, dtype=np.float64)
+    if len(arr) < 2:
+        return 0.0
+    if is_angle:
+        return float(angle_difference(arr[1:], arr[:-1]).sum())
+    return float(np.linalg.norm(np.diff(arr, axis=0), axis=-1).sum())
+
+
+def calculate_ndtw(seq_a, seq_b, alpha, is_angle=False):
+    """
+    计算两个序列之间的精确nDTW
+    :param seq_a: 序列A（预测）
+    :param seq_b: 序列B（参考）
+    :param alpha: nDTW参数
+    :param is_angle: 是否为角度序列
+    :return: (nDTW值, 参考路径长度L)
+    """
+    if len(seq_a) == 0 or len(seq_b) == 0:
+        return 0.0, 0.0
+
+    distance = float(dtw(cost_matrix(seq_a, seq_b, is_angle=is_angle)))
+    # 避免除以零
+    L = max(path_length(seq_b, is_angle=is_angle), 1e-5)
+    return math.exp(-distance / (alpha * L)), L
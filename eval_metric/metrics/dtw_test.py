@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+
+from metrics import dtw
+
+
+def brute_force_dtw(cost):
+    """O(nm)逐格递推的DTW，作为向量化实现的参照"""
+    n, m = cost.shape
+    acc = np.full((n + 1, m + 1), np.inf)
+    acc[0, 0] = 0.0
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            acc[i, j] = cost[i - 1, j - 1] + min(acc[i - 1, j], acc[i, j - 1], acc[i - 1, j - 1])
+    return acc[n, m]
+
+
+def test_dtw_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for n, m in [(1, 1), (1, 7), (7, 1), (5, 12), (12, 5), (20, 20)]:
+        cost = dtw.cost_matrix(rng.normal(size=(n, 3)), rng.normal(size=(m, 3)))
+        assert abs(dtw.dtw(cost) - brute_force_dtw(cost)) < 1e-12
+
+
+def test_dtw_batch_lengths():
+    # 补齐后的batch在各自的有效长度处取值
+    rng = np.random.default_rng(1)
+    len_a = np.array([1, 4, 9, 6])
+    len_b = np.array([3, 10, 2, 6])
+    cost = dtw.cost_matrix(rng.normal(size=(4, 9, 3)), rng.normal(size=(4, 10, 3)))
+    result = dtw.dtw(cost, len_a, len_b)
+    for i in range(4):
+        assert abs(result[i] - brute_force_dtw(cost[i, : len_a[i], : len_b[i]])) < 1e-12
+
+
+def test_cost_matrix():
+    seq_a = np.array([[0.0, 0.0, 0.0], [1.0, 2.0, 2.0]])
+    seq_b = np.array([[0.0, 3.0, 4.0]])
+    np.testing.assert_allclose(dtw.cost_matrix(seq_a, seq_b), [[5.0], [math.sqrt(6.0)]])
+    np.testing.assert_allclose(dtw.cost_matrix([0.1, 3.0], [2 * math.pi - 0.1], is_angle=True), [[0.2], [3.1]])
+
+
+def test_angle_difference_wraps_around():
+    # 跨过0/2π的两个角度之间的差是较短的那段圆弧
+    assert math.isclose(dtw.angle_difference(0.1, 2 * math.pi - 0.1), 0.2)
+    assert math.isclose(dtw.angle_difference(2 * math.pi - 0.1, 0.1), 0.2)
+    # 相差超过2π（多转了几圈）
+    assert math.isclose(dtw.angle_difference(0.1, 0.4 + 4 * math.pi), 0.3)
+    assert math.isclose(dtw.angle_difference(-3 * math.pi, 0.0), math.pi)
+    np.testing.assert_allclose(
+        dtw.angle_difference([0.0, math.pi / 2], [-math.pi / 2, 3 * math.pi]), [math.pi / 2, math.pi / 2]
+    )
+
+
+def test_calculate_ndtw():
+    seq = [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0, 1.0, 0.0]]
+    assert dtw.calculate_ndtw(seq, seq, alpha=3.0) == (1.0, 2.0)
+    assert dtw.calculate_ndtw([], seq, alpha=3.0) == (0.0, 0.0)
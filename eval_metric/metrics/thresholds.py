@@ -0,0 +1,26 @@
+import math
+import dataclasses
+
+
+@dataclasses.dataclass(frozen=True)
+class Thresholds:
+    """评测阈值和nDTW参数，所有评测脚本共用"""
+
+    # 成功判定：终点与目标的距离 (米) 和航向差 (弧度)
+    success_dist: float
+    success_angle: float
+    # nDTW参数
+    alpha: float
+    # 停止判定：相邻两点的距离 (米) 和航向变化 (弧度) 均小于阈值时视为停止
+    stop_dist: float = 0.15
+    stop_angle: float = math.pi / 12
+    # True时距离和航向差等于阈值也算成功
+    inclusive: bool = False
+    # 位置+航向加权nDTW中，位置参考路径长度的缩放系数
+    position_scale: float = 2.2
+
+
+# vla_metric
+VLA = Thresholds(success_dist=0.5, success_angle=math.pi / 4, alpha=1)
+# vln_metric
+VLN = Thresholds(success_dist=2, success_angle=math.pi * 2, alpha=10, inclusive=True)
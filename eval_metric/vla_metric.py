@@ -1,18 +1,21 @@
 import os
 import json
-import math
+from multiprocessing import Pool
 import numpy as np
-from scipy.spatial.distance import euclidean
-from fastdtw import fastdtw  # 需要安装fastdtw库：pip install fastdtw
 
-# 常量定义
-THRESHOLD_STOP_DIST = 0.15
-THRESHOLD_STOP_ANGLE = math.pi / 12
-THRESHOLD_SUCCESS_DIST = 0.5
-THRESHOLD_SUCCESS_ANGLE = math.pi / 4
-ALPHA = 1  # NDTW参数
+import gt_index
+import metrics
+
+# 评测阈值（停止判定、成功判定和nDTW参数）
+THRESHOLDS = metrics.VLA
+# 预测轨迹的评测区间 trajectory[PRED_START:PRED_END]
+PRED_START = 2
+PRED_END = 16
 
 DATASET_ROOT = "/home/testunot/datasets/habitat/IndoorUAV-VLA"
+# GT索引（posture序列和vla_ins区间）的缓存目录，不存在或数据集文件变化时自动构建
+GT_INDEX_DIR = gt_index.CACHE_DIR
+NUM_WORKERS = os.cpu_count()
 SHARED_FOLDER = (
     "/home/testunot/IndoorUAV-Agent/online_eval/vla_eval/shared_folder"
 )
@@ -20,52 +23,8 @@ TRAJECTORIES_DIR = os.path.join(SHARED_FOLDER, "trajectories")
 OUTPUT_FILE = os.path.join(SHARED_FOLDER, "evaluation_openvla_results.json")
 
 
-def angle_difference(a, b):
-    """计算两个角度之间的最小差异（考虑圆周性）"""
-    diff = abs(a - b)
-    return min(diff, 2 * math.pi - diff)
-
-
-def calculate_ndtw(seq_a, seq_b, is_angle=False):
-    """
-    计算两个序列之间的NDTW
-    :param seq_a: 序列A
-    :param seq_b: 序列B
-    :param is_angle: 是否为角度序列
-    :return: (NDTW值, 参考路径长度L)
-    """
-    if len(seq_a) == 0 or len(seq_b) == 0:
-        return 0.0, 0.0
-
-    arr_a = np.array(seq_a).reshape(-1, 1) if is_angle else np.array(seq_a)
-    arr_b = np.array(seq_b).reshape(-1, 1) if is_angle else np.array(seq_b)
-    dist_func = angle_difference if is_angle else euclidean
-
-    # 计算累积距离
-    distance, _ = fastdtw(arr_a, arr_b, dist=dist_func)
-
-    # 计算参考路径长度L
-    if is_angle:
-        L = sum(
-            angle_difference(seq_b[i], seq_b[i - 1])
-            for i in range(1, len(seq_b))
-        )
-    else:
-        L = sum(
-            euclidean(seq_b[i], seq_b[i - 1]) for i in range(1, len(seq_b))
-        )
-
-    # 避免除以零
-    L = max(L, 1e-5)
-
-    # 计算NDTW
-    ndtw_value = math.exp(-distance / (ALPHA * L))
-
-    return ndtw_value, L
-
-
-def process_episode(trajectory_file):
-    """处理单个episode文件"""
+def load_episode(trajectory_file):
+    """读取单个episode文件，返回 (episode_key, 预测轨迹, gt序列)，无法评测时返回None"""
     try:
         # 加载轨迹文件
         with open(trajectory_file, "r", encoding="gbk") as f:
@@ -75,126 +34,70 @@ def process_episode(trajectory_file):
         episode_key = traj_data["episode_key"].lstrip("/")
         trajectory = traj_data["trajectory"]
 
-        # 解析路径
-        parts = episode_key.split("/")
-        scene_name, env_name, traj_folder, vla_file = parts[:4]
-
-        # 构建vla_ins文件路径
-        vla_ins_path = os.path.join(
-            DATASET_ROOT, "vla_ins", scene_name, env_name, traj_folder, vla_file
-        )
-        with open(vla_ins_path, "r", encoding="gbk") as f:
-            vla_data = json.load(f)
-        source = vla_data["source"]
-
-        # 构建posture文件路径
-        posture_path = os.path.join(
-            DATASET_ROOT,
-            "without_screenshot",
-            scene_name,
-            env_name,
-            traj_folder,
-            "posture.json",
-        )
-        with open(posture_path, "r") as f:
-            posture_data = json.load(f)
-
-        # 提取gt序列 (0-based索引)
-        start_idx = source[0] - 1
-        end_idx = source[1] - 1
-        gt_full_seq = posture_data[start_idx : end_idx + 1]
-
-        # 转换角度为弧度
-        gt_seq = []
-        for point in gt_full_seq:
-            x, y, z, yaw_deg = point
-            yaw_rad = yaw_deg * math.pi / 180.0
-            gt_seq.append([x, y, z, yaw_rad])
-
-        # 处理预测轨迹 (跳过第0个点)
-        pred_full_seq = trajectory[2:16]  # 取第1到15个点
+        # 从GT索引中取出vla_ins对应的gt序列（yaw已转换为弧度）
+        ins_key = "/".join(episode_key.split("/")[:4])
+        gt_seq = gt_index.load_or_build(DATASET_ROOT, GT_INDEX_DIR).instruction(ins_key)
+        if len(gt_seq) == 0:
+            print(f"Skipping {trajectory_file}: empty ground truth")
+            return None
 
-        if len(pred_full_seq) == 0:
+        # 评测区间在evaluate_episodes中截取，这里只检查区间内是否有点
+        if len(trajectory) <= PRED_START:
             print(
                 f"Skipping {trajectory_file}: trajectory too short "
                 f"({len(trajectory)} points)"
             )
             return None
 
-        # 检查是否满足停止条件
-        stop_index = None
-        for i in range(1, len(pred_full_seq)):
-            prev = pred_full_seq[i - 1]
-            curr = pred_full_seq[i]
-
-            # 计算距离和角度差
-            dist = euclidean(prev[:3], curr[:3])
-            angle_diff = angle_difference(prev[3], curr[3])
-
-            if dist < THRESHOLD_STOP_DIST and \
-               angle_diff < THRESHOLD_STOP_ANGLE:
-                stop_index = i - 1  # 使用前一个点作为终点
-                break
-
-        # 确定最终使用的预测序列
-        if stop_index is not None:
-            pred_seq = pred_full_seq[: stop_index + 1]  # 包含停止点
-        else:
-            pred_seq = pred_full_seq  # 使用完整序列
-
-        # 获取最后一个预测点和gt点
-        last_pred = pred_seq[-1]
-        last_gt = gt_seq[-1]
-
-        # 计算最终距离和角度差
-        final_dist = euclidean(last_pred[:3], last_gt[:3])
-        final_angle_diff = angle_difference(last_pred[3], last_gt[3])
-
-        # 判断是否成功
-        success = (
-            final_dist < THRESHOLD_SUCCESS_DIST
-            and final_angle_diff < THRESHOLD_SUCCESS_ANGLE
-        )
-
-        # 准备NDTW计算
-        pred_positions = [p[:3] for p in pred_seq]
-        pred_angles = [p[3] for p in pred_seq]
+        pred_seq = np.asarray(trajectory, dtype=np.float64)[:, :4]
+        return episode_key, pred_seq, np.asarray(gt_seq)
+    except Exception as e:
+        print(f"Error processing {trajectory_file}: {str(e)}")
+        return None
 
-        gt_positions = [p[:3] for p in gt_seq]
-        gt_angles = [p[3] for p in gt_seq]
 
-        # 计算位置NDTW和参考长度
-        nDTW_pos, L_pos = calculate_ndtw(pred_positions, gt_positions)
+def evaluate_episodes(episodes):
+    """批量计算停止点、最终距离、SR和nDTW，episodes为load_episode的结果列表"""
+    if not episodes:
+        return []
+    episode_keys, pred_seqs, gt_seqs = zip(*episodes)
+    pred, pred_len = metrics.pad(pred_seqs)
+    gt, gt_len = metrics.pad(gt_seqs)
 
-        # 计算角度NDTW和参考长度
-        nDTW_ang, L_ang = calculate_ndtw(pred_angles, gt_angles, is_angle=True)
+    # 处理预测轨迹，只评测 [PRED_START, PRED_END) 区间
+    pred, pred_len = metrics.window(pred, pred_len, PRED_START, PRED_END)
 
-        L_pos_adjusted = L_pos / 2.2
+    # 检查是否满足停止条件，使用停止点之前的序列（包含停止点）
+    stop_index = metrics.stop_index(pred, pred_len, THRESHOLDS)
+    pred_len = metrics.truncate(pred_len, stop_index)
 
-        # 计算权重 (避免除零错误)
-        total_adjusted = L_pos_adjusted + L_ang
-        if total_adjusted > 0:
-            weight_pos = L_pos_adjusted / total_adjusted
-            weight_ang = L_ang / total_adjusted
-        else:
-            weight_pos = 0.5
-            weight_ang = 0.5
+    # 计算最终距离和角度差，判断是否成功
+    last_gt = metrics.last_points(gt, gt_len)
+    final_dist = metrics.navigation_error(pred, pred_len, last_gt)
+    final_angle_diff = metrics.angle_difference(metrics.last_points(pred, pred_len)[:, 3], last_gt[:, 3])
+    success = metrics.success(pred, pred_len, last_gt, THRESHOLDS)
 
-        # 计算综合NDTW
-        nDTW_total = weight_pos * nDTW_pos + weight_ang * nDTW_ang
+    # 位置和航向nDTW按参考路径长度加权，只统计停止的episode
+    nDTW_total = metrics.ndtw(pred, pred_len, gt, gt_len, THRESHOLDS)
 
-        result_dict = {
+    return [
+        {
             "episode": episode_key,
-            "success": success,
-            "nDTW": nDTW_total if stop_index is not None else None,
-            "final_dist": final_dist,
-            "final_angle_diff": final_angle_diff,
+            "success": bool(success[i]),
+            "nDTW": float(nDTW_total[i]) if stop_index[i] >= 0 else None,
+            "final_dist": float(final_dist[i]),
+            "final_angle_diff": float(final_angle_diff[i]),
         }
+        for i, episode_key in enumerate(episode_keys)
+    ]
 
-        return result_dict
-    except Exception as e:
-        print(f"Error processing {trajectory_file}: {str(e)}")
+
+def process_episode(trajectory_file):
+    """处理单个episode文件"""
+    episode = load_episode(trajectory_file)
+    if episode is None:
         return None
+    return evaluate_episodes([episode])[0]
 
 
 def get_base_stats_dict():
@@ -207,13 +110,19 @@ def get_base_stats_dict():
     }
 
 
-def main():
-    # 配置路径
-    trajectories_dir = TRAJECTORIES_DIR
-    output_file = OUTPUT_FILE
-    final_results_file = os.path.join(trajectories_dir, "final_results.json")
+def new_metrics():
+    """初始化各difficulty的统计数据结构"""
+    return {
+        "overall": get_base_stats_dict(),
+        "easy": get_base_stats_dict(),
+        "medium": get_base_stats_dict(),
+        "hard": get_base_stats_dict(),
+        "unknown": get_base_stats_dict(),
+    }
 
-    # 提取difficulty映射表
+
+def load_difficulty_map(final_results_file):
+    """从final_results.json提取difficulty映射表"""
     difficulty_map = {}
     if os.path.exists(final_results_file):
         with open(final_results_file, "r") as f:
@@ -225,74 +134,107 @@ def main():
     else:
         print(f"Warning: {final_results_file} not found. "
               "All metrics will be grouped as 'unknown'.")
+    return difficulty_map
 
-    # 初始化统计数据结构
-    metrics = {
-        "overall": get_base_stats_dict(),
-        "easy": get_base_stats_dict(),
-        "medium": get_base_stats_dict(),
-        "hard": get_base_stats_dict(),
-        "unknown": get_base_stats_dict(),
-    }
-
-    all_results = []
 
-    # 遍历所有轨迹文件
-    for filename in os.listdir(trajectories_dir):
-        if not filename.endswith(".json") or filename == "final_results.json":
-            continue
+def update_metrics(stats, result, sign=1):
+    """将episode结果计入overall和对应difficulty的统计，sign=-1时移出"""
+    # 需要更新的类别：overall 和 具体的difficulty级别
+    categories_to_update = ["overall", result["difficulty"]]
 
-        filepath = os.path.join(trajectories_dir, filename)
-        result = process_episode(filepath)
+    for cat in categories_to_update:
+        cat_stats = stats.setdefault(cat, get_base_stats_dict())
+        cat_stats["total_count"] += sign
 
-        if result:
-            episode_key = result["episode"]
-            difficulty = difficulty_map.get(episode_key, "unknown")
-            result["difficulty"] = difficulty
-            all_results.append(result)
+        if result["success"]:
+            cat_stats["success_count"] += sign
 
-            # 数据清洗：限定nDTW范围在[0, 1]内
-            if result["nDTW"] is not None and result["nDTW"] > 1:
-                result["nDTW"] = None
+        if result["nDTW"] is not None and result["nDTW"] < 1:
+            cat_stats["ndtw_count"] += sign
+            cat_stats["total_nDTW"] += sign * result["nDTW"]
 
-            # 需要更新的类别：overall 和 具体的difficulty级别
-            categories_to_update = ["overall", difficulty]
 
-            for cat in categories_to_update:
-                metrics[cat]["total_count"] += 1
-
-                if result["success"]:
-                    metrics[cat]["success_count"] += 1
-
-                if result["nDTW"] is not None and result["nDTW"] < 1:
-                    metrics[cat]["ndtw_count"] += 1
-                    metrics[cat]["total_nDTW"] += result["nDTW"]
-
-    # 计算结果及输出字典构建
+def summarize_metrics(stats):
+    """计算各类别的SR和平均nDTW"""
     final_metrics_output = {}
 
-    for cat, stats in metrics.items():
-        if stats["total_count"] == 0:
+    for cat, cat_stats in stats.items():
+        if cat_stats["total_count"] == 0:
             continue  # 跳过没有数据的分类（例如unknown）
 
         success_rate = (
-            stats["success_count"] / stats["total_count"]
-            if stats["total_count"] > 0
+            cat_stats["success_count"] / cat_stats["total_count"]
+            if cat_stats["total_count"] > 0
             else 0.0
         )
         avg_nDTW = (
-            stats["total_nDTW"] / stats["ndtw_count"]
-            if stats["ndtw_count"] > 0
+            cat_stats["total_nDTW"] / cat_stats["ndtw_count"]
+            if cat_stats["ndtw_count"] > 0
             else 0.0
         )
 
         final_metrics_output[cat] = {
             "success_rate": success_rate,
             "average_nDTW": avg_nDTW,
-            "total_episodes": stats["total_count"],
-            "success_count": stats["success_count"],
-            "ndtw_valid_count": stats["ndtw_count"]
+            "total_episodes": cat_stats["total_count"],
+            "success_count": cat_stats["success_count"],
+            "ndtw_valid_count": cat_stats["ndtw_count"]
         }
+    return final_metrics_output
+
+
+def print_metrics(final_metrics_output):
+    """打印各类别的结果"""
+    print("=== Evaluation Results ===")
+    for cat, data in final_metrics_output.items():
+        print(f"\n[{cat.upper()}]")
+        print(f"  Total episodes: {data['total_episodes']}")
+        print(f"  Success rate:   {data['success_rate']:.4f} "
+              f"({data['success_count']}/{data['total_episodes']})")
+        print(f"  Average nDTW:   {data['average_nDTW']:.4f} "
+              f"(Based on {data['ndtw_valid_count']} valid nDTW values)")
+
+
+def main():
+    # 配置路径
+    trajectories_dir = TRAJECTORIES_DIR
+    output_file = OUTPUT_FILE
+    final_results_file = os.path.join(trajectories_dir, "final_results.json")
+
+    # 提取difficulty映射表
+    difficulty_map = load_difficulty_map(final_results_file)
+
+    # 初始化统计数据结构
+    stats = new_metrics()
+
+    all_results = []
+
+    # 遍历所有轨迹文件
+    filepaths = [
+        os.path.join(trajectories_dir, filename)
+        for filename in os.listdir(trajectories_dir)
+        if filename.endswith(".json") and filename != "final_results.json"
+    ]
+
+    # 先在主进程中加载GT索引，进程池fork后共享内存映射；各进程只读取文件，指标统一批量计算
+    gt_index.load_or_build(DATASET_ROOT, GT_INDEX_DIR)
+    with Pool(NUM_WORKERS) as pool:
+        episodes = pool.map(load_episode, filepaths, chunksize=16)
+
+    for result in evaluate_episodes([episode for episode in episodes if episode is not None]):
+        episode_key = result["episode"]
+        difficulty = difficulty_map.get(episode_key, "unknown")
+        result["difficulty"] = difficulty
+        all_results.append(result)
+
+        # 数据清洗：限定nDTW范围在[0, 1]内
+        if result["nDTW"] is not None and result["nDTW"] > 1:
+            result["nDTW"] = None
+
+        update_metrics(stats, result)
+
+    # 计算结果及输出字典构建
+    final_metrics_output = summarize_metrics(stats)
 
     # 保存结果
     with open(output_file, "w") as f:
@@ -306,14 +248,7 @@ def main():
         )
 
     # 打印结果
-    print("=== Evaluation Results ===")
-    for cat, data in final_metrics_output.items():
-        print(f"\n[{cat.upper()}]")
-        print(f"  Total episodes: {data['total_episodes']}")
-        print(f"  Success rate:   {data['success_rate']:.4f} "
-              f"({data['success_count']}/{data['total_episodes']})")
-        print(f"  Average nDTW:   {data['average_nDTW']:.4f} "
-              f"(Based on {data['ndtw_valid_count']} valid nDTW values)")
+    print_metrics(final_metrics_output)
 
     print(f"\nResults saved to {output_file}")
 
@@ -0,0 +1,60 @@
+import math
+
+import numpy as np
+
+import vla_metric
+from metrics import dtw
+from metrics import batch_test
+
+THRESHOLDS = vla_metric.THRESHOLDS
+
+
+def reference_episode(trajectory, gt_seq):
+    """原process_episode的逐episode计算（nDTW用精确DTW代替fastdtw）"""
+    pred_full_seq = trajectory[vla_metric.PRED_START : vla_metric.PRED_END]
+
+    # 检查是否满足停止条件
+    stop_index = batch_test.pairwise_stop_index(pred_full_seq, THRESHOLDS)
+    pred_seq = pred_full_seq[: stop_index + 1] if stop_index >= 0 else pred_full_seq
+
+    last_pred = pred_seq[-1]
+    last_gt = gt_seq[-1]
+    final_dist = math.dist(last_pred[:3], last_gt[:3])
+    final_angle_diff = float(dtw.angle_difference(last_pred[3], last_gt[3]))
+    success = final_dist < THRESHOLDS.success_dist and final_angle_diff < THRESHOLDS.success_angle
+    ndtw = batch_test.weighted_ndtw(pred_seq, gt_seq, THRESHOLDS)
+    return {
+        "success": success,
+        "nDTW": ndtw if stop_index >= 0 else None,
+        "final_dist": final_dist,
+        "final_angle_diff": final_angle_diff,
+    }
+
+
+def test_evaluate_episodes_matches_per_episode():
+    rng = np.random.default_rng(0)
+    # 评测区间内只有一个点、停止和一直移动的episode都有
+    lengths = rng.integers(vla_metric.PRED_START + 1, vla_metric.PRED_END + 5, size=200)
+    trajectories = [np.cumsum(rng.normal(scale=[0.1, 0.1, 0.05, 0.2], size=(n, 4)), axis=0) for n in lengths]
+    gts = [seq + rng.normal(scale=0.3, size=seq.shape) for seq in batch_test.random_episodes(rng, 200, 30)]
+    gts = [gt if len(gt) else np.zeros((1, 4)) for gt in gts]
+    episodes = [(f"scene/env/{i}/vla_ins.json", pred, gt) for i, (pred, gt) in enumerate(zip(trajectories, gts))]
+
+    results = vla_metric.evaluate_episodes(episodes)
+    assert [result["episode"] for result in results] == [episode[0] for episode in episodes]
+    assert any(result["nDTW"] is None for result in results)
+    assert any(result["nDTW"] is not None for result in results)
+    assert any(result["success"] for result in results)
+    for result, (_, pred, gt) in zip(results, episodes):
+        expected = reference_episode(pred, gt)
+        assert result["success"] == expected["success"]
+        assert math.isclose(result["final_dist"], expected["final_dist"], abs_tol=1e-12)
+        assert math.isclose(result["final_angle_diff"], expected["final_angle_diff"], abs_tol=1e-12)
+        if expected["nDTW"] is None:
+            assert result["nDTW"] is None
+        else:
+            assert math.isclose(result["nDTW"], expected["nDTW"], abs_tol=1e-12)
+
+
+def test_evaluate_episodes_empty():
+    assert vla_metric.evaluate_episodes([]) == []
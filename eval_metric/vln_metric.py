@@ -1,58 +1,27 @@
 import os
 import json
-import math
+from multiprocessing import Pool
 import numpy as np
-from scipy.spatial.distance import euclidean
-from fastdtw import fastdtw
 
-# 常量定义
-THRESHOLD_SUCCESS_DIST = 2  # 成功距离阈值 (米)
-THRESHOLD_SUCCESS_ANGLE = math.pi*2   # 成功角度阈值 (弧度)
-ALPHA = 10  # nDTW参数
+import gt_index
+import metrics
+
+# 评测阈值（成功判定和nDTW参数）
+THRESHOLDS = metrics.VLN
 
 # Config
 DATASET_ROOT = "/home/testunot/datasets/habitat/IndoorUAV-VLA"
+# GT索引（posture序列）的缓存目录，不存在或数据集文件变化时自动构建
+GT_INDEX_DIR = gt_index.CACHE_DIR
+NUM_WORKERS = os.cpu_count()
 SHARED_FOLDER = "/home/testunot/IndoorUAV-Agent/online_eval/vla_eval/shared_folder"
 
 TRAJECTORIES_DIR = os.path.join(SHARED_FOLDER, "trajectories")
 OUTPUT_FILE = os.path.join(SHARED_FOLDER, "evaluation_metrics.json")
 
-def angle_difference(a, b):
-    """计算两个角度之间的最小差异（考虑圆周性）"""
-    diff = abs(a - b)
-    return min(diff, 2 * math.pi - diff)
-
-
-def calculate_ndtw(seq_a, seq_b):
-    """
-    计算两个序列之间的nDTW（仅使用三维坐标）
-    :param seq_a: 序列A（三维坐标）
-    :param seq_b: 序列B（三维坐标）
-    :return: (nDTW值, 参考路径长度L)
-    """
-    if len(seq_a) == 0 or len(seq_b) == 0:
-        return 0.0, 0.0
-
-    # 计算累积距离
-    distance, _ = fastdtw(
-        np.array(seq_a),
-        np.array(seq_b),
-        dist=euclidean
-    )
-
-    # 计算参考路径长度L
-    L = sum(euclidean(seq_b[i], seq_b[i - 1]) for i in range(1, len(seq_b)))
-    L_a = sum(euclidean(seq_a[i], seq_a[i - 1]) for i in range(1, len(seq_a)))
-    # 避免除以零
-    L = max(L, 1e-5)
-    # 计算nDTW
-    ndtw_value = math.exp(-distance / (ALPHA * L))
-
-    return ndtw_value, L
-
 
-def process_episode(json_path):
-    """处理单个episode文件"""
+def load_episode(json_path):
+    """读取单个episode文件，返回 (episode_key, 预测轨迹, 目标轨迹)，无需评测时返回None"""
     try:
         # 加载轨迹文件
         with open(json_path, 'r') as f:
@@ -71,75 +40,61 @@ def process_episode(json_path):
             print(f"Warning: Empty trajectory in {json_path}")
             return None
 
-        # 构建posture文件路径
-        base_path = os.path.join(DATASET_ROOT, "without_screenshot")
-        posture_path = os.path.join(base_path, os.path.dirname(episode_key), "posture.json")
-
-        
-
-        # 加载目标轨迹
-        with open(posture_path, 'r') as f:
-            gt_full_seq = json.load(f)
-
-        # Prepare GT Data (Convert Yaw to Radians)
-        gt_seq = []
-        gt_positions = []
-
-        # Parse the GT list. Format is [x, y, z, yaw_degrees]
-        for point in gt_full_seq:
-            x, y, z, yaw_deg = point
-            yaw_rad = yaw_deg * math.pi / 180.0
-            gt_seq.append([x, y, z, yaw_rad])
-            gt_positions.append([x, y, z])  # 仅位置用于nDTW
-
-        # 获取目标终点
-        gt_end = gt_seq[-1]
-
-        # 提取预测轨迹的三维坐标
-        pred_positions = []
-        for point in pred_trajectory:
-            # 预测轨迹已经是弧度制，我们只需要位置
-            pred_positions.append(point[:3])
-
-        # 获取预测终点
-        pred_end = pred_trajectory[-1]
-
-        # 计算NE（导航误差）
-        ne = euclidean(pred_end[:3], gt_end[:3])
-
-        # 计算SR（成功率）
-        final_dist = euclidean(pred_end[:3], gt_end[:3])
-        final_angle_diff = angle_difference(pred_end[3], gt_end[3])
-        sr = 1 if (final_dist <= THRESHOLD_SUCCESS_DIST and
-                   final_angle_diff <= THRESHOLD_SUCCESS_ANGLE) else 0
-
-        # 计算OSR（在线成功率）
-        osr = 0
-        for point in pred_trajectory:
-            dist = euclidean(point[:3], gt_end[:3])
-            angle_diff = angle_difference(point[3], gt_end[3])
-            if dist <= THRESHOLD_SUCCESS_DIST and angle_diff <= THRESHOLD_SUCCESS_ANGLE:
-                osr = 1
-                break
-
-        # 计算nDTW（归一化动态时间规整）
-        nDTW, _ = calculate_ndtw(pred_positions, gt_positions)
-
-        return {
-            "episode_key": episode_key,
-            "NE": ne,
-            "SR": sr,
-            "OSR": osr,
-            "nDTW": nDTW,
-            "final_dist": final_dist,
-            "final_angle_diff": final_angle_diff
-        }
+        # 从GT索引中取出目标轨迹（yaw已转换为弧度）
+        gt_seq = gt_index.load_or_build(DATASET_ROOT, GT_INDEX_DIR).posture(os.path.dirname(episode_key))
+        if len(gt_seq) == 0:
+            print(f"Warning: Empty ground truth for {json_path}")
+            return None
+
+        # 预测轨迹已经是弧度制
+        return episode_key, np.asarray(pred_trajectory, dtype=np.float64)[:, :4], np.asarray(gt_seq)
 
     except Exception as e:
         print(f"处理文件 {json_path} 时出错: {str(e)}")
         return None
 
 
+def evaluate_episodes(episodes):
+    """批量计算NE、SR、OSR和nDTW（仅使用三维坐标），episodes为load_episode的结果列表"""
+    if not episodes:
+        return []
+    episode_keys, pred_seqs, gt_seqs = zip(*episodes)
+    pred, pred_len = metrics.pad(pred_seqs)
+    gt, gt_len = metrics.pad(gt_seqs)
+
+    # 目标终点
+    gt_end = metrics.last_points(gt, gt_len)
+    pred_end = metrics.last_points(pred, pred_len)
+
+    # NE（导航误差），SR（成功率），OSR（在线成功率），nDTW（归一化动态时间规整）
+    ne = metrics.navigation_error(pred, pred_len, gt_end)
+    final_angle_diff = metrics.angle_difference(pred_end[:, 3], gt_end[:, 3])
+    sr = metrics.success(pred, pred_len, gt_end, THRESHOLDS)
+    osr = metrics.oracle_success(pred, pred_len, gt_end, THRESHOLDS)
+    ndtw = metrics.ndtw(pred, pred_len, gt, gt_len, THRESHOLDS, use_yaw=False)
+
+    return [
+        {
+            "episode_key": episode_key,
+            "NE": float(ne[i]),
+            "SR": int(sr[i]),
+            "OSR": int(osr[i]),
+            "nDTW": float(ndtw[i]),
+            "final_dist": float(ne[i]),
+            "final_angle_diff": float(final_angle_diff[i])
+        }
+        for i, episode_key in enumerate(episode_keys)
+    ]
+
+
+def process_episode(json_path):
+    """处理单个episode文件"""
+    episode = load_episode(json_path)
+    if episode is None:
+        return None
+    return evaluate_episodes([episode])[0]
+
+
 def main():
     # 配置路径
     trajectories_dir = TRAJECTORIES_DIR
@@ -155,21 +110,27 @@ def main():
     total_ndtw = 0.0
 
     # 遍历所有轨迹文件
-    for filename in os.listdir(trajectories_dir):
-        if filename.endswith(".json"):
-            filepath = os.path.join(trajectories_dir, filename)
-            result = process_episode(filepath)
-
-            if result:
-                all_results.append(result)
-                total_count += 1
-                valid_count += 1
-
-                # 更新统计数据
-                total_ne += result["NE"]
-                total_ndtw += result["nDTW"]
-                sr_count += result["SR"]
-                osr_count += result["OSR"]
+    filepaths = [
+        os.path.join(trajectories_dir, filename)
+        for filename in os.listdir(trajectories_dir)
+        if filename.endswith(".json")
+    ]
+
+    # 先在主进程中加载GT索引，进程池fork后共享内存映射；各进程只读取文件，指标统一批量计算
+    gt_index.load_or_build(DATASET_ROOT, GT_INDEX_DIR)
+    with Pool(NUM_WORKERS) as pool:
+        episodes = pool.map(load_episode, filepaths, chunksize=16)
+
+    for result in evaluate_episodes([episode for episode in episodes if episode is not None]):
+        all_results.append(result)
+        total_count += 1
+        valid_count += 1
+
+        # 更新统计数据
+        total_ne += result["NE"]
+        total_ndtw += result["nDTW"]
+        sr_count += result["SR"]
+        osr_count += result["OSR"]
 
     # 计算总体指标
     avg_ne = total_ne / valid_count if valid_count > 0 else 0.0
@@ -0,0 +1,121 @@
+import os
+import sys
+import numpy as np
+from multiprocessing import shared_memory
+
+try:
+    from multiprocessing import resource_tracker
+except ImportError:
+    resource_tracker = None
+
+# Config
+# "shm": rendered frames are handed over through a shared memory ring (default)
+# "png": frames go through shared_folder/images as PNG files (legacy)
+FRAMES = os.environ.get("VLA_FRAMES", "shm")
+# Also write every frame to shared_folder/images when using the ring (debug only)
+SAVE_DEBUG_PNG = os.environ.get("VLA_SAVE_PNG", "0") == "1"
+RING_NAME = "vla_eval_frames"
+# One frame per in-flight episode is read per round, keep at least twice VLA_BATCH_EPISODES slots
+NUM_SLOTS = int(os.environ.get("VLA_RING_SLOTS", "16"))
+FRAME_SHAPE = (720, 1280, 3)
+
+# Layout: [header: num_slots, h, w, c][seq per slot][slot 0 pixels][slot 1 pixels]...
+_HEADER_WORDS = 4
+
+
+def ring_name(worker=0):
+    """Each simulator worker writes its own ring"""
+    if worker == 0:
+        return RING_NAME
+    return f"{RING_NAME}_{worker}"
+
+
+class FrameRing:
+    """Fixed-size ring of uint8 HxWx3 frame slots in shared memory.
+
+    The simulator creates the ring and writes frames, the model runner attaches to it by name and reads frames as
+    NumPy views of the shared buffer. Each slot carries a sequence number so a reader can detect a slot that was
+    overwritten before it got to it.
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.name = shm.name
+        self.owner = owner
+        header = np.ndarray((_HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        self.num_slots = int(header[0])
+        self.frame_shape = tuple(int(x) for x in header[1:4])
+        self.seqs = np.ndarray((self.num_slots,), dtype=np.int64, buffer=shm.buf, offset=header.nbytes)
+        self.slots = np.ndarray(
+            (self.num_slots, *self.frame_shape),
+            dtype=np.uint8,
+            buffer=shm.buf,
+            offset=header.nbytes + self.seqs.nbytes,
+        )
+        self.next_seq = int(self.seqs.max()) + 1
+
+    @classmethod
+    def create(cls, name=RING_NAME, num_slots=NUM_SLOTS, frame_shape=FRAME_SHAPE):
+        size = 8 * (_HEADER_WORDS + num_slots) + num_slots * int(np.prod(frame_shape))
+        try:
+            # Left behind by a simulator that was killed
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((_HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = [num_slots, *frame_shape]
+        np.ndarray((num_slots,), dtype=np.int64, buffer=shm.buf, offset=header.nbytes)[:] = -1
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name=RING_NAME):
+        # Only the simulator that created the ring unlinks it, a reader must not when it exits
+        if sys.version_info >= (3, 13):
+            return cls(shared_memory.SharedMemory(name=name, track=False), owner=False)
+        shm = shared_memory.SharedMemory(name=name)
+        if resource_tracker is not None:
+            # Python < 3.13 registers attached segments too. The tracker knows the segment by its POSIX name with the
+            # leading slash, which only the private shm._name keeps (shm.name strips it).
+            try:
+                resource_tracker.unregister(shm._name, "shared_memory")
+            except OSError:
+                # The tracker process is gone, so nothing will unlink the ring at exit anyway
+                pass
+        return cls(shm, owner=False)
+
+    def reserve(self):
+        """Claim the next slot for writing in place, returns (seq, slot array). Call publish(seq) when done"""
+        seq = self.next_seq
+        self.next_seq += 1
+        slot = seq % self.num_slots
+        self.seqs[slot] = -1  # mark as being written
+        return seq, self.slots[slot]
+
+    def publish(self, seq):
+        """Mark a reserved slot as written and return the handle to send along with the message"""
+        slot = seq % self.num_slots
+        self.seqs[slot] = seq
+        return {"ring": self.name, "slot": slot, "seq": seq, "shape": list(self.frame_shape)}
+
+    def write(self, frame):
+        """Copy a frame into the next slot and return the handle to send along with the message"""
+        seq, slot = self.reserve()
+        np.copyto(slot, frame, casting="no")
+        return self.publish(seq)
+
+    def view(self, handle):
+        """Zero-copy view of the frame a handle refers to, valid until the slot comes round again"""
+        slot = handle["slot"]
+        if int(self.seqs[slot]) != handle["seq"]:
+            raise RuntimeError(f"Frame {handle['seq']} in slot {slot} was overwritten")
+        return self.slots[slot]
+
+    def close(self):
+        # Drop our views before closing, otherwise the buffer can not be released
+        del self.slots, self.seqs
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
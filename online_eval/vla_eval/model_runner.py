@@ -1,31 +1,131 @@
 import os
+import sys
 import json
 import time
-import numpy as np
-from PIL import Image
+import dataclasses
 import threading
-import tempfile
-from pynvml import *
+from collections import OrderedDict
 
+# Set before anything imports jax (the openpi imports below do).
 os.environ["XLA_PYTHON_CLIENT_PREALLOCATE"] = "false"
 os.environ["XLA_PYTHON_CLIENT_MEM_FRACTION"] = "0.92"  # Use 65% of GPU
 os.environ["XLA_PYTHON_CLIENT_ALLOCATOR"] = "platform"
 
+import numpy as np
+from PIL import Image
+from pynvml import *
+from openpi_client import base_policy as _base_policy
+from openpi_client import image_tools
+from openpi.models.model import IMAGE_RESOLUTION
+from openpi.serving import websocket_policy_server
+
+import frame_ring
+import transport
+
+CONFIG_NAME = "pi0_uav_low_mem_finetune"
+CHECKPOINT_DIR = "/home/testunot/IndoorUAV-Agent/checkpoint/29999"
+# Weight-only quantization (int8 or int4) to save VRAM. Serves the checkpoint converted with
+# openpi/scripts/quantize_checkpoint.py (CHECKPOINT_DIR + "_int8"), quantization_benchmark.py compares it with bf16.
+QUANTIZATION = os.environ.get("VLA_QUANTIZATION") or None
+# Flow matching sampler, see openpi/models/sampling.py (sampler_benchmark.py compares them)
+SAMPLE_KWARGS = {
+    "sampler": os.environ.get("VLA_SAMPLER", "euler"),
+    "num_steps": int(os.environ.get("VLA_NUM_STEPS", "10")),
+    "tolerance": float(os.environ.get("VLA_SAMPLER_TOLERANCE", "0.01")),
+}
+# Record every model input and output to this folder (input of sampler_benchmark.py)
+RECORD_DIR = os.environ.get("VLA_RECORD_DIR")
+# Action chunk execution: each inference returns REPLAN_INTERVAL waypoints, ACTION_STRIDE chunk actions apart, and the
+# controller flies through all of them before asking again. The default executes only the 10th action per inference.
+ACTION_STRIDE = int(os.environ.get("VLA_ACTION_STRIDE", "10"))
+REPLAN_INTERVAL = int(os.environ.get("VLA_REPLAN_INTERVAL", "1"))
+ACTION_STEPS = [ACTION_STRIDE * (i + 1) - 1 for i in range(REPLAN_INTERVAL)]
+ACTION_DIMS = 4  # xyz yaw, the rest of the action is padding
+# Startup: XLA programs are cached in ~/.cache/jax across restarts, and the model call itself is loaded from the
+# executables exported next to the checkpoint (python model_runner.py export [batch sizes]) when there is one.
+USE_EXECUTABLES = os.environ.get("VLA_EXECUTABLES", "1") == "1"
+EXPORT = len(sys.argv) > 1 and sys.argv[1] == "export"
+
 # Initialize model
 def init_model():
     from openpi.training import config
+    from openpi.models import model as _model
+    from openpi.models import tokenizer as _tokenizer
     from openpi.policies import policy_config
-
-    config = config.get_config("pi0_uav_low_mem_finetune") # Needs to be addressed. I cant find this config probably something else.
-    checkpoint_dir = "/home/testunot/IndoorUAV-Agent/checkpoint/29999"
-    return policy_config.create_trained_policy(config, checkpoint_dir)
+    from openpi.policies import policy as _policy
+    from openpi.policies import libero_policy
+    from openpi.shared import aot
+
+    aot.enable_compilation_cache()
+    start = time.monotonic()
+    config = config.get_config(CONFIG_NAME) # Needs to be addressed. I cant find this config probably something else.
+    checkpoint_dir = CHECKPOINT_DIR
+    if QUANTIZATION:
+        config = dataclasses.replace(config, model=dataclasses.replace(config.model, quantization=QUANTIZATION))
+        checkpoint_dir = f"{CHECKPOINT_DIR}_{QUANTIZATION}"
+    # The reference image stays the same for a whole episode, embed it once. The unused right wrist slot is masked
+    # out and skipped by the policy altogether. Only the waypoints we execute leave the device.
+    policy = policy_config.create_trained_policy(
+        config,
+        checkpoint_dir,
+        sample_kwargs=SAMPLE_KWARGS,
+        static_images=("left_wrist_0_rgb",),
+        action_steps=ACTION_STEPS,
+        action_dims=ACTION_DIMS,
+        use_executables=USE_EXECUTABLES or EXPORT,
+        stream_params=True,
+        merge_lora=True,
+    )
+    print(f"Model loaded in {time.monotonic() - start:.1f}s")
+
+    if EXPORT:
+        # Compile for one episode at a time and for the batch sizes the controller sends, then exit
+        for batch_size in [int(size) for size in sys.argv[2:]] or [1]:
+            path = policy.export_executable([libero_policy.make_libero_example() for _ in range(batch_size)])
+            print(f"Exported batch size {batch_size}: {path}")
+        sys.exit(0)
+
+    # Compile (or load the executable) before the first episode arrives
+    start = time.monotonic()
+    policy.infer(libero_policy.make_libero_example())
+    policy.reset()
+    print(f"First inference in {time.monotonic() - start:.1f}s")
+
+    if RECORD_DIR:
+        policy = _policy.PolicyRecorder(policy, RECORD_DIR)
+
+    # The instruction stays the same for a whole episode, it is tokenized once per episode and passed with every
+    # model input (pi0 only, pi0-FAST tokenizes the prompt together with the state)
+    tokenizer = None
+    if config.model.model_type == _model.ModelType.PI0:
+        tokenizer = _tokenizer.PaligemmaTokenizer(config.model.max_token_len)
+    return policy, tokenizer
 
 
 def infer(policy, inputs):
     return policy.infer(inputs)["actions"]
 
 
-policy = init_model()
+def infer_batch(policy, inputs):
+    return [outputs["actions"] for outputs in policy.infer_batch(inputs)]
+
+
+def waypoint_reply(episode_key, actions):
+    """Reply with the waypoints of one inference: the first to fly to now, the rest as the plan to follow"""
+    waypoints = actions.tolist()
+    return {
+        "episode_key": episode_key,
+        "coordinates": waypoints[0], # model output, xyz yaw
+        "plan": waypoints[1:],
+    }
+
+
+def skipped_reply(episode_key):
+    """Reply to a model input that could not be served, the controller re-sends it or ends the episode"""
+    return {"episode_key": episode_key, "status": "skipped"}
+
+
+policy, tokenizer = init_model()
 
 # Config
 SHARED_FOLDER = "/home/testunot/IndoorUAV-Agent/online_eval/vla_eval/shared_folder"
@@ -36,34 +136,38 @@ os.makedirs(MODEL_INPUT_DIR, exist_ok=True)
 os.makedirs(MODEL_OUTPUT_DIR, exist_ok=True)
 os.makedirs(INSTRUCTIONS_DIR, exist_ok=True)
 
+# Episodes the model keeps instructions and reference images for (more than one when the controller batches)
+MAX_EPISODES_IN_FLIGHT = 64
 
-# Original file writing and reading implementation was an approximate wait and then read
-# Atomic Writing is a race free assertion that signifies that the target file does not exist yet
-def atomic_write_json(path, data):
-    dir_name = os.path.dirname(path) or "."
-    with tempfile.NamedTemporaryFile('w', dir=dir_name, delete=False, suffix='.tmp') as tmp:
-        json.dump(data, tmp)
-        tmp_path = tmp.name
-    os.replace(tmp_path, path)
 
-# Tries to read the a json file to test and report if the file is empty or partially written
-def safe_read_json(path):
-    try:
-        with open(path, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, OSError):
-        return None
+def preprocess_image(image):
+    """Letterbox a frame to the model input the way the policy's ResizeImages does, which then leaves it as is"""
+    return image_tools.resize_with_pad(np.asarray(image), *IMAGE_RESOLUTION)
+
+
+class EpisodeState:
+    """Instruction, its tokens and preprocessed reference image of one episode, cached until the episode changes"""
+
+    def __init__(self, episode_key, instruction, end_coords):
+        self.episode_key = episode_key
+        self.instruction = instruction
+        self.end_coords = end_coords
+        self.prompt_tokens = None  # (tokens, mask) of the instruction
+        if tokenizer is not None and isinstance(instruction, str):
+            self.prompt_tokens = tokenizer.tokenize(instruction)
+        self.ref_image_array = None
+        self.last_ref_source = None  # Follow the path (or ring frame) of the last loaded image
+
 
 class ModelService:
     def __init__(self):
         self.current_episode = None
-        self.instruction = None
-        self.end_coords = None
-        self.ref_image_array = None
-        self.last_start_image_path = None  # Follow the path of the last loaded image
+        self.episodes = OrderedDict()  # episode_key -> EpisodeState, oldest first
+        self.rings = {}  # Frame rings of the simulator workers, attached on their first frame
+        self.instruction_stamp = None  # Identifies the instruction file that was read last (file bus)
 
     def load_instruction(self):
-        """Load current instructions and update reference image"""
+        """Load current instructions and update reference image (file bus)"""
         instruction_file = os.path.join(INSTRUCTIONS_DIR, "current_instruction.json")
 
         """         
@@ -71,106 +175,189 @@ class ModelService:
             time.sleep(0.2)
             with open(instruction_file, 'r') as f:
                 data = json.load(f) """ # This implementation would crash at loading the json instruction if the 0.2s sleep was insufficient!
-        if True:
-
-            if not os.path.exists(instruction_file):
-                return
-
-            data = safe_read_json(instruction_file)
-            if data is None:
-                return  # Partial write, skip this main loop cycle
-            
-            # Check if it's a new episode.
-            if self.current_episode != data.get("episode_key"):
-                self.current_episode = data.get("episode_key")
-                self.instruction = data.get("instruction")
-                self.end_coords = data.get("end_coords")
-                self.last_start_image_path = None  # Reset image path
-
-            # Get the starting image path
-            start_image_path = data.get("start_image_path")
-
-            # Check if there is a new starting image path.
-            if start_image_path and start_image_path != self.last_start_image_path:
-                self.last_start_image_path = start_image_path
-
-                # Load reference image
-                if os.path.exists(start_image_path):
-                    ref_img = Image.open(start_image_path).convert('RGB')
-                    self.ref_image_array = np.asarray(ref_img, dtype=np.uint8)
-                    print(f"Update reference image: {os.path.basename(start_image_path)}")
-                else:
-                    print(f"Error: Reference Image Does not exist: {start_image_path}")
-                    self.ref_image_array = None
+        try:
+            stat = os.stat(instruction_file)
+        except FileNotFoundError:
+            return
+
+        # Only read it again when the controller replaced it
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp == self.instruction_stamp:
+            return
+
+        data = transport.safe_read_json(instruction_file)
+        if data is None:
+            return  # Partial write, skip this main loop cycle
+        self.instruction_stamp = stamp
+
+        # The file bus only ever carries one episode
+        if data.get("episode_key") not in self.episodes:
+            self.episodes.clear()
+        self.update_instruction(data)
+
+    def update_instruction(self, data):
+        """Apply an instruction message: new episode and/or new reference image"""
+        episode_key = data.get("episode_key")
+
+        # Check if it's a new episode.
+        episode = self.episodes.get(episode_key)
+        if episode is None:
+            episode = EpisodeState(episode_key, data.get("instruction"), data.get("end_coords"))
+            self.episodes[episode_key] = episode
+            while len(self.episodes) > MAX_EPISODES_IN_FLIGHT:
+                self.episodes.popitem(last=False)
+        self.current_episode = episode_key
+
+        # A session opened over the policy server carries the reference image itself
+        if data.get("ref_image") is not None:
+            episode.ref_image_array = np.array(preprocess_image(np.asarray(data["ref_image"], dtype=np.uint8)))
+            episode.last_ref_source = None
+            return
+
+        # Get the starting image, either a ring frame or a path
+        start_frame = data.get("start_frame")
+        start_image_path = data.get("start_image_path")
+        ref_source = start_frame["seq"] if start_frame else start_image_path
+
+        # Check if there is a new starting image.
+        if ref_source is not None and ref_source != episode.last_ref_source:
+            episode.last_ref_source = ref_source
+
+            # Load reference image. It is kept for the whole episode, so resize it once and copy it out of the ring.
+            ref_image = self.load_frame(start_frame, start_image_path)
+            if ref_image is not None:
+                episode.ref_image_array = np.array(preprocess_image(ref_image))
+                print(f"Update reference image: {start_image_path or start_frame}")
+            else:
+                print(f"Error: Reference Image Does not exist: {start_image_path}")
+                episode.ref_image_array = None
+
+    def load_frame(self, frame, image_path):
+        """Return a uint8 HxWx3 frame, as a view of the shared memory ring if the simulator sent a handle"""
+        if frame is not None:
+            name = frame.get("ring", frame_ring.RING_NAME)
+            if name not in self.rings:
+                self.rings[name] = frame_ring.FrameRing.attach(name)
+            return self.rings[name].view(frame)
+
+        if not image_path or not os.path.exists(image_path):
+            return None
+        img = Image.open(image_path).convert('RGB')
+        return np.asarray(img, dtype=np.uint8)
+
+    def build_example(self, data):
+        """Turn one model input message into a policy example, or None if it can not be served yet"""
+        episode_key = data.get("episode_key", "")
+        image_path = data.get("image_path", "")
+        coordinates = data.get("coordinates", [])
+        print(f"Processing episode: {episode_key}, current: {self.current_episode}")
+
+        # Check if it matches an episode we have instructions for
+        episode = self.episodes.get(episode_key)
+        if episode is None:
+            print(f"Error: Not the same episode ({episode_key} vs {self.current_episode})")
+            return None
+
+        # Get input image (no copy when it comes from the ring, or sent inline by a policy server client)
+        img_array = data.get("image")
+        if img_array is None:
+            img_array = self.load_frame(data.get("frame"), image_path)
+        if img_array is None:
+            print(f"Error: Inpout Image file does not exist - {image_path}")
+            return None
+
+        # Ensure that coordinates has 4 dimensions
+        if len(coordinates) < 4:
+            coordinates = coordinates + [0.0] * (4 - len(coordinates))
+
+        state = np.array(coordinates[:4], dtype=np.float32)
+
+        print(f"Ref image exists: {episode.ref_image_array is not None}")
+
+        # Instead of crashing reloop
+        if episode.ref_image_array is None:
+            print("Ref image not loaded yet, skipping")
+            return None
+
+        # Prepare model input, the frame gets the same letterbox as the cached reference image
+        example = {
+            "observation/image": preprocess_image(img_array), # model input from simulation
+            "observation/ref_image": episode.ref_image_array, # Model input from screenshot
+            "observation/state": state,
+            "task": episode.instruction,
+            "episode_key": episode_key,  # Not a model input, keeps recordings apart
+        }
+        if episode.prompt_tokens is not None:
+            example["tokenized_prompt"], example["tokenized_prompt_mask"] = episode.prompt_tokens
+        return example
+
+    def handle_message(self, data):
+        """Handle one controller message, returns the reply for the controller (or None)"""
+        # Instructions travel in-band on the socket bus
+        if data.get("type") == "instruction":
+            self.update_instruction(data)
+            return None
+
+        if data.get("type") == "batch":
+            return self.handle_batch(data["requests"])
+
+        # Episode over, drop its session
+        if data.get("type") == "end":
+            self.episodes.pop(data.get("episode_key"), None)
+            return None
+
+        try:
+            example = self.build_example(data)
+        except Exception as e:
+            print(f"Unable to process {data.get('episode_key')} Error: {str(e)}")
+            example = None
+        if example is None:
+            return skipped_reply(data.get("episode_key"))
+
+        # Perform inference, the policy returns the ACTION_STEPS of the chunk only
+        reply = waypoint_reply(data["episode_key"], infer(policy, example))
+
+        print(f"Inference Complete - New Coordinates: {reply['coordinates']}")
+        return reply
+
+    def handle_batch(self, requests):
+        """Serve the model inputs of several in-flight episodes with one batched policy call"""
+        keys, examples, replies = [], [], []
+        for data in requests:
+            try:
+                example = self.build_example(data)
+            except Exception as e:
+                print(f"Unable to process {data.get('episode_key')} Error: {str(e)}")
+                example = None
+            if example is not None:
+                keys.append(data["episode_key"])
+                examples.append(example)
+            else:
+                replies.append(skipped_reply(data.get("episode_key")))
+
+        if examples:
+            for episode_key, actions in zip(keys, infer_batch(policy, examples)):
+                replies.append(waypoint_reply(episode_key, actions))
+            print(f"Batched inference complete - {len(examples)}/{len(requests)} episodes")
+
+        return {"type": "batch", "replies": replies}
 
     def process_file(self, file_path):
+        """File bus entry point: read a model_input file and write the reply into model_output"""
         try:
             with open(file_path, 'r') as f:
                 data = json.load(f)
 
-            episode_key = data.get("episode_key", "")
-            image_path = data.get("image_path", "")
-            coordinates = data.get("coordinates", [])
-            print(f"Processing episode: {episode_key}, current: {self.current_episode}")
             # Load current instructions
             self.load_instruction()
 
-            # Check if it matches the current episode
-            if episode_key != self.current_episode:
-                print(f"Error: Not the same episode ({episode_key} vs {self.current_episode})")
+            reply = self.handle_message(data)
+            if reply is None or reply.get("status") == "skipped":
                 return False
 
-            # Get input image
-            if not os.path.exists(image_path):
-                print(f"Error: Inpout Image file does not exist - {image_path}")
-                return False
-
-            img = Image.open(image_path).convert('RGB')
-            img_array = np.asarray(img, dtype=np.uint8)
-
-            # Ensure that coordinates has 4 dimensions
-            if len(coordinates) < 4:
-                coordinates = coordinates + [0.0] * (4 - len(coordinates))
-
-            state = np.array(coordinates[:4], dtype=np.float32)
-
-            print(f"Ref image exists: {self.ref_image_array is not None}")
-
-            # Instead of crashing reloop
-            if self.ref_image_array is None:
-                print("Ref image not loaded yet, skipping")
-                return False
-
-            # Prepare model input
-            example = {
-                "observation/image": img_array, # model input from simulation
-                "observation/ref_image": self.ref_image_array, # Model input from screenshot
-                "observation/state": state,
-                "task": self.instruction
-            }
-
-            # Perform inference
-            output_all = infer(policy, example) # Action Chunk Output
-            output = output_all[9] # Selects 10th action
-            new_coords = output[:4].tolist() # Base action head consists of more action. Instead take first 4 xyz yaw.
-            # Save model output
-            timestamp = time.time()
-
-            output_file = os.path.join(MODEL_OUTPUT_DIR, f"model_output_{timestamp}.json")
-
-            """             
-            with open(output_file, 'w') as f:
-                json.dump({
-                    "episode_key": self.current_episode,
-                    "coordinates": new_coords # model output
-                }, f) """
-            # Replace with atomic write
-            atomic_write_json(output_file, {
-                "episode_key": self.current_episode,
-                "coordinates": new_coords,
-            })
-
-            print(f"Inference Complete - New Coordinates: {new_coords}")
+            # Save model output (atomic write)
+            output_file = os.path.join(MODEL_OUTPUT_DIR, f"model_output_{time.time()}.json")
+            transport.atomic_write_json(output_file, reply)
             return True
 
         except Exception as e:
@@ -222,8 +409,97 @@ class VRAMMonitor:
     def get_max_mem(self):
         return self.max_mem / (1024 ** 3)   
 
+def serve_files(model_service):
+    """Legacy bus: scan model_input for new JSON files"""
+    while True:
+        # Regularly check for instruction updates
+        model_service.load_instruction()
+        # Check input directory
+        processed = False
+        for file_name in sorted(os.listdir(MODEL_INPUT_DIR)):
+            if not file_name.endswith('.json'):
+                continue
+
+            # found simulator output
+            file_path = os.path.join(MODEL_INPUT_DIR, file_name)
+            if model_service.process_file(file_path):
+                processed = True
+
+        # If no files are being processed, wait a while.
+        if not processed:
+            time.sleep(0.1)
+
+
+class SessionPolicy(_base_policy.BasePolicy):
+    """Exposes ModelService through the openpi policy server protocol.
+
+    A session is opened once per episode with {"type": "instruction", "episode_key", "instruction", "ref_image"} (or
+    a start_frame/start_image_path), steps then only carry {"episode_key", "image" (or "frame"), "coordinates"} and
+    {"type": "end", "episode_key"} closes the session. Sessions live in the service, so every connection shares them.
+    """
+
+    def __init__(self, model_service):
+        self.model_service = model_service
+
+    def infer(self, obs):
+        reply = self.model_service.handle_message(obs)
+        if reply is not None:
+            return reply  # Waypoints, or a skipped model input
+        # Session messages have nothing to return
+        return {"episode_key": obs.get("episode_key"), "status": "ok"}
+
+    def reset(self):
+        pass
+
+
+def serve_websocket(model_service):
+    """Policy server: a long-lived websocket server shared by any number of controllers"""
+    print(f"Serving policy on port {transport.MODEL_PORT}")
+    server = websocket_policy_server.WebsocketPolicyServer(
+        policy=SessionPolicy(model_service),
+        host="0.0.0.0",
+        port=transport.MODEL_PORT,
+        metadata=policy.metadata,
+    )
+    server.serve_forever()
+
+
+def failed_reply(data):
+    """Answer the model inputs of a message that raised, so the controller does not wait for them"""
+    if data.get("type") == "batch":
+        return {"type": "batch", "replies": [skipped_reply(request.get("episode_key")) for request in data["requests"]]}
+    if data.get("type") is None:
+        return skipped_reply(data.get("episode_key"))
+    return None
+
+
+def serve_socket(model_service):
+    """Socket bus: serve one controller connection at a time"""
+    listener = transport.SocketListener(transport.MODEL_SOCKET)
+    print(f"Listening on {transport.MODEL_SOCKET}")
+    try:
+        while True:
+            channel = listener.accept()
+            print("Controller connected")
+            try:
+                while True:
+                    data = channel.recv()
+                    try:
+                        reply = model_service.handle_message(data)
+                    except Exception as e:
+                        print(f"Unable to process message Error: {str(e)}")
+                        reply = failed_reply(data)
+                    if reply is not None:
+                        channel.send(reply)
+            except ConnectionError:
+                print("Controller disconnected")
+                channel.close()
+    finally:
+        listener.close()
+
+
 def main():
-    print("Model inference service started...")
+    print(f"Model inference service started ({transport.MODEL_TRANSPORT} transport)...")
     model_service = ModelService()
          
     print("VRAM Monitoring service started...")
@@ -231,32 +507,23 @@ def main():
     vram_monitor.start()
 
     try:
-        while True:
-            # Regularly check for instruction updates
-            model_service.load_instruction()
-            # Check input directory
-            processed = False
-            for file_name in os.listdir(MODEL_INPUT_DIR):
-                if not file_name.endswith('.json'):
-                    continue
-
-                # found simulator output
-                file_path = os.path.join(MODEL_INPUT_DIR, file_name)
-                if model_service.process_file(file_path):
-                    processed = True
-
-            # If no files are being processed, wait a while.
-            if not processed:
-                time.sleep(0.1)
+        if transport.MODEL_TRANSPORT == "file":
+            serve_files(model_service)
+        elif transport.MODEL_TRANSPORT == "websocket":
+            serve_websocket(model_service)
+        else:
+            serve_socket(model_service)
 
     except KeyboardInterrupt:
         print("Model inference service stoopped YAY")
 
     finally:
         vram_monitor.stop()
+        for ring in model_service.rings.values():
+            ring.close()
         print("VRAM monitoring service stopped")
         print(f"Peak vram use: {vram_monitor.get_max_mem:.3f} GB")
-        atomic_write_json(
+        transport.atomic_write_json(
             os.path.join(SHARED_FOLDER, "vram_peak.json"),
             {"peak_vram_gb": round(vram_monitor.get_max_mem, 3)}
         )
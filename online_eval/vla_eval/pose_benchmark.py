@@ -0,0 +1,54 @@
+import os
+import json
+import time
+import tempfile
+import numpy as np
+from utils import load_position, poses_to_agent_states
+
+# Micro-benchmark of the per-frame pose conversion: temp_coords JSON round-trip vs the direct pose API
+NUM_POSES = 2000
+BATCH_SIZE = 16
+
+
+def legacy_pose(coords, tmp_dir):
+    # What sim_runner used to do for every frame
+    temp_coords_file = os.path.join(tmp_dir, f"temp_coords_{time.time()}.json")
+    with open(temp_coords_file, 'w') as f:
+        json.dump({"action": coords}, f)
+    transform = load_position(file_path=temp_coords_file)
+    os.remove(temp_coords_file)
+    return transform
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    rng = np.random.default_rng(0)
+    poses = np.concatenate([rng.uniform(-10, 10, (NUM_POSES, 3)), rng.uniform(-np.pi, np.pi, (NUM_POSES, 1))], axis=-1)
+    pose_lists = poses.tolist()
+
+    # Same agent state either way
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for coords in pose_lists[:100]:
+            legacy = legacy_pose(coords, tmp_dir)
+            direct = poses_to_agent_states(coords)
+            assert np.allclose(list(legacy["position"]), direct["position"], atol=1e-5)
+            assert np.allclose(np.abs(np.dot(legacy["rotation"], direct["rotation"])), 1.0, atol=1e-5)
+
+        legacy_s = timed(lambda: [legacy_pose(coords, tmp_dir) for coords in pose_lists], 1) / NUM_POSES
+
+    direct_s = timed(lambda: [poses_to_agent_states(coords) for coords in pose_lists], 1) / NUM_POSES
+    batched_s = timed(lambda: poses_to_agent_states(poses[:BATCH_SIZE]), NUM_POSES // BATCH_SIZE) / BATCH_SIZE
+
+    print(f"temp_coords JSON round-trip: {legacy_s * 1e6:8.1f} us/frame")
+    print(f"direct pose API:             {direct_s * 1e6:8.1f} us/frame ({legacy_s / direct_s:.1f}x)")
+    print(f"batched pose API (N={BATCH_SIZE}):    {batched_s * 1e6:8.1f} us/frame ({legacy_s / batched_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
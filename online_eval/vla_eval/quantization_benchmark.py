@@ -0,0 +1,102 @@
+import os
+import sys
+import dataclasses
+import numpy as np
+
+from sampler_benchmark import (
+    CONFIG_NAME,
+    CHECKPOINT_DIR,
+    ACTION_STEPS,
+    ACTION_DIMS,
+    load_recording,
+    step_inputs,
+    recorded_trajectories,
+    replay,
+    evaluate,
+    waypoint_error,
+)
+
+# Accuracy / VRAM trade-off of weight-only quantization (openpi/models/quantization.py) on recorded episodes
+# Convert the checkpoint first (in openpi): uv run scripts/quantize_checkpoint.py --checkpoint-dir <CHECKPOINT_DIR>
+# Record an evaluation run: VLA_RECORD_DIR=<record_dir> python model_runner.py (with controller and simulator)
+# Usage: python quantization_benchmark.py <record_dir>
+#
+# Same open loop replay as sampler_benchmark.py: the bf16 model and the quantized checkpoints next to CHECKPOINT_DIR
+# (CHECKPOINT_DIR + "_int8", "_int4") fly the recorded episodes, SR and nDTW are computed with vla_metric.
+QUANTIZATIONS = [None, "int8", "int4"]
+SAMPLE_KWARGS = {
+    "sampler": os.environ.get("VLA_SAMPLER", "euler"),
+    "num_steps": int(os.environ.get("VLA_NUM_STEPS", "10")),
+}
+
+
+def device_memory_gb():
+    """Device memory in use (weights and buffers), None on backends without memory stats (CPU)"""
+    import jax
+
+    stats = jax.devices()[0].memory_stats()
+    if not stats:
+        return None
+    return stats["bytes_in_use"] / 1024**3
+
+
+def main(record_dir):
+    from openpi.training import config
+    from openpi.policies import policy_config
+
+    episodes = load_recording(record_dir)
+    num_steps = sum(len(steps) for steps in episodes.values())
+    print(f"{len(episodes)} episodes, {num_steps} steps recorded in {record_dir}")
+    reference = recorded_trajectories(episodes)
+
+    train_config = config.get_config(CONFIG_NAME)
+    rows = []
+    baseline = None
+    for quantization in QUANTIZATIONS:
+        checkpoint_dir = CHECKPOINT_DIR if quantization is None else f"{CHECKPOINT_DIR}_{quantization}"
+        if not os.path.exists(checkpoint_dir):
+            print(f"Skipping {quantization}: {checkpoint_dir} does not exist")
+            continue
+        model = dataclasses.replace(train_config.model, quantization=quantization)
+        policy = policy_config.create_trained_policy(
+            dataclasses.replace(train_config, model=model),
+            checkpoint_dir,
+            sample_kwargs=SAMPLE_KWARGS,
+            static_images=("left_wrist_0_rgb",),
+            action_steps=ACTION_STEPS,
+            action_dims=ACTION_DIMS,
+            merge_lora=True,
+        )
+        # Compile outside of the timing
+        policy.infer(step_inputs(next(iter(episodes.values()))[0]))
+        memory_gb = device_memory_gb()
+
+        trajectories, latencies = replay(policy, episodes)
+        if baseline is None:
+            baseline = trajectories
+        success_rate, ndtw, _ = evaluate(trajectories)
+        name = quantization or "bf16"
+        rows.append((
+            name,
+            memory_gb,
+            np.mean(latencies) * 1000,
+            success_rate,
+            ndtw,
+            waypoint_error(trajectories, reference),
+            waypoint_error(trajectories, baseline),
+        ))
+        print(f"{name}: SR {success_rate:.3f}, nDTW {ndtw:.3f}")
+        del policy
+
+    print("\n=== Weight-only quantization (open loop replay) ===")
+    print(f"{'model':<8} {'memory':>8} {'latency':>10} {'SR':>6} {'nDTW':>6} {'err vs rec':>10} {'err vs bf16':>11}")
+    for name, memory_gb, latency_ms, success_rate, ndtw, error, baseline_error in rows:
+        memory = "n/a" if memory_gb is None else f"{memory_gb:.2f}GB"
+        print(
+            f"{name:<8} {memory:>8} {latency_ms:>8.1f}ms {success_rate:>6.3f} {ndtw:>6.3f} "
+            f"{error:>9.3f}m {baseline_error:>10.3f}m"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
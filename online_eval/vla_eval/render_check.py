@@ -0,0 +1,65 @@
+import sys
+import json
+import numpy as np
+from PIL import Image
+from test_sim import FULL_RESOLUTION, MODEL_RESOLUTION, setup_simulator, get_img, letterbox_geometry
+
+# Equivalence check of VLA_RENDER=model against the current path (720x1280 render, then resize_with_pad)
+# Usage: python render_check.py <scene.glb> <posture.json>
+MIN_PSNR = 20.0  # rasterising at low resolution is not bit-exact with a bilinear downscale
+NUM_POSES = 20
+
+
+def resize_with_pad(image, height, width):
+    """openpi_client.image_tools.resize_with_pad for one image (PIL bilinear, zero padding)"""
+    resized_height, resized_width, pad_top, pad_left = letterbox_geometry(image.shape[:2], (height, width))
+    resized = Image.fromarray(image).resize((resized_width, resized_height), resample=Image.BILINEAR)
+    padded = Image.new(resized.mode, (width, height), 0)
+    padded.paste(resized, (pad_left, pad_top))
+    return np.asarray(padded)
+
+
+def psnr(a, b):
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def main(glb_path, posture_path):
+    with open(posture_path, 'r') as f:
+        posture = json.load(f)
+    frames = posture[::max(1, len(posture) // NUM_POSES)][:NUM_POSES]
+    poses = [[p[0], p[1], p[2], p[3] / 180 * np.pi] for p in frames]
+
+    resized_height, resized_width, pad_top, pad_left = letterbox_geometry(FULL_RESOLUTION, MODEL_RESOLUTION)
+    print(f"Render {resized_height}x{resized_width}, padded by {pad_top} rows / {pad_left} cols to {MODEL_RESOLUTION}")
+
+    full_sim = setup_simulator(glb_path, FULL_RESOLUTION)
+    model_sim = setup_simulator(glb_path, (resized_height, resized_width))
+    full_agent = full_sim.initialize_agent(0)
+    model_agent = model_sim.initialize_agent(0)
+
+    content = np.zeros(MODEL_RESOLUTION, dtype=bool)
+    content[pad_top:pad_top + resized_height, pad_left:pad_left + resized_width] = True
+
+    worst = float("inf")
+    try:
+        for pose in poses:
+            full = get_img(pose, full_sim, full_agent, out=np.empty((*FULL_RESOLUTION, 3), np.uint8), bgr=False)
+            reference = resize_with_pad(full, *MODEL_RESOLUTION)
+            rendered = get_img(pose, model_sim, model_agent, out=np.empty((*MODEL_RESOLUTION, 3), np.uint8), bgr=False)
+
+            # Padding has to match exactly, the content up to rasterisation differences
+            assert not rendered[~content].any() and not reference[~content].any(), "Padding geometry differs"
+            value = psnr(reference[content], rendered[content])
+            worst = min(worst, value)
+            print(f"pose {np.round(pose, 2).tolist()}: PSNR {value:.1f} dB")
+    finally:
+        full_sim.close()
+        model_sim.close()
+
+    print(f"Worst PSNR: {worst:.1f} dB (threshold {MIN_PSNR} dB)")
+    return worst >= MIN_PSNR
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(sys.argv[1], sys.argv[2]) else 1)
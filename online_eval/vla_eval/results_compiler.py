@@ -1,11 +1,14 @@
 import json
+import os
 import sys
 from collections import defaultdict
 
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(REPO_ROOT, "eval_metric"))
+import metrics  # eval_metric/metrics
+
 def compute_accuracy(entries):
-    if not entries:
-        return 0.0
-    return sum(1 for e in entries if e["success"]) / len(entries) * 100
+    return metrics.success_rate([e["success"] for e in entries]) * 100
 
 def analyse(file):
     # OPen 
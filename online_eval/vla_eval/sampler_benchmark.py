@@ -0,0 +1,144 @@
+import os
+import sys
+import glob
+import json
+import time
+import tempfile
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(REPO_ROOT, "eval_metric"))
+import vla_metric  # eval_metric/vla_metric.py
+
+# Latency / accuracy trade-off of the flow matching samplers (openpi/models/sampling.py) on recorded episodes
+# Record an evaluation run first: VLA_RECORD_DIR=<record_dir> python model_runner.py (with controller and simulator)
+# Usage: python sampler_benchmark.py <record_dir>
+#
+# The recorded observations are replayed open loop: every step gets the recorded camera frame and pose, and the
+# waypoints the sampler predicts replace the recorded ones in the trajectory. SR and nDTW are then computed with
+# vla_metric exactly like for the closed loop run.
+CONFIG_NAME = "pi0_uav_low_mem_finetune"
+CHECKPOINT_DIR = "/home/testunot/IndoorUAV-Agent/checkpoint/29999"
+# Waypoints per inference, same settings as model_runner
+ACTION_STRIDE = int(os.environ.get("VLA_ACTION_STRIDE", "10"))
+REPLAN_INTERVAL = int(os.environ.get("VLA_REPLAN_INTERVAL", "1"))
+ACTION_STEPS = [ACTION_STRIDE * (i + 1) - 1 for i in range(REPLAN_INTERVAL)]
+ACTION_DIMS = 4
+SAMPLERS = [
+    {"sampler": "euler", "num_steps": 10},  # what the policy is evaluated with
+    {"sampler": "euler", "num_steps": 5},
+    {"sampler": "euler", "num_steps": 3},
+    {"sampler": "euler", "num_steps": 1},
+    {"sampler": "heun", "num_steps": 2},
+    {"sampler": "heun", "num_steps": 3},
+    {"sampler": "adaptive", "num_steps": 10, "tolerance": 0.01},
+    {"sampler": "adaptive", "num_steps": 10, "tolerance": 0.05},
+]
+
+
+def load_recording(record_dir):
+    """Recorded steps (flattened PolicyRecorder dicts) grouped by episode, in the order they were served"""
+    paths = glob.glob(os.path.join(record_dir, "step_*.npy"))
+    paths.sort(key=lambda path: int(os.path.basename(path)[len("step_"):-len(".npy")]))
+    episodes = {}
+    for path in paths:
+        step = np.load(path, allow_pickle=True).item()
+        episodes.setdefault(str(step["inputs/episode_key"]), []).append(step)
+    return episodes
+
+
+def step_inputs(step):
+    """The observation as it was passed to the policy"""
+    return {name[len("inputs/"):]: value for name, value in step.items() if name.startswith("inputs/")}
+
+
+def recorded_trajectories(episodes):
+    return {
+        key: [steps[0]["inputs/observation/state"].tolist()]
+        + [waypoint for step in steps for waypoint in step["outputs/actions"].tolist()]
+        for key, steps in episodes.items()
+    }
+
+
+def replay(policy, episodes):
+    """Open loop replay of the recorded observations, returns the trajectories and the per step latencies"""
+    trajectories = {}
+    latencies = []
+    for key, steps in episodes.items():
+        trajectory = [steps[0]["inputs/observation/state"].tolist()]  # start pose
+        for step in steps:
+            start = time.perf_counter()
+            actions = policy.infer(step_inputs(step))["actions"]
+            latencies.append(time.perf_counter() - start)
+            trajectory.extend(actions.tolist())
+        trajectories[key] = trajectory
+    return trajectories, latencies
+
+
+def evaluate(trajectories):
+    """SR and average nDTW as computed by vla_metric"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i, (key, trajectory) in enumerate(trajectories.items()):
+            path = os.path.join(tmp_dir, f"{i}.json")
+            with open(path, "w") as f:
+                json.dump({"episode_key": key, "trajectory": trajectory}, f)
+            result = vla_metric.process_episode(path)
+            if result:
+                results.append(result)
+    ndtw = [r["nDTW"] for r in results if r["nDTW"] is not None and r["nDTW"] < 1]
+    success_rate = np.mean([r["success"] for r in results]) if results else 0.0
+    return success_rate, (np.mean(ndtw) if ndtw else 0.0), len(results)
+
+
+def waypoint_error(trajectories, reference):
+    """Mean distance (xyz) between the replayed and the recorded waypoints"""
+    errors = [
+        np.linalg.norm(np.asarray(trajectories[key])[1:, :3] - np.asarray(reference[key])[1:, :3], axis=-1).mean()
+        for key in reference
+    ]
+    return float(np.mean(errors))
+
+
+def main(record_dir):
+    from openpi.training import config
+    from openpi.policies import policy_config
+
+    episodes = load_recording(record_dir)
+    num_steps = sum(len(steps) for steps in episodes.values())
+    print(f"{len(episodes)} episodes, {num_steps} steps recorded in {record_dir}")
+
+    reference = recorded_trajectories(episodes)
+    success_rate, ndtw, count = evaluate(reference)
+    print(f"{'recorded':<45} {'':>10} {success_rate:>6.3f} {ndtw:>6.3f} ({count} episodes evaluated)")
+
+    train_config = config.get_config(CONFIG_NAME)
+    rows = []
+    for sample_kwargs in SAMPLERS:
+        policy = policy_config.create_trained_policy(
+            train_config,
+            CHECKPOINT_DIR,
+            sample_kwargs=sample_kwargs,
+            static_images=("left_wrist_0_rgb",),
+            action_steps=ACTION_STEPS,
+            action_dims=ACTION_DIMS,
+            merge_lora=True,
+        )
+        # Compile outside of the timing
+        policy.infer(step_inputs(next(iter(episodes.values()))[0]))
+
+        trajectories, latencies = replay(policy, episodes)
+        success_rate, ndtw, _ = evaluate(trajectories)
+        name = " ".join(f"{k}={v}" for k, v in sample_kwargs.items())
+        rows.append((name, np.mean(latencies) * 1000, success_rate, ndtw, waypoint_error(trajectories, reference)))
+        print(f"{name:<45} {rows[-1][1]:>8.1f}ms {success_rate:>6.3f} {ndtw:>6.3f} {rows[-1][4]:>8.3f}m")
+        del policy
+
+    print("\n=== Sampler trade-off (open loop replay) ===")
+    print(f"{'sampler':<45} {'latency':>10} {'SR':>6} {'nDTW':>6} {'waypoint err':>12}")
+    for name, latency_ms, success_rate, ndtw, error in rows:
+        print(f"{name:<45} {latency_ms:>8.1f}ms {success_rate:>6.3f} {ndtw:>6.3f} {error:>11.3f}m")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
@@ -1,9 +1,13 @@
 import os
 import json
 import time
-from test_sim import setup_simulator, get_img
+from test_sim import setup_simulator, render_batch, frame_shape
 import cv2
-import tempfile
+import multiprocessing
+from collections import OrderedDict
+import transport
+from transport import atomic_write_json, safe_read_json
+import frame_ring
 
 os.environ["EGL_DEVICE_ID"] = "0"
 os.environ["CUDA_VISIBLE_DEVICES"] = "0"
@@ -14,44 +18,191 @@ SHARED_FOLDER = "/home/testunot/IndoorUAV-Agent/online_eval/vla_eval/shared_fold
 SIM_INPUT_DIR = os.path.join(SHARED_FOLDER, "sim_input")
 SIM_OUTPUT_DIR = os.path.join(SHARED_FOLDER, "sim_output")
 IMAGE_STORAGE = os.path.join(SHARED_FOLDER, "images")
+# Scenes kept loaded per simulator worker, budgeted by the size of their .glb meshes (0 keeps only the current one)
+SCENE_CACHE_GB = float(os.environ.get("VLA_SCENE_CACHE_GB", "4"))
 os.makedirs(SIM_INPUT_DIR, exist_ok=True)
 os.makedirs(SIM_OUTPUT_DIR, exist_ok=True)
 os.makedirs(IMAGE_STORAGE, exist_ok=True)
 
-# Original file writing and reading implementation was an approximate wait and then read
-# Atomic Writing is a race free assertion that signifies that the target file does not exist yet
-def atomic_write_json(path, data):
-    dir_name = os.path.dirname(path) or "."
-    with tempfile.NamedTemporaryFile('w', dir=dir_name, delete=False, suffix='.tmp') as tmp:
-        json.dump(data, tmp)
-        tmp_path = tmp.name
-    os.replace(tmp_path, path)
-
-# Tries to read the a json file to test and report if the file is empty or partially written
-def safe_read_json(path):
-    try:
-        with open(path, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, OSError):
-        return None
+
+class SceneCache:
+    """LRU cache of live simulators keyed by .glb path.
+
+    Scene loading dominates episode setup for the large hm3d/mp3d meshes, so simulators are kept alive until the
+    memory budget is exceeded. The footprint of a scene is estimated from the size of its .glb file.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.scenes = OrderedDict()  # glb_path -> (sim, agent, nbytes), least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_time = 0.0
+
+    def get(self, glb_path):
+        """Return (sim, agent) for a scene, loading it on a miss and resetting the agent on a hit"""
+        if glb_path in self.scenes:
+            self.scenes.move_to_end(glb_path)
+            sim, agent, _ = self.scenes[glb_path]
+            sim.reset()
+            self.hits += 1
+            print(f"Scene cache hit: {glb_path} ({self.report()})")
+            return sim, agent
+
+        start = time.time()
+        print(f"Initialize the scene: {glb_path}")
+        sim = setup_simulator(glb_path)
+        agent = sim.initialize_agent(0)
+        load_time = time.time() - start
+        self.load_time += load_time
+        self.misses += 1
+        self.scenes[glb_path] = (sim, agent, os.path.getsize(glb_path))
+        self.evict()
+        print(f"Scene loaded in {load_time:.2f}s ({self.report()})")
+        return sim, agent
+
+    def evict(self):
+        # Never evict the scene that was just requested
+        while len(self.scenes) > 1 and sum(nbytes for _, _, nbytes in self.scenes.values()) > self.budget_bytes:
+            glb_path, (sim, _, _) = self.scenes.popitem(last=False)
+            sim.close()
+            self.evictions += 1
+            print(f"Evicted scene: {glb_path}")
+
+    def stats(self):
+        return {
+            "scenes": len(self.scenes),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "load_time_s": round(self.load_time, 2),
+        }
+
+    def report(self):
+        stats = self.stats()
+        return (f"{stats['scenes']} loaded, {stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['evictions']} evictions, {stats['load_time_s']}s loading")
+
+    def close(self):
+        for sim, _, _ in self.scenes.values():
+            sim.close()
+        self.scenes.clear()
+
 
 class SimulatorService:
-    def __init__(self):
+    def __init__(self, worker=0):
+        self.worker = worker
         self.sim = None
         self.agent = None
         self.current_glb_path = None
+        self.scene_cache = SceneCache(SCENE_CACHE_GB * 1024 ** 3)
+        self.active_episodes = set()  # The controller can run several episodes of the loaded scene at once
+        # Rendered frames are handed to the model runner through shared memory
+        self.ring = None
+        if frame_ring.FRAMES == "shm":
+            self.ring = frame_ring.FrameRing.create(frame_ring.ring_name(worker), frame_shape=frame_shape())
+
+    def handle_message(self, data):
+        """Handle one controller message, returns the reply for the controller (or None)"""
+        # Lets the controller send scenes to the worker that already has them loaded
+        if data.get("type") == "status":
+            return {
+                "type": "status",
+                "worker": self.worker,
+                "glb_path": self.current_glb_path,
+                "scene_cache": self.scene_cache.stats(),
+            }
+
+        # All messages of a controller round at once
+        if data.get("type") == "batch":
+            return self.handle_batch(data["requests"])
+
+        # 1. Check for termination signal. The scene stays loaded, the next episode likely uses it again
+        if data.get("action") == "terminate":
+            self.active_episodes.discard(data.get("episode_key"))
+            print(f"Received termination signal, {len(self.active_episodes)} episodes still running")
+            return None
+
+        # 3. Parse Data
+        episode_key = data.get("episode_key", "")
+        glb_path = data.get("glb_path", None)
+        is_new_scene = data.get("is_new_scene", False)
+        print(f"Processing episode: {episode_key}")
+        # 4. Initialize Simulator if needed (from the scene cache, a hit only resets the agent)
+        if is_new_scene and glb_path:
+            self.sim, self.agent = self.scene_cache.get(glb_path)
+            self.current_glb_path = glb_path
+        elif not self.sim:
+            print("Error: Scene not initialized")
+            return None
+
+        # 5. Render Image
+        return self.render([data])[0]
+
+    def handle_batch(self, requests):
+        """Handle the messages of one controller round, consecutive renders of the loaded scene go in one batch"""
+        replies = []
+        renders = []
+        for data in requests:
+            if self.sim and data.get("coordinates") is not None and not data.get("is_new_scene") and not data.get("action"):
+                renders.append(data)
+                continue
+            replies += self.render(renders)
+            renders = []
+            reply = self.handle_message(data)
+            if reply is not None:
+                replies.append(reply)
+        replies += self.render(renders)
+        return {"type": "batch", "replies": replies}
+
+    def render(self, requests):
+        """Render the poses of several render requests with one render_batch call, returns their replies"""
+        if not requests:
+            return []
+        for data in requests:
+            self.active_episodes.add(data.get("episode_key", ""))
+        poses = [data.get("coordinates", []) for data in requests]
+
+        # Render straight into the ring slots (as RGB, which is what the model read back from the PNG)
+        if self.ring is not None:
+            seqs, slots = zip(*[self.ring.reserve() for _ in requests])
+            frames = render_batch(poses, self.sim, self.agent, out=slots, bgr=False)
+            frame_handles = [self.ring.publish(seq) for seq in seqs]
+        else:
+            frames = render_batch(poses, self.sim, self.agent)
+            frame_handles = [None] * len(requests)
+
+        replies = []
+        for data, frame, frame_handle in zip(requests, frames, frame_handles):
+            episode_key = data.get("episode_key", "")
+            timestamp = time.time()
+            safe_episode_key = episode_key.replace('/', '_').replace(':', '_').replace(' ', '_')
+            image_filename = f"image_{safe_episode_key}_{timestamp}.png"
+            image_path = os.path.join(IMAGE_STORAGE, image_filename)
+
+            # Save Image to disk, only as a debug sink when the ring is used
+            if self.ring is None:
+                cv2.imwrite(image_path, frame)
+                print(f"Image generated: {image_path}")
+            elif frame_ring.SAVE_DEBUG_PNG:
+                cv2.imwrite(image_path, frame[:, :, ::-1])
+                print(f"Image generated: {image_path}")
+            else:
+                image_path = None
+                print(f"Frame written to slot {frame_handle['slot']} (seq {frame_handle['seq']})")
+
+            replies.append({
+                "episode_key": episode_key,
+                "coordinates": data.get("coordinates", []),
+                "image_path": image_path,
+                "frame": frame_handle,
+            })
+        return replies
 
     def process_file(self, file_path):
+        """File bus entry point: read a sim_input file and write the reply into sim_output"""
         try:
-            # 1. Check for termination signal
-            if "terminate.json" in file_path:
-                print("Received termination signal, shut down emulator")
-                if self.sim:
-                    self.sim.close()
-                    self.sim = None
-                os.remove(file_path)
-                return True
-            
             # Potential Problem if it cant load f or f does not exist.
             """             
             time.sleep(0.2)
@@ -61,63 +212,15 @@ class SimulatorService:
             data = safe_read_json(file_path)
             if data is None:
                 return False
-            
-            # 3. Parse Data
-            episode_key = data.get("episode_key", "")
-            coords = data.get("coordinates", [])
-            glb_path = data.get("glb_path", None)
-            is_new_scene = data.get("is_new_scene", False)
-            print(f"Processing episode: {episode_key}")
-            # 4. Initialize Simulator if needed
-            if is_new_scene and glb_path:
-                if self.sim:
-                    self.sim.close()
-                print(f"Initialize the scene: {glb_path}")
-                self.sim = setup_simulator(glb_path)
-                self.agent = self.sim.initialize_agent(0)
-                self.current_glb_path = glb_path
-            elif not self.sim:
-                print("Error: Scene not initialized")
-                return False
-
-            # 5. Render Image
-            timestamp = time.time()
-            safe_episode_key = episode_key.replace('/', '_').replace(':', '_').replace(' ', '_')
-            image_filename = f"image_{safe_episode_key}_{timestamp}.png"
-            image_path = os.path.join(IMAGE_STORAGE, image_filename)
 
-            # Create temp file for test_sim (legacy requirement)
-            temp_coords_file = f"temp_coords_{timestamp}.json"
-            with open(temp_coords_file, 'w') as f:
-                json.dump({"action": coords}, f)
-
-            # Get image from Habitat
-            frame = get_img(temp_coords_file, self.sim, self.agent)
-
-            # Save Image to disk
-            cv2.imwrite(image_path, frame)
-
-            # Clean up temp file
-            os.remove(temp_coords_file)
-
-            # Write Output for Controller          
-            output_file = os.path.join(SIM_OUTPUT_DIR, f"sim_output_{timestamp}.json")
-            """   
-            with open(output_file, 'w') as f:
-                json.dump({
-                    "episode_key": episode_key,
-                    "coordinates": coords,
-                    "image_path": image_path
-                }, f) """
-
-            # Replace with atomic write version
-            atomic_write_json(output_file, {
-                "episode_key": episode_key,
-                "coordinates": coords,
-                "image_path": image_path,
-            })
+            is_terminate = data.get("action") == "terminate"
+            reply = self.handle_message(data)
+            if reply is None:
+                return is_terminate
 
-            print(f"Image generated: {image_path}")
+            # Write Output for Controller (atomic write)
+            output_file = os.path.join(SIM_OUTPUT_DIR, f"sim_output_{time.time()}.json")
+            atomic_write_json(output_file, reply)
             return True
 
         except Exception as e:
@@ -125,36 +228,94 @@ class SimulatorService:
             return False
         finally:
             # Always clean up the input file so we don't process it twice
-            if os.path.exists(file_path) and "terminate.json" not in file_path:
+            if os.path.exists(file_path):
                 os.remove(file_path)
 
 
-def main():
-    print("Simulation service starts...")
-    simulator = SimulatorService()
+def serve_files(simulator):
+    """Legacy bus: scan sim_input for new JSON files"""
+    while True:
+        # Scan directory for new JSON files
+        processed = False
+        for file_name in sorted(os.listdir(SIM_INPUT_DIR)):
+            if not file_name.endswith('.json'):
+                continue
+
+            file_path = os.path.join(SIM_INPUT_DIR, file_name)
+            if simulator.process_file(file_path):
+                processed = True
+
+        # Sleep to save CPU if no work was done
+        if not processed:
+            time.sleep(0.1)
+
 
+def serve_socket(simulator, path=transport.SIM_SOCKET):
+    """Socket bus: serve one controller connection at a time"""
+    listener = transport.SocketListener(path)
+    print(f"Listening on {path}")
     try:
         while True:
-            # Scan directory for new JSON files
-            processed = False
-            for file_name in os.listdir(SIM_INPUT_DIR):
-                if not file_name.endswith('.json'):
-                    continue
+            channel = listener.accept()
+            print("Controller connected")
+            try:
+                while True:
+                    data = channel.recv()
+                    try:
+                        reply = simulator.handle_message(data)
+                    except Exception as e:
+                        print(f"Unable to process message Error: {str(e)}")
+                        continue
+                    if reply is not None:
+                        channel.send(reply)
+            except ConnectionError:
+                print("Controller disconnected")
+                channel.close()
+    finally:
+        listener.close()
+
 
-                file_path = os.path.join(SIM_INPUT_DIR, file_name)
-                if simulator.process_file(file_path):
-                    processed = True
+def run_worker(worker=0):
+    """Run one simulator, the whole service unless VLA_SIM_WORKERS > 1"""
+    simulator = SimulatorService(worker)
 
-            # Sleep to save CPU if no work was done
-            if not processed:
-                time.sleep(0.1)
+    try:
+        if transport.TRANSPORT == "file":
+            serve_files(simulator)
+        else:
+            serve_socket(simulator, transport.sim_socket(worker))
 
     except KeyboardInterrupt:
-        print("Simulator Stopped")
+        print(f"Simulator {worker} Stopped")
 
     finally:
-        if simulator.sim:
-            simulator.sim.close()
+        print(f"Scene cache: {simulator.scene_cache.report()}")
+        simulator.scene_cache.close()
+        if simulator.ring:
+            simulator.ring.close()
+
+
+def main():
+    print(f"Simulation service starts ({transport.TRANSPORT} transport, {transport.SIM_WORKERS} workers)...")
+    if transport.SIM_WORKERS == 1:
+        run_worker()
+        return
+    if transport.TRANSPORT == "file":
+        raise ValueError("VLA_SIM_WORKERS > 1 needs the socket transport")
+
+    # Fresh interpreters, so no GL state is inherited from the parent
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=run_worker, args=(i,), name=f"sim_worker_{i}") for i in range(transport.SIM_WORKERS)]
+    for process in workers:
+        process.start()
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        # The workers get the interrupt too and clean up on their own
+        for process in workers:
+            process.join()
+        print("Simulator Stopped")
 
 
 if __name__ == "__main__":
@@ -5,10 +5,38 @@ from habitat_sim.utils import viz_utils as vut
 from habitat_sim import Simulator, AgentConfiguration, SimulatorConfiguration
 from magnum import Vector3
 import cv2
-from utils import load_position  # 从utils导入
+from utils import load_position, poses_to_agent_states  # 从utils导入
 
+FULL_RESOLUTION = (720, 1280)
+MODEL_RESOLUTION = (224, 224)  # pi0 model.IMAGE_RESOLUTION
+# "full":  render 720x1280 frames, the policy letterboxes them to the model input (resize_with_pad)
+# "model": render only the letterboxed content at model resolution and pad it the way resize_with_pad does
+RENDER_MODE = os.environ.get("VLA_RENDER", "full")
 
-def setup_simulator(glb_path):
+
+def letterbox_geometry(src_resolution, dst_resolution):
+    """(resized_h, resized_w, pad_top, pad_left) of resize_with_pad from src to dst (same integer arithmetic)"""
+    cur_height, cur_width = src_resolution
+    height, width = dst_resolution
+    ratio = max(cur_width / width, cur_height / height)
+    resized_height = int(cur_height / ratio)
+    resized_width = int(cur_width / ratio)
+    return resized_height, resized_width, (height - resized_height) // 2, (width - resized_width) // 2
+
+
+def render_resolution():
+    """Camera resolution of the render mode"""
+    if RENDER_MODE == "model":
+        return letterbox_geometry(FULL_RESOLUTION, MODEL_RESOLUTION)[:2]
+    return FULL_RESOLUTION
+
+
+def frame_shape():
+    """Shape of the frames get_img/render_batch return in the render mode"""
+    return (*(MODEL_RESOLUTION if RENDER_MODE == "model" else FULL_RESOLUTION), 3)
+
+
+def setup_simulator(glb_path, resolution=None):
     """Set up the simulator environment"""
     sim_config = SimulatorConfiguration()
     sim_config.scene_id = glb_path
@@ -17,7 +45,7 @@ def setup_simulator(glb_path):
     camera_sensor_spec = habitat_sim.CameraSensorSpec()
     camera_sensor_spec.uuid = "rgb"
     camera_sensor_spec.sensor_type = habitat_sim.SensorType.COLOR
-    camera_sensor_spec.resolution = [720, 1280]
+    camera_sensor_spec.resolution = list(resolution or render_resolution())
     camera_sensor_spec.position = Vector3(0, 1.5, 0)
     camera_sensor_spec.orientation = Vector3(0, np.pi, 0)
 
@@ -30,22 +58,65 @@ def setup_simulator(glb_path):
     return Simulator(config)
 
 
-def get_img(coords_file, sim, agent):
-    """Obtain the image from the coordinate file."""
+def orient_frame(rgb, out, bgr=True):
+    """Copy a sensor observation into out, rotated by 180 degrees and as BGR (or RGB), in a single pass."""
+    # Same as np.flipud(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))[:, ::-1, :], without the three intermediate copies
+    np.copyto(out, rgb[::-1, ::-1, 2::-1] if bgr else rgb[::-1, ::-1, :3])
+    return out
 
-    # Flight
-    transform = load_position(file_path=coords_file)
 
+def letterbox_frame(rgb, out, bgr=True):
+    """orient_frame into the centre of a larger out, zeroing the padding like resize_with_pad"""
+    height, width = rgb.shape[:2]
+    pad_top = (out.shape[0] - height) // 2
+    pad_left = (out.shape[1] - width) // 2
+    out[:pad_top] = 0
+    out[pad_top + height:] = 0
+    out[pad_top:pad_top + height, :pad_left] = 0
+    out[pad_top:pad_top + height, pad_left + width:] = 0
+    return orient_frame(rgb, out[pad_top:pad_top + height, pad_left:pad_left + width], bgr)
+
+
+def render_pose(position, rotation, sim, agent, out=None, bgr=True):
     new_state = habitat_sim.AgentState()
-    new_state.position = transform["position"]
-    new_state.rotation = transform["rotation"]
+    new_state.position = position
+    new_state.rotation = rotation
 
     agent.set_state(new_state) # Place agent into new coordinates
     obs = sim.get_sensor_observations()
 
     # image processing
     frame = obs["rgb"]
-    frame = np.flipud(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
-    frame = frame[:, ::-1, :]
+    if out is None:
+        out = np.empty(frame_shape() if RENDER_MODE == "model" else (*frame.shape[:2], 3), dtype=np.uint8)
+    if out.shape[:2] != frame.shape[:2]:
+        letterbox_frame(frame, out, bgr)
+        return out
+    return orient_frame(frame, out, bgr)
+
+
+def get_img(pose, sim, agent, out=None, bgr=True):
+    """Obtain the image for a [x, y, z, yaw] pose (or the path of a legacy coordinate file)."""
+
+    # Flight
+    if isinstance(pose, str):
+        transform = load_position(file_path=pose)
+    else:
+        transform = poses_to_agent_states(pose)
+
+    return render_pose(transform["position"], transform["rotation"], sim, agent, out, bgr)
+
+
+def render_batch(poses, sim, agent, out=None, bgr=True):
+    """Render a sequence of [x, y, z, yaw] poses into one (N, H, W, 3) uint8 buffer.
+
+    out can be a preallocated buffer, or any sequence of N (H, W, 3) arrays (e.g. frame ring slots).
+    """
+    transforms = poses_to_agent_states(np.reshape(poses, (-1, 4)))
+    positions, rotations = transforms["position"], transforms["rotation"]
+    if out is None:
+        out = np.empty((len(positions), *frame_shape()), dtype=np.uint8)
 
-    return frame
\ No newline at end of file
+    for i in range(len(positions)):
+        render_pose(positions[i], rotations[i], sim, agent, out[i], bgr)
+    return out
\ No newline at end of file
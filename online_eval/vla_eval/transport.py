@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import socket
+import select
+import struct
+import tempfile
+
+try:
+    import msgpack
+except ImportError:  # the habitat env does not always ship msgpack, fall back to JSON frames
+    msgpack = None
+
+try:
+    from openpi_client import websocket_client_policy
+except ImportError:  # only needed to talk to model_runner in policy server mode
+    websocket_client_policy = None
+
+# Config
+SHARED_FOLDER = "/home/testunot/IndoorUAV-Agent/online_eval/vla_eval/shared_folder"
+
+# "socket": Unix-domain sockets with length-prefixed msgpack frames (default)
+# "file":   the original shared_folder JSON bus, kept as a fallback
+TRANSPORT = os.environ.get("VLA_TRANSPORT", "socket")
+SIM_SOCKET = os.path.join(SHARED_FOLDER, "sim.sock")
+MODEL_SOCKET = os.path.join(SHARED_FOLDER, "model.sock")
+# Model channel: same as TRANSPORT, or "websocket" for model_runner as a long-lived policy server
+# (openpi WebsocketPolicyServer) that any number of controllers can share
+MODEL_TRANSPORT = os.environ.get("VLA_MODEL_TRANSPORT", TRANSPORT)
+MODEL_HOST = os.environ.get("VLA_MODEL_HOST", "127.0.0.1")
+MODEL_PORT = int(os.environ.get("VLA_MODEL_PORT", "8000"))
+# Simulator worker processes, each with its own scene and socket (socket bus only)
+SIM_WORKERS = int(os.environ.get("VLA_SIM_WORKERS", "1"))
+
+FILE_POLL_INTERVAL = 0.1  # sleep floor of the file bus
+CONNECT_TIMEOUT = 600  # model_runner loads the checkpoint before it starts listening
+
+_HEADER = struct.Struct("!I")  # 4-byte big-endian frame length
+
+
+def encode(message):
+    if msgpack is not None:
+        return msgpack.packb(message, use_bin_type=True)
+    return json.dumps(message).encode("utf-8")
+
+
+def decode(payload):
+    if msgpack is not None:
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload.decode("utf-8"))
+
+
+# Atomic Writing is a race free assertion that signifies that the target file does not exist yet
+def atomic_write_json(path, data, **kwargs):
+    dir_name = os.path.dirname(path) or "."
+    with tempfile.NamedTemporaryFile('w', dir=dir_name, delete=False, suffix='.tmp') as tmp:
+        json.dump(data, tmp, **kwargs)
+        tmp_path = tmp.name
+    os.replace(tmp_path, path)
+
+
+# Tries to read the a json file to test and report if the file is empty or partially written
+def safe_read_json(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return None
+
+
+class FileChannel:
+    """One end of the legacy file bus: every message is an atomically written JSON file"""
+
+    def __init__(self, send_dir, recv_dir, prefix):
+        self.send_dir = send_dir
+        self.recv_dir = recv_dir
+        self.prefix = prefix
+        os.makedirs(send_dir, exist_ok=True)
+        os.makedirs(recv_dir, exist_ok=True)
+
+    def fileno(self):
+        return None  # nothing to select() on, callers have to poll
+
+    def send(self, message, name=None):
+        file_name = name or f"{self.prefix}_{time.time()}.json"
+        atomic_write_json(os.path.join(self.send_dir, file_name), message)
+
+    def recv(self, timeout=None):
+        """Return the oldest pending message, or None if nothing arrived within timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            for file_name in sorted(os.listdir(self.recv_dir)):
+                if not file_name.endswith('.json'):
+                    continue
+                file_path = os.path.join(self.recv_dir, file_name)
+                data = safe_read_json(file_path)
+                if data is None:
+                    continue  # Partial write, pick it up on the next scan
+                os.remove(file_path)
+                return data
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(FILE_POLL_INTERVAL)
+
+    def close(self):
+        pass
+
+
+class SocketChannel:
+    """One end of a Unix-domain socket connection carrying length-prefixed frames"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = bytearray()
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def send(self, message, name=None):
+        payload = encode(message)
+        self.sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+    def _pop_frame(self):
+        if len(self.buffer) < _HEADER.size:
+            return None
+        (length,) = _HEADER.unpack_from(self.buffer)
+        end = _HEADER.size + length
+        if len(self.buffer) < end:
+            return None
+        payload = bytes(self.buffer[_HEADER.size:end])
+        del self.buffer[:end]
+        return decode(payload)
+
+    def recv(self, timeout=None):
+        """Return the next message, or None if no complete frame arrived within timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            message = self._pop_frame()
+            if message is not None:
+                return message
+
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self.sock], [], [], remaining)
+            if not readable:
+                return None
+
+            chunk = self.sock.recv(1 << 16)
+            if not chunk:
+                raise ConnectionError("Peer closed the connection")
+            self.buffer.extend(chunk)
+
+    def close(self):
+        self.sock.close()
+
+
+class WebsocketChannel:
+    """Client end of the policy server: every message is a request the server answers synchronously.
+
+    Replies are queued on send and handed out by recv, so the channel fits the same loops as the other channels.
+    Acknowledgements of session messages ({"status": "ok"}) are not queued, skipped model inputs are.
+    """
+
+    def __init__(self, host=MODEL_HOST, port=MODEL_PORT):
+        if websocket_client_policy is None:
+            raise ImportError("VLA_MODEL_TRANSPORT=websocket needs openpi-client (openpi/packages/openpi-client)")
+        self.policy = websocket_client_policy.WebsocketClientPolicy(host, port)
+        self.replies = []
+
+    def fileno(self):
+        # The server never sends unsolicited frames, select() on it just waits on the other channels
+        return self.policy.fileno()
+
+    def send(self, message, name=None):
+        reply = self.policy.infer(message)
+        if reply.get("status") != "ok":
+            self.replies.append(reply)
+
+    def recv(self, timeout=None):
+        return self.replies.pop(0) if self.replies else None
+
+    def close(self):
+        self.policy.close()
+
+
+class SocketListener:
+    """Server side of a channel: services listen, the controller connects"""
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.exists(path):
+            os.remove(path)  # stale socket from a previous run
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen(1)
+
+    def accept(self):
+        conn, _ = self.sock.accept()
+        return SocketChannel(conn)
+
+    def close(self):
+        self.sock.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def sim_socket(worker=0):
+    """Socket of a simulator worker, worker 0 keeps the single-simulator path"""
+    if worker == 0:
+        return SIM_SOCKET
+    return os.path.join(SHARED_FOLDER, f"sim_{worker}.sock")
+
+
+def connect(path, timeout=CONNECT_TIMEOUT):
+    """Connect to a service socket, waiting for the service to come up"""
+    start_wait = time.time()
+    while True:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+            return SocketChannel(sock)
+        except (FileNotFoundError, ConnectionRefusedError):
+            sock.close()
+            if time.time() - start_wait > timeout:
+                raise TimeoutError(f"Service socket did not come up: {path}")
+            time.sleep(0.5)
+
+
+def wait_any(channels, timeout):
+    """Block until one of the channels has a message. Returns (channel, message) or (None, None) on timeout"""
+    deadline = time.monotonic() + timeout
+    while True:
+        for channel in channels:
+            message = channel.recv(timeout=0)
+            if message is not None:
+                return channel, message
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None, None
+
+        fds = [channel.fileno() for channel in channels]
+        if all(fd is not None for fd in fds):
+            select.select(fds, [], [], remaining)
+        else:
+            time.sleep(min(FILE_POLL_INTERVAL, remaining))
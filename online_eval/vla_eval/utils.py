@@ -162,4 +162,28 @@ def load_position(file_path):
         0, z, 0, 1
     ]
 
-    return parse_transform_matrix(data_str)
\ No newline at end of file
+    return parse_transform_matrix(data_str)
+
+
+def poses_to_agent_states(poses):
+    """
+    将位姿直接转换为AgentState的位置和旋转，与load_position的结果一致（无需写入文件）
+    poses: [x, y, z, angle]，或 (N, 4) 批量
+    返回: {"position": [x, z + 1.5, y], "rotation": [w, x, y, z] 四元数}
+    """
+    poses = np.asarray(poses, dtype=np.float64)
+    batch = np.atleast_2d(poses)
+    yaw = batch[:, 3]
+
+    position = np.stack([
+        np.round(batch[:, 0], 6),
+        np.round(batch[:, 2], 2) + 1.5,
+        np.round(batch[:, 1], 6),
+    ], axis=-1)
+
+    zeros = np.zeros_like(yaw)
+    rotation = np.stack([np.cos(yaw / 2), zeros, np.sin(yaw / 2), zeros], axis=-1)
+
+    if poses.ndim == 1:
+        return {"position": position[0], "rotation": rotation[0]}
+    return {"position": position, "rotation": rotation}
@@ -1,8 +1,10 @@
 import os
 import json
 import time
-import shutil
-import tempfile
+from collections import deque
+import transport
+from transport import atomic_write_json
+import frame_ring
 from utils import get_glb_path, is_success, load_posture
 
 # 配置参数
@@ -11,6 +13,11 @@ DATASET_ROOT = "/home/testunot/datasets/habitat/IndoorUAV-VLA"
 AGENT_ROOT = "/home/testunot/IndoorUAV-Agent"
 
 MAX_INFERENCE_STEPS = 12
+EPISODE_TIME_LIMIT = 240
+# Times a model input the model could not serve is sent again before the episode is ended
+MODEL_RETRIES = 2
+# Episodes evaluated side by side, their model inputs are served by one batched policy call (socket bus only)
+BATCH_EPISODES = int(os.environ.get("VLA_BATCH_EPISODES", "1"))
 SHARED_FOLDER = "/home/testunot/IndoorUAV-Agent/online_eval/vla_eval/shared_folder"
 TEST_VLA_FILE = "/home/testunot/IndoorUAV-Agent/online_eval/vla_eval/test_vla.json"
 VLA_INS_BASE = os.path.join(DATASET_ROOT, "vla_ins")
@@ -33,35 +40,28 @@ for dir_path in [CONTROLLER_INPUT, SIM_INPUT_DIR, SIM_OUTPUT_DIR,
     os.makedirs(dir_path, exist_ok=True)
 
 
-# Original file writing and reading implementation was an approximate wait and then read
-# Atomic Writing is a race free assertion that signifies that the target file does not exist yet
-def atomic_write_json(path, data):
-    dir_name = os.path.dirname(path) or "."
-    with tempfile.NamedTemporaryFile('w', dir=dir_name, delete=False, suffix='.tmp') as tmp:
-        json.dump(data, tmp)
-        tmp_path = tmp.name
-    os.replace(tmp_path, path)
-
-# Tries to read the a json file to test and report if the file is empty or partially written
-def safe_read_json(path):
-    try:
-        with open(path, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, OSError):
-        return None
-
 class EpisodeController:
-    def __init__(self, episode_key):
+    def __init__(self, episode_key, sim_channel, model_channel):
         self.episode_key = episode_key
+        self.sim_channel = sim_channel
+        self.model_channel = model_channel
         self.trajectory = []
         self.step_count = 0
+        self.inference_count = 0
+        self.plan = deque() # Waypoints of the last action chunk still to fly to
         self.success = False
         self.start_coords = None
         self.end_coords = None
         self.glb_path = None
         self.instruction = None
         self.start_image_path = None
+        self.start_frame = None # Shared memory handle of the starting image
         self.terminated = False # Stops double episode termination
+        self.started = False # Initial image received and sent to the model
+        self.awaiting = None # "sim" or "model": whose reply the episode is waiting for
+        self.model_input = None # Last model input, sent again when the model skips it
+        self.model_retries = 0
+        self.start_time = None
 
         # 解析路径
         path_parts = episode_key.rsplit('/', 1)[0]
@@ -72,6 +72,25 @@ class EpisodeController:
 
     def setup_episode(self):
         """Set the initial state of the new episode"""
+        self.begin_setup()
+        print("Waiting for initial image from simulator...")
+        timeout = 30
+        start_wait = time.time()
+        while not self.started:
+            remaining = timeout - (time.time() - start_wait)
+            if remaining <= 0:
+                raise TimeoutError("Simulator did not provide initial image within timeout")
+
+            # Check for simulator output
+            data = self.sim_channel.recv(timeout=remaining)
+            if data is None:
+                continue
+
+            if data.get("episode_key") == self.episode_key:
+                self.finish_setup(data)
+
+    def begin_setup(self):
+        """Load the ground truth and ask the simulator for the starting image"""
         print(f"\n=== Start testing: {self.episode_key} ===")
 
         # Loading instructions and source
@@ -113,66 +132,24 @@ class EpisodeController:
         """
 
         # Instead loaf refernece images by inferencing the simulator with the starting coordinates
-        # Append the current instruction (including the starting image path).
-        self.update_instruction_file()
+        # The instruction goes to the model once the starting image is rendered (finish_setup)
 
         # Send starting coordinates to simulator to trigger the first render
         self.send_to_simulator(self.start_coords, True)
-        print("Waiting for initial image from simulator...")
-        timeout = 30
-        start_wait = time.time()
-        while self.start_image_path is None:
-            if time.time() - start_wait > timeout:
-                raise TimeoutError("Simulator did not provide initial image within timeout")
-            
-            # Check for simulator output
-            for file_name in os.listdir(SIM_OUTPUT_DIR):
-                if not file_name.endswith('.json'):
-                    continue
-                
-                file_path = os.path.join(SIM_OUTPUT_DIR, file_name)
 
-                """                 
-                try:
-                    time.sleep(0.1)  # Small delay to ensure file is written
-                    with open(file_path, 'r') as f:
-                        data = json.load(f)
-                    
-                    if data.get("episode_key") == self.episode_key:
-                        self.start_image_path = data["image_path"]
-                        print(f"Received initial image: {self.start_image_path}")
-                        os.remove(file_path)
-                        break
-                except Exception as e:
-                    print(f"Error reading sim output: {e}")
-                    time.sleep(0.1)
-                    continue """
+    def finish_setup(self, sim_data):
+        """Hand the starting image to the model along with the instruction and request the first action"""
+        self.start_image_path = sim_data["image_path"]
+        self.start_frame = sim_data.get("frame")
+        self.started = True
+        print(f"Received initial image: {self.start_image_path or self.start_frame}")
 
-                # Implement smart waiting conditions and double wait time
-                try:
-                    data = safe_read_json(file_path)
-                    if data is None:
-                        time.sleep(0.2)
-                        continue
-
-                    if data.get("episode_key") == self.episode_key:
-                        self.start_image_path = data["image_path"]
-                        print(f"Received initial image: {self.start_image_path}")
-                        os.remove(file_path)
-                        break
-                except Exception as e:
-                    print(f"Error reading sim output: {e}")
-                    time.sleep(0.1)
-                    continue
-
-            time.sleep(0.1)
-    
-        # Now update instruction file with the actual image path
+        # Send the instruction with the starting image, this opens the episode on the model side
         self.update_instruction_file()
         print(f"Setup complete with start image: {self.start_image_path}")
         
         # send to model to trigger first inference
-        self.send_to_model(self.start_image_path, self.start_coords)
+        self.send_to_model(self.start_image_path, self.start_coords, self.start_frame)
         print("Initial image sent to model, waiting for first action...")
 
     """     
@@ -191,20 +168,23 @@ class EpisodeController:
        
     # Updated instruction write function that atomically writes files
     def update_instruction_file(self):
-        instruction_file = os.path.join(INSTRUCTIONS_DIR, "current_instruction.json")
-        atomic_write_json(instruction_file, {
+        instruction = {
             "episode_key": self.episode_key,
             "instruction": self.instruction,
             "end_coords": self.end_coords,
             "glb_path": self.glb_path,
             "start_coords": self.start_coords,
             "start_image_path": self.start_image_path,
-        })  
+            "start_frame": self.start_frame,
+        }
+        if transport.MODEL_TRANSPORT == "file":
+            atomic_write_json(os.path.join(INSTRUCTIONS_DIR, "current_instruction.json"), instruction)
+        else:
+            # Sent in-band (opens the episode session on the policy server), ahead of the model input that needs it
+            self.model_channel.send({"type": "instruction", **instruction})
 
     def send_to_simulator(self, coords, is_new_scene=False):
         """Send coordinates to the simulator"""
-        timestamp = time.time()
-        sim_input_file = os.path.join(SIM_INPUT_DIR, f"sim_input_{timestamp}.json")
 
         """         
         with open(sim_input_file, 'w') as f:
@@ -215,21 +195,19 @@ class EpisodeController:
                 "is_new_scene": is_new_scene
             }, f) """
 
-        # Instead Atommically write
-        atomic_write_json(sim_input_file, {
+        # Instead Atommically write (file bus) or send a frame (socket bus)
+        self.sim_channel.send({
             "episode_key": self.episode_key,
             "coordinates": coords,
             "glb_path": self.glb_path if is_new_scene else None,
             "is_new_scene": is_new_scene,
         })
+        self.awaiting = "sim"
         
         print(f"Sent coordinates to simulator: {coords}")
 
-    def send_to_model(self, image_path, coords):
+    def send_to_model(self, image_path, coords, frame=None):
         """Send image and coordinates to model"""
-        timestamp = time.time()
-        model_input_file = os.path.join(MODEL_INPUT_DIR, f"model_input_{timestamp}.json")
-
 
         """         
         with open(model_input_file, 'w') as f:
@@ -239,13 +217,16 @@ class EpisodeController:
                 "coordinates": coords
             }, f) """
         # Atomic Write to avoid race conditions and JSONDecodeError
-        atomic_write_json(model_input_file, {
+        self.model_input = {
             "episode_key": self.episode_key,
             "image_path": image_path,
             "coordinates": coords,
-        })
+            "frame": frame,
+        }
+        self.model_channel.send(self.model_input)
+        self.awaiting = "model"
 
-        print(f"Sent image to model: {os.path.basename(image_path)}")
+        print(f"Sent image to model: {os.path.basename(image_path) if image_path else frame}")
 
     def process_sim_output(self, sim_data):
         """Process simulator output"""
@@ -275,9 +256,15 @@ class EpisodeController:
             print(f"Max steps reached ({MAX_INFERENCE_STEPS})")
             self.terminate_episode()
             return False
+
+        # Fly through the rest of the action chunk before asking the model again
+        if self.plan:
+            self.step_count += 1
+            self.send_to_simulator(self.plan.popleft())
+            return True
         
         # Send image to model
-        self.send_to_model(image_path, current_coords)
+        self.send_to_model(image_path, current_coords, sim_data.get("frame"))
         return True
     
 
@@ -286,19 +273,40 @@ class EpisodeController:
         if model_data.get("episode_key") != self.episode_key:
             return False
 
+        # The model could not serve the input (session dropped, frame or reference image missing)
+        if model_data.get("status") == "skipped":
+            return self.retry_model_input()
+
+        self.model_retries = 0
         new_coords = model_data["coordinates"]
+        self.plan = deque(model_data.get("plan", []))
         self.step_count += 1
+        self.inference_count += 1
         print(f"Reasoning Steps used: {self.step_count}/{MAX_INFERENCE_STEPS} - New coordinates: {new_coords}")
 
         # Send new coordinates to simulator
         self.send_to_simulator(new_coords)
         return True
 
+    def retry_model_input(self):
+        """Open the session again and re-send the last model input, or end the episode after MODEL_RETRIES"""
+        if self.model_retries >= MODEL_RETRIES:
+            print(f"Model skipped {self.episode_key} {self.model_retries + 1} times, ending the episode")
+            self.terminate_episode()
+            return False
+        self.model_retries += 1
+        print(f"Model skipped the input, sending it again ({self.model_retries}/{MODEL_RETRIES})")
+        self.update_instruction_file()
+        self.model_channel.send(self.model_input)
+        self.awaiting = "model"
+        return True
+
     def terminate_episode(self):
         """Terminate the current episode and save the results."""
         if self.terminated: # Check if already terminated
             return
         self.terminated = True
+        self.awaiting = None
         # Save trajectory
         safe_episode_key = self.episode_key.replace('/', '_').replace(':', '_').replace(' ', '_')
         trajectory_file = os.path.join(TRAJECTORY_OUTPUT, f"{safe_episode_key}.json")
@@ -317,13 +325,13 @@ class EpisodeController:
             "episode_key": self.episode_key,
             "success": self.success,
             "steps": self.step_count,
+            "inferences": self.inference_count,
             "trajectory": self.trajectory,
         })
 
         print(f"Episode completed! Success: {self.success}, Step Count: {self.step_count}")
 
         # Send termination signal, received by model and simulator
-        terminate_file = os.path.join(SIM_INPUT_DIR, "terminate.json")
 
         """         
         with open(terminate_file, 'w') as f:
@@ -333,50 +341,31 @@ class EpisodeController:
             }, f) """
 
         # Like wise replace with atomic write
-        atomic_write_json(terminate_file, {
+        self.sim_channel.send({
             "episode_key": self.episode_key,
             "action": "terminate",
-        })
-
-
-class FileMover:
-    """The component responsible for moving files between directories"""
+        }, name="terminate.json")
 
-    def __init__(self):
-        self.active = True
+        # Close the episode session on the model side
+        if transport.MODEL_TRANSPORT != "file":
+            self.model_channel.send({"type": "end", "episode_key": self.episode_key})
 
-    def move_sim_output_to_model_input(self):
-        """Move simulator output to model input: Images, Pose, Coordinates"""
-        for file_name in os.listdir(SIM_OUTPUT_DIR):
-            if not file_name.endswith('.json'):
-                continue
-            
-            # Get the output path
-            src_path = os.path.join(SIM_OUTPUT_DIR, file_name)
-            # Renames the file whilst also moving it to denote simulator output
-            dst_path = os.path.join(CONTROLLER_INPUT, f"sim_{file_name}")
 
-            try:
-                shutil.move(src_path, dst_path)
-                print(f"Simulator output moved: {file_name} -> {os.path.basename(dst_path)}")
-            except Exception as e:
-                print(f"Failed to move file: {str(e)}")
+def open_channels():
+    """Open the controller ends of the simulator and model channels"""
+    if transport.TRANSPORT == "file":
+        sim_channels = [transport.FileChannel(SIM_INPUT_DIR, SIM_OUTPUT_DIR, "sim_input")]
+    else:
+        sim_channels = [transport.connect(transport.sim_socket(i)) for i in range(transport.SIM_WORKERS)]
 
-    def move_model_output_to_sim_input(self):
-        """Move model output to simulator input: Actions"""
-        for file_name in os.listdir(MODEL_OUTPUT_DIR):
-            if not file_name.endswith('.json'):
-                continue
-
-            src_path = os.path.join(MODEL_OUTPUT_DIR, file_name)
-            # Renames file with model_ to denote model output
-            dst_path = os.path.join(CONTROLLER_INPUT, f"model_{file_name}")
-
-            try:
-                shutil.move(src_path, dst_path)
-                print(f"Model output moved: {file_name} -> {os.path.basename(dst_path)}")
-            except Exception as e:
-                print(f"Failed to move file: {str(e)}")
+    if transport.MODEL_TRANSPORT == "file":
+        model_channel = transport.FileChannel(MODEL_INPUT_DIR, MODEL_OUTPUT_DIR, "model_input")
+    elif transport.MODEL_TRANSPORT == "websocket":
+        model_channel = transport.WebsocketChannel()
+    else:
+        model_channel = transport.connect(transport.MODEL_SOCKET)
+    print(f"Connected to {len(sim_channels)} simulators ({transport.TRANSPORT}) and model ({transport.MODEL_TRANSPORT})")
+    return sim_channels, model_channel
 
 def clear_shared_folder():
 
@@ -405,108 +394,306 @@ def clear_shared_folder():
     print("Sharedfolder cleared")
  
 
-def main():
-    clear_shared_folder()
-    # Load test configuration
-    with open(TEST_VLA_FILE, 'r') as f:
-        test_vla = json.load(f)
+class BatchedModelChannel:
+    """Model channel of the batched loop: holds back model inputs and sends them as one batch request per round"""
 
-    # Initialize file mover
-    file_mover = FileMover()
+    def __init__(self, channel):
+        self.channel = channel
+        self.pending = []
 
-    # Run all episodes
-    results = {}
-    episode_keys = list(test_vla.keys())
+    def send(self, message, name=None):
+        if message.get("type"):
+            self.channel.send(message) # Session messages must reach the model before the batch that needs them
+        else:
+            self.pending.append(message)
+
+    def is_pending(self, episode_key):
+        """Whether a model input of the episode waits for the next batch"""
+        return any(message["episode_key"] == episode_key for message in self.pending)
 
+    def flush(self, timeout):
+        """Send the pending model inputs and return the replies (one per served episode)"""
+        if not self.pending:
+            return []
+        self.channel.send({"type": "batch", "requests": self.pending})
+        self.pending = []
+
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                print("Model did not answer the batch within timeout")
+                return []
+            data = self.channel.recv(timeout=remaining)
+            if data is not None and data.get("type") == "batch":
+                return data["replies"]
+
+
+class BatchedSimChannel:
+    """Simulator channel of the batched loop: sends the messages of a round as one batch, so the worker renders
+    all poses of its episodes with one render_batch call, and hands the replies out one at a time"""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.pending = []
+        self.replies = deque()
+
+    def fileno(self):
+        return self.channel.fileno()
+
+    def send(self, message, name=None):
+        self.pending.append(message)
+
+    def flush(self):
+        if self.pending:
+            self.channel.send({"type": "batch", "requests": self.pending})
+            self.pending = []
+
+    def recv(self, timeout=None):
+        if not self.replies:
+            data = self.channel.recv(timeout=timeout)
+            if data is None or data.get("type") != "batch":
+                return data
+            self.replies.extend(data["replies"])
+        return self.replies.popleft() if self.replies else None
+
+    def close(self):
+        self.channel.close()
+
+
+def episode_scene(episode_key):
+    """(group, scene) of an episode key"""
+    parts = episode_key.rsplit('/', 1)[0].strip('/').split('/')
+    return parts[0], parts[1]
+
+
+def group_by_scene(episode_keys):
+    """Episodes grouped by the .glb they render, largest group first so the workers finish together"""
+    groups = {}
+    for episode_key in episode_keys:
+        groups.setdefault(get_glb_path(*episode_scene(episode_key)), []).append(episode_key)
+    return dict(sorted(groups.items(), key=lambda item: len(item[1]), reverse=True))
+
+
+def worker_status(sim_channels):
+    """Ask every simulator worker for its loaded scene and scene cache statistics"""
+    statuses = []
+    for channel in sim_channels:
+        channel.send({"type": "status"})
+        deadline = time.time() + 30
+        status = {}
+        while time.time() < deadline:
+            data = channel.recv(timeout=deadline - time.time())
+            if data is not None and data.get("type") == "status": # Skip late renders of ended episodes
+                status = data
+                break
+        statuses.append(status)
+    return statuses
+
+
+def loaded_scenes(sim_channels):
+    """Scene each simulator worker has loaded"""
+    return [status.get("glb_path") for status in worker_status(sim_channels)]
+
+
+def episode_result(test_vla, episode_key, controller):
+    return {
+        "success": controller.success,
+        "steps": controller.step_count,
+        "inferences": controller.inference_count,
+        "difficulty": test_vla[episode_key].get("difficulty", "unknown"),
+        "action_type": test_vla[episode_key].get("action_type", [])
+    }
+
+
+def run_sequential(test_vla, episode_keys, sim_channel, model_channel):
+    """Evaluate the episodes one after another"""
+    results = {}
     for i, episode_key in enumerate(episode_keys):
         print(f"\n{'=' * 40}") # Print line
         print(f"Start testing {i + 1}/{len(episode_keys)}: {episode_key}")
 
         # Initialize the current episode
-        controller = EpisodeController(episode_key)
+        controller = EpisodeController(episode_key, sim_channel, model_channel)
         controller.setup_episode()
 
         # Clear directory
-        for dir_path in [CONTROLLER_INPUT, SIM_OUTPUT_DIR, MODEL_OUTPUT_DIR]:
-            for item in os.listdir(dir_path):
-                item_path = os.path.join(dir_path, item)
-                if os.path.isfile(item_path):
-                    os.remove(item_path)
+        if transport.TRANSPORT == "file":
+            for dir_path in [CONTROLLER_INPUT, SIM_OUTPUT_DIR, MODEL_OUTPUT_DIR]:
+                for item in os.listdir(dir_path):
+                    item_path = os.path.join(dir_path, item)
+                    if os.path.isfile(item_path):
+                        os.remove(item_path)
 
         # Start Episode
         start_time = time.time()
         while True:
-            # Move Files
-            file_mover.move_sim_output_to_model_input()
-            file_mover.move_model_output_to_sim_input()
-            #print(f"Controller input files: {os.listdir(CONTROLLER_INPUT)}") # The problem with this is that it will print [] if there exists nothing in the dir
-
-            # improved implementation
-            files = [f for f in os.listdir(CONTROLLER_INPUT) if f.endswith('.json')]
-            if files: # only print if there exists 
-                print(f"Controller input files: {files}")
+            # Wait for the next simulator or model output, no fixed sleep floor on the socket bus
+            channel, data = transport.wait_any([sim_channel, model_channel], timeout=1.0)
 
             # Handle controller input
-            processed = False # Initialise false as no data has been processed
-            for file_name in os.listdir(CONTROLLER_INPUT):
-                if not file_name.endswith('.json'):
-                    continue
-                
-                # Found a new frame
-                file_path = os.path.join(CONTROLLER_INPUT, file_name)
-            
-                # Process the outputs
+            if data is not None:
                 try:
-                    with open(file_path, 'r') as f:
-                        data = json.load(f)
-
                     # Handling simulator output give the model img, coordinates
-                    if file_name.startswith('sim_'):
-                        if controller.process_sim_output(data):
-                            processed = True # Flag true
+                    if channel is sim_channel:
+                        controller.process_sim_output(data)
 
                     # Handling model outputs give simulator new coordinates
-                    elif file_name.startswith('model_'):
-                        if controller.process_model_output(data):
-                            processed = True
-
-                    # Delete processed files
-                    os.remove(file_path)
+                    else:
+                        controller.process_model_output(data)
 
                 except Exception as e:
-                    print(f"Error processing file {file_name} Error: {str(e)}")
-                    continue
+                    print(f"Error processing message {data} Error: {str(e)}")
 
             # Check the termination condition
-            if controller.success or controller.step_count >= MAX_INFERENCE_STEPS:
+            if controller.terminated or controller.success or controller.step_count >= MAX_INFERENCE_STEPS:
                 controller.terminate_episode() # Terminate 1
-                time.sleep(0.2)
                 break # Break out of while loop 
 
             # Timeout
-            if time.time() - start_time > 240:
+            if time.time() - start_time > EPISODE_TIME_LIMIT:
                 print("Episode Time Limit Exceeded")
                 controller.terminate_episode() # Terminate 2
-                time.sleep(0.2)
                 break
 
-            # If no files are being processed, wait a while, for VLA
-            if not processed:
-                time.sleep(0.1)
+        # Give the file bus time to consume terminate.json before the next episode writes its input
+        if transport.TRANSPORT == "file":
+            time.sleep(0.2)
 
         # Record results
-        results[episode_key] = {
-            "success": controller.success,
-            "steps": controller.step_count,
-            "difficulty": test_vla[episode_key].get("difficulty", "unknown"),
-            "action_type": test_vla[episode_key].get("action_type", [])
-        }
+        results[episode_key] = episode_result(test_vla, episode_key, controller)
+
+    return results
+
+
+def run_batched(test_vla, episode_keys, sim_channels, model_channel):
+    """Evaluate the episodes on a pool of simulator workers with batched inference.
+
+    The episodes are grouped by scene and every group goes to one worker, preferably the one that already has the
+    scene loaded. Each worker runs up to BATCH_EPISODES episodes of its scene at a time. Every round renders the
+    pending poses on all workers in parallel, then runs one batched inference for all episodes waiting for an action.
+    """
+    if transport.TRANSPORT == "file" or transport.MODEL_TRANSPORT == "file":
+        raise ValueError("VLA_BATCH_EPISODES > 1 and VLA_SIM_WORKERS > 1 need the socket transport")
+    if frame_ring.FRAMES == "shm" and frame_ring.NUM_SLOTS < 2 * BATCH_EPISODES:
+        raise ValueError(f"VLA_RING_SLOTS ({frame_ring.NUM_SLOTS}) must be at least 2 x VLA_BATCH_EPISODES")
+
+    batch_channel = BatchedModelChannel(model_channel)
+    scenes = group_by_scene(episode_keys)
+    worker_scenes = loaded_scenes(sim_channels)
+    sim_channels = [BatchedSimChannel(channel) for channel in sim_channels]
+    queues = [[] for _ in sim_channels] # Episodes of the scene each worker is on, not started yet
+    running = [0 for _ in sim_channels]
+    active = {} # episode_key -> (worker, controller)
+    results = {}
+
+    while scenes or any(queues) or active:
+        for worker, sim_channel in enumerate(sim_channels):
+            # Hand an idle worker its next scene: the one it has loaded, else one no other worker has loaded
+            if not queues[worker] and not running[worker] and scenes:
+                others = set(worker_scenes[:worker] + worker_scenes[worker + 1:])
+                glb_path = worker_scenes[worker]
+                if glb_path not in scenes:
+                    glb_path = next((glb for glb in scenes if glb not in others), next(iter(scenes)))
+                queues[worker] = scenes.pop(glb_path)
+                print(f"Worker {worker}: {len(queues[worker])} episodes in {glb_path}"
+                      f"{' (already loaded)' if glb_path == worker_scenes[worker] else ''}")
+                worker_scenes[worker] = glb_path
+
+            # Top up with episodes of that scene
+            while queues[worker] and running[worker] < BATCH_EPISODES:
+                episode_key = queues[worker].pop(0)
+                print(f"\n{'=' * 40}")
+                print(f"Start testing {len(results) + len(active) + 1}/{len(episode_keys)}: {episode_key}")
+                controller = EpisodeController(episode_key, sim_channel, batch_channel)
+                controller.begin_setup()
+                controller.start_time = time.time()
+                active[episode_key] = (worker, controller)
+                running[worker] += 1
+
+        # Collect the renders of this round
+        for sim_channel in sim_channels:
+            sim_channel.flush()
+        waiting = {key for key, (_, controller) in active.items() if controller.awaiting == "sim"}
+        deadline = time.time() + 30
+        while waiting:
+            remaining = deadline - time.time()
+            channel, data = transport.wait_any(sim_channels, timeout=remaining) if remaining > 0 else (None, None)
+            if data is None:
+                print(f"Simulator did not answer for {len(waiting)} episodes")
+                break
+            episode_key = data.get("episode_key")
+            if episode_key not in waiting:
+                continue # Late render of an episode that already ended
+            waiting.discard(episode_key)
+            controller = active[episode_key][1]
+            try:
+                if controller.started:
+                    controller.process_sim_output(data)
+                else:
+                    controller.finish_setup(data)
+            except Exception as e:
+                print(f"Error processing message {data} Error: {str(e)}")
+
+        # One policy call for every episode waiting for an action
+        for data in batch_channel.flush(timeout=EPISODE_TIME_LIMIT):
+            if data.get("episode_key") not in active:
+                continue
+            controller = active[data["episode_key"]][1]
+            try:
+                controller.process_model_output(data)
+            except Exception as e:
+                print(f"Error processing message {data} Error: {str(e)}")
+
+        # Check the termination conditions
+        for episode_key, (worker, controller) in list(active.items()):
+            if time.time() - controller.start_time > EPISODE_TIME_LIMIT:
+                print(f"Episode Time Limit Exceeded: {episode_key}")
+            elif episode_key in waiting or (
+                controller.awaiting == "model" and not batch_channel.is_pending(episode_key)  # Re-sent inputs wait
+            ):
+                print(f"No reply for {episode_key}, giving up")
+            elif not (controller.terminated or controller.success or controller.step_count >= MAX_INFERENCE_STEPS):
+                continue
+            controller.terminate_episode()
+            results[episode_key] = episode_result(test_vla, episode_key, controller)
+            del active[episode_key]
+            running[worker] -= 1
+
+    # Deliver the last terminations
+    for sim_channel in sim_channels:
+        sim_channel.flush()
+    return results
+
+
+def main():
+    clear_shared_folder()
+    # Load test configuration
+    with open(TEST_VLA_FILE, 'r') as f:
+        test_vla = json.load(f)
+
+    # Connect to the simulator and model services
+    sim_channels, model_channel = open_channels()
+
+    # Run all episodes
+    episode_keys = list(test_vla.keys())
+    if BATCH_EPISODES > 1 or len(sim_channels) > 1:
+        print(f"Running {BATCH_EPISODES} episodes at a time on each of {len(sim_channels)} simulators")
+        results = run_batched(test_vla, episode_keys, sim_channels, model_channel)
+        results = {episode_key: results[episode_key] for episode_key in episode_keys}
+    else:
+        results = run_sequential(test_vla, episode_keys, sim_channels[0], model_channel)
 
     # Save final result
     results_file = os.path.join(TRAJECTORY_OUTPUT, "final_results.json")
     with open(results_file, 'w') as f:
         json.dump(results, f, indent=2)
 
+    for status in worker_status(sim_channels):
+        print(f"Simulator {status.get('worker')} scene cache: {status.get('scene_cache')}")
+    for sim_channel in sim_channels:
+        sim_channel.close()
+    model_channel.close()
     print("\nAll Episodes Complete!")
 
 
@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import dataclasses
+from multiprocessing import Pool
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "eval_metric"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "online_eval", "vla_eval"))
+import gt_index  # eval_metric/gt_index.py
+import vla_metric  # eval_metric/vla_metric.py
+from transport import atomic_write_json  # online_eval/vla_eval/transport.py
+
+# 增量评测：vla_controller运行期间持续计算SR/nDTW
+# 每个episode的结果按轨迹文件的哈希缓存到CACHE_FILE，重新运行时只计算新增或变化的episode，
+# 各difficulty的统计随新轨迹逐条累加，每次更新后写出与vla_metric相同格式的结果文件。
+# 用法: python vla_metric_incremental.py          持续运行，直到final_results.json出现（controller结束）
+#       python vla_metric_incremental.py --once   只更新一次
+
+TEST_VLA_FILE = "/home/testunot/IndoorUAV-Agent/online_eval/vla_eval/test_vla.json"
+CACHE_FILE = os.path.join(vla_metric.SHARED_FOLDER, "metric_cache.json")
+POLL_INTERVAL = 2.0  # 秒
+
+
+def hash_file(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def metric_config():
+    """影响episode结果的参数，变化后缓存失效"""
+    return dict(
+        dataclasses.asdict(vla_metric.THRESHOLDS), pred_start=vla_metric.PRED_START, pred_end=vla_metric.PRED_END
+    )
+
+
+class IncrementalEvaluator:
+    def __init__(self, trajectories_dir, cache_file, difficulty_map, map_fn=map):
+        self.trajectories_dir = trajectories_dir
+        self.cache_file = cache_file
+        self.difficulty_map = difficulty_map
+        self.map_fn = map_fn
+
+        # 哈希 -> episode结果（None表示无法评测）
+        self.cache = {}
+        if os.path.exists(cache_file):
+            with open(cache_file, "r") as f:
+                data = json.load(f)
+            if data.get("config") == metric_config():
+                self.cache = data["episodes"]
+            else:
+                print(f"Metric config changed, ignoring {cache_file}")
+
+        # 文件名 -> (mtime, size, 哈希)，文件未变化时不必重新计算哈希
+        self.files = {}
+        self.stats = vla_metric.new_metrics()
+
+    def _result(self, file_hash):
+        result = self.cache[file_hash]
+        if result is None:
+            return None
+        return dict(result, difficulty=self.difficulty_map.get(result["episode"], "unknown"))
+
+    def update(self):
+        """扫描轨迹目录，计算新增或变化的episode并更新统计，返回变化的文件数"""
+        current = {}
+        for filename in os.listdir(self.trajectories_dir):
+            if not filename.endswith(".json") or filename == "final_results.json":
+                continue
+            stat = os.stat(os.path.join(self.trajectories_dir, filename))
+            current[filename] = (stat.st_mtime_ns, stat.st_size)
+
+        changed = {}
+        for filename, stat in current.items():
+            if filename in self.files and self.files[filename][:2] == stat:
+                continue
+            path = os.path.join(self.trajectories_dir, filename)
+            changed[filename] = (*stat, hash_file(path))
+        removed = [filename for filename in self.files if filename not in current]
+
+        # 只计算缓存中没有的轨迹
+        new_hashes = {entry[2]: filename for filename, entry in changed.items() if entry[2] not in self.cache}
+        paths = [os.path.join(self.trajectories_dir, filename) for filename in new_hashes.values()]
+        episodes = list(self.map_fn(vla_metric.load_episode, paths))
+        results = iter(vla_metric.evaluate_episodes([episode for episode in episodes if episode is not None]))
+        for file_hash, episode in zip(new_hashes, episodes):
+            result = next(results) if episode is not None else None
+            # 数据清洗：限定nDTW范围在[0, 1]内
+            if result is not None and result["nDTW"] is not None and result["nDTW"] > 1:
+                result["nDTW"] = None
+            self.cache[file_hash] = result
+
+        # 先移出旧结果再计入新结果
+        num_changed = 0
+        for filename in [*removed, *changed]:
+            old = self.files.pop(filename, None)
+            new = changed.get(filename)
+            if old is not None and new is not None and old[2] == new[2]:
+                self.files[filename] = new
+                continue
+            num_changed += 1
+            if old is not None and self._result(old[2]) is not None:
+                vla_metric.update_metrics(self.stats, self._result(old[2]), sign=-1)
+            if new is not None:
+                self.files[filename] = new
+                if self._result(new[2]) is not None:
+                    vla_metric.update_metrics(self.stats, self._result(new[2]))
+        return num_changed
+
+    def set_difficulty_map(self, difficulty_map):
+        """更换difficulty映射表并重新统计"""
+        self.difficulty_map = difficulty_map
+        self.stats = vla_metric.new_metrics()
+        for result in self.results():
+            vla_metric.update_metrics(self.stats, result)
+
+    def results(self):
+        """各episode的结果（按文件名排序）"""
+        results = [self._result(entry[2]) for _, entry in sorted(self.files.items())]
+        return [result for result in results if result is not None]
+
+    def save(self):
+        """保存缓存，只保留当前轨迹文件对应的结果"""
+        hashes = {entry[2] for entry in self.files.values()}
+        atomic_write_json(self.cache_file, {
+            "config": metric_config(),
+            "episodes": {h: result for h, result in self.cache.items() if h in hashes},
+        })
+
+
+def load_difficulty_map(trajectories_dir):
+    """difficulty来自测试集配置，运行结束后以final_results.json为准"""
+    difficulty_map = {}
+    if os.path.exists(TEST_VLA_FILE):
+        with open(TEST_VLA_FILE, "r") as f:
+            for key, value in json.load(f).items():
+                difficulty_map[key.lstrip("/")] = value.get("difficulty", "unknown")
+    final_results_file = os.path.join(trajectories_dir, "final_results.json")
+    if os.path.exists(final_results_file) or not difficulty_map:
+        difficulty_map.update(vla_metric.load_difficulty_map(final_results_file))
+    return difficulty_map
+
+
+def report(evaluator, output_file):
+    final_metrics_output = vla_metric.summarize_metrics(evaluator.stats)
+    atomic_write_json(output_file, {
+        "metrics_by_difficulty": final_metrics_output,
+        "per_episode_results": evaluator.results(),
+    }, indent=2)
+    vla_metric.print_metrics(final_metrics_output)
+
+
+def main(once=False):
+    trajectories_dir = vla_metric.TRAJECTORIES_DIR
+    output_file = vla_metric.OUTPUT_FILE
+    final_results_file = os.path.join(trajectories_dir, "final_results.json")
+
+    # 先在主进程中加载GT索引，进程池fork后共享内存映射
+    gt_index.load_or_build(vla_metric.DATASET_ROOT, vla_metric.GT_INDEX_DIR)
+    with Pool(vla_metric.NUM_WORKERS) as pool:
+        evaluator = IncrementalEvaluator(
+            trajectories_dir, CACHE_FILE, load_difficulty_map(trajectories_dir), map_fn=pool.map
+        )
+        while True:
+            # 在扫描前检查，保证最后一批轨迹也被计入
+            finished = once or os.path.exists(final_results_file)
+            if finished and not once:
+                evaluator.set_difficulty_map(load_difficulty_map(trajectories_dir))
+            start = time.time()
+            num_changed = evaluator.update()
+            if num_changed or finished:
+                evaluator.save()
+                print(f"\n{num_changed} episodes updated in {time.time() - start:.1f}s")
+                report(evaluator, output_file)
+            if finished:
+                break
+            time.sleep(POLL_INTERVAL)
+
+    print(f"\nResults saved to {output_file}")
+
+
+if __name__ == "__main__":
+    main(once="--once" in sys.argv[1:])
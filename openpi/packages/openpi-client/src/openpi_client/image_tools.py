@@ -1,3 +1,8 @@
+from __future__ import annotations
+
+import concurrent.futures
+import functools
+
 import numpy as np
 from PIL import Image
 
@@ -12,7 +17,13 @@ def convert_to_uint8(img: np.ndarray) -> np.ndarray:
     return img
 
 
-def resize_with_pad(images: np.ndarray, height: int, width: int, method=Image.BILINEAR) -> np.ndarray:
+def resize_with_pad(
+    images: np.ndarray,
+    height: int,
+    width: int,
+    method=Image.BILINEAR,
+    executor: concurrent.futures.Executor | None = None,
+) -> np.ndarray:
     """Replicates tf.image.resize_with_pad for multiple images using PIL. Resizes a batch of images to a target height.
 
     Args:
@@ -20,6 +31,8 @@ def resize_with_pad(images: np.ndarray, height: int, width: int, method=Image.BI
         height: The target height of the image.
         width: The target width of the image.
         method: The interpolation method to use. Default is bilinear.
+        executor: If given, the images of a batch are resized in parallel on it (PIL releases the GIL while
+            resampling). By default they are resized one after the other.
 
     Returns:
         The resized images in [..., height, width, channel].
@@ -31,28 +44,31 @@ def resize_with_pad(images: np.ndarray, height: int, width: int, method=Image.BI
     original_shape = images.shape
 
     images = images.reshape(-1, *original_shape[-3:])
-    resized = np.stack([_resize_with_pad_pil(Image.fromarray(im), height, width, method=method) for im in images])
+    resized_height, resized_width, pad_height, pad_width = _letterbox(*images.shape[1:3], height, width)
+    # The padded output is allocated once, every image is resized straight into its letterbox.
+    resized = np.zeros((images.shape[0], height, width, images.shape[-1]), dtype=images.dtype)
+    content = resized[:, pad_height : pad_height + resized_height, pad_width : pad_width + resized_width]
+
+    def resize(i: int) -> None:
+        image = Image.fromarray(images[i]).resize((resized_width, resized_height), resample=method)
+        content[i] = np.asarray(image)
+
+    if executor is not None and len(images) > 1:
+        list(executor.map(resize, range(len(images))))
+    else:
+        for i in range(len(images)):
+            resize(i)
     return resized.reshape(*original_shape[:-3], *resized.shape[-3:])
 
 
-def _resize_with_pad_pil(image: Image.Image, height: int, width: int, method: int) -> Image.Image:
-    """Replicates tf.image.resize_with_pad for one image using PIL. Resizes an image to a target height and
+@functools.lru_cache(maxsize=None)
+def _letterbox(cur_height: int, cur_width: int, height: int, width: int) -> tuple[int, int, int, int]:
+    """Returns the (resized_height, resized_width, pad_height, pad_width) of resizing an image to a target height and
     width without distortion by padding with zeros.
-
-    Unlike the jax version, note that PIL uses [width, height, channel] ordering instead of [batch, h, w, c].
     """
-    cur_width, cur_height = image.size
-    if cur_width == width and cur_height == height:
-        return image  # No need to resize if the image is already the correct size.
-
     ratio = max(cur_width / width, cur_height / height)
     resized_height = int(cur_height / ratio)
     resized_width = int(cur_width / ratio)
-    resized_image = image.resize((resized_width, resized_height), resample=method)
-
-    zero_image = Image.new(resized_image.mode, (width, height), 0)
     pad_height = max(0, int((height - resized_height) / 2))
     pad_width = max(0, int((width - resized_width) / 2))
-    zero_image.paste(resized_image, (pad_width, pad_height))
-    assert zero_image.size == (width, height)
-    return zero_image
+    return resized_height, resized_width, pad_height, pad_width
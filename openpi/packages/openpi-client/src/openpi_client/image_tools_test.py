@@ -1,4 +1,7 @@
+import concurrent.futures
+
 import numpy as np
+from PIL import Image
 
 import openpi_client.image_tools as image_tools
 
@@ -35,3 +38,29 @@ def test_resize_with_pad_shapes():
     resized_images = image_tools.resize_with_pad(images, height, width)
     assert resized_images.shape == (1, height, width, 3)
     assert np.all(resized_images == 0)
+
+
+def resize_with_pad_reference(image: np.ndarray, height: int, width: int) -> np.ndarray:
+    """The original implementation for one image: resize with PIL and paste onto a zero image."""
+    image = Image.fromarray(image)
+    ratio = max(image.width / width, image.height / height)
+    resized = image.resize((int(image.width / ratio), int(image.height / ratio)), resample=Image.BILINEAR)
+    padded = Image.new(resized.mode, (width, height), 0)
+    padded.paste(resized, (max(0, int((width - resized.width) / 2)), max(0, int((height - resized.height) / 2))))
+    return np.asarray(padded)
+
+
+def test_resize_with_pad_matches_pil():
+    rng = np.random.default_rng(0)
+    for shape, height, width in [
+        ((2, 3, 72, 128, 3), 32, 32),  # Extra batch dimensions, downscaled and padded vertically.
+        ((4, 30, 20, 3), 64, 64),  # Upscaled and padded horizontally.
+        ((1, 24, 48, 3), 12, 24),  # No padding.
+    ]:
+        images = rng.integers(0, 256, shape, dtype=np.uint8)
+        expected = np.stack([resize_with_pad_reference(im, height, width) for im in images.reshape(-1, *shape[-3:])])
+        expected = expected.reshape(*shape[:-3], height, width, 3)
+        np.testing.assert_array_equal(image_tools.resize_with_pad(images, height, width), expected)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            resized_images = image_tools.resize_with_pad(images, height, width, executor=executor)
+        np.testing.assert_array_equal(resized_images, expected)
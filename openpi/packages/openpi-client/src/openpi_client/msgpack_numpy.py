@@ -10,13 +10,28 @@ msgpack is good for (de)serializing data over a network for multiple reasons:
 
 The code below is adapted from https://github.com/lebedov/msgpack-numpy. The reason not to use that library directly is
 that it falls back to pickle for object arrays.
+
+Protocol 2 (`pack_frames` / `unpack_frames`) keeps the data of large arrays out of the msgpack stream: the header
+references the arrays by index and their data follows as separate frames. The sender passes a memoryview of each array
+and the receiver wraps the received frames with `np.frombuffer`, so neither end copies the data. The websocket server
+advertises the protocol in its metadata and clients that select it get protocol 2 replies, older clients keep using
+`packb` / `unpackb` (protocol 1).
 """
 
+from __future__ import annotations
+
 import functools
+from typing import Any, Sequence
 
 import msgpack
 import numpy as np
 
+# Latest protocol version and the metadata key the websocket server and client negotiate it with.
+PROTOCOL_VERSION = 2
+PROTOCOL_KEY = "msgpack_numpy_protocol"
+# Smaller arrays stay in the header, an extra frame costs more than copying them.
+MIN_FRAME_BYTES = 1024
+
 
 def pack_array(obj):
     if (isinstance(obj, (np.ndarray, np.generic))) and obj.dtype.kind in ("V", "O", "c"):
@@ -55,3 +70,46 @@ packb = functools.partial(msgpack.packb, default=pack_array)
 
 Unpacker = functools.partial(msgpack.Unpacker, object_hook=unpack_array)
 unpackb = functools.partial(msgpack.unpackb, object_hook=unpack_array)
+
+
+def pack_frames(obj: Any) -> list[bytes | memoryview]:
+    """Packs `obj` with protocol 2: the header followed by one frame per out of band array."""
+    buffers = []
+
+    def pack_array_frame(obj):
+        if isinstance(obj, np.ndarray) and obj.nbytes >= MIN_FRAME_BYTES and obj.dtype.kind not in ("V", "O", "c"):
+            # Byte view of the (contiguous) array data, only non-contiguous arrays are copied.
+            buffers.append(memoryview(np.ascontiguousarray(obj).reshape(-1).view(np.uint8)))
+            return {
+                b"__ndarray_frame__": len(buffers) - 1,
+                b"dtype": obj.dtype.str,
+                b"shape": obj.shape,
+            }
+        return pack_array(obj)
+
+    payload = msgpack.packb(obj, default=pack_array_frame)
+    # The header starts with the number of frames so that the receiver knows how many to wait for.
+    return [msgpack.packb(len(buffers)) + payload, *buffers]
+
+
+def num_frames(header: bytes) -> int:
+    """Returns the number of frames following a protocol 2 header."""
+    unpacker = msgpack.Unpacker(max_buffer_size=len(header))
+    unpacker.feed(header)
+    return unpacker.unpack()
+
+
+def unpack_frames(header: bytes, frames: Sequence[bytes]) -> Any:
+    """Unpacks a protocol 2 message. The arrays are read-only views of `frames`."""
+
+    def unpack_array_frame(obj):
+        if b"__ndarray_frame__" in obj:
+            data = frames[obj[b"__ndarray_frame__"]]
+            return np.frombuffer(data, dtype=np.dtype(obj[b"dtype"])).reshape(obj[b"shape"])
+        return unpack_array(obj)
+
+    unpacker = msgpack.Unpacker(object_hook=unpack_array_frame, max_buffer_size=len(header))
+    unpacker.feed(header)
+    if unpacker.unpack() != len(frames):
+        raise ValueError("Number of frames does not match the header.")
+    return unpacker.unpack()
@@ -14,32 +14,67 @@ def _check(expected, actual):
         assert expected == actual
 
 
+_DATA = [
+    1,  # int
+    1.0,  # float
+    "hello",  # string
+    np.bool_(True),  # boolean scalar
+    np.array([1, 2, 3])[0],  # int scalar
+    np.str_("asdf"),  # string scalar
+    [1, 2, 3],  # list
+    {"key": "value"},  # dict
+    {"key": [1, 2, 3]},  # nested dict
+    np.array(1.0),  # 0D array
+    np.array([1, 2, 3], dtype=np.int32),  # 1D integer array
+    np.array(["asdf", "qwer"]),  # string array
+    np.array([True, False]),  # boolean array
+    np.array([[1.0, 2.0], [3.0, 4.0]], dtype=np.float32),  # 2D float array
+    np.array([[[1, 2], [3, 4]], [[5, 6], [7, 8]]], dtype=np.int16),  # 3D integer array
+    np.array([np.nan, np.inf, -np.inf]),  # special float values
+    {"arr": np.array([1, 2, 3]), "nested": {"arr": np.array([4, 5, 6])}},  # nested dict with arrays
+    [np.array([1, 2]), np.array([3, 4])],  # list of arrays
+    np.zeros((3, 4, 5), dtype=np.float32),  # 3D zeros
+    np.ones((2, 3), dtype=np.float64),  # 2D ones with double precision
+]
+
+
+@pytest.mark.parametrize("data", _DATA)
+def test_pack_unpack(data):
+    packed = msgpack_numpy.packb(data)
+    unpacked = msgpack_numpy.unpackb(packed)
+    tree.map_structure(_check, data, unpacked)
+
+
 @pytest.mark.parametrize(
     "data",
     [
-        1,  # int
-        1.0,  # float
-        "hello",  # string
-        np.bool_(True),  # boolean scalar
-        np.array([1, 2, 3])[0],  # int scalar
-        np.str_("asdf"),  # string scalar
-        [1, 2, 3],  # list
-        {"key": "value"},  # dict
-        {"key": [1, 2, 3]},  # nested dict
-        np.array(1.0),  # 0D array
-        np.array([1, 2, 3], dtype=np.int32),  # 1D integer array
-        np.array(["asdf", "qwer"]),  # string array
-        np.array([True, False]),  # boolean array
-        np.array([[1.0, 2.0], [3.0, 4.0]], dtype=np.float32),  # 2D float array
-        np.array([[[1, 2], [3, 4]], [[5, 6], [7, 8]]], dtype=np.int16),  # 3D integer array
-        np.array([np.nan, np.inf, -np.inf]),  # special float values
-        {"arr": np.array([1, 2, 3]), "nested": {"arr": np.array([4, 5, 6])}},  # nested dict with arrays
-        [np.array([1, 2]), np.array([3, 4])],  # list of arrays
-        np.zeros((3, 4, 5), dtype=np.float32),  # 3D zeros
-        np.ones((2, 3), dtype=np.float64),  # 2D ones with double precision
+        *_DATA,
+        np.random.rand(64, 64).astype(np.float32),  # out of band array
+        np.random.rand(64, 64).T,  # non-contiguous out of band array
+        np.array(["asdf", "qwer"] * 256),  # out of band string array
+        {"image": np.zeros((224, 224, 3), dtype=np.uint8), "state": np.array([1.0, 2.0]), "prompt": "fly"},
     ],
 )
-def test_pack_unpack(data):
-    packed = msgpack_numpy.packb(data)
-    unpacked = msgpack_numpy.unpackb(packed)
+def test_pack_unpack_frames(data):
+    header, *frames = msgpack_numpy.pack_frames(data)
+    # Frames arrive as bytes on the other end.
+    frames = [bytes(frame) for frame in frames]
+    assert msgpack_numpy.num_frames(header) == len(frames)
+    unpacked = msgpack_numpy.unpack_frames(header, frames)
     tree.map_structure(_check, data, unpacked)
+
+
+def test_pack_frames_zero_copy():
+    image = np.random.randint(0, 256, (224, 224, 3), dtype=np.uint8)
+    state = np.arange(8, dtype=np.float32)
+    header, *frames = msgpack_numpy.pack_frames({"image": image, "state": state})
+
+    # Only the image is large enough for its own frame, which is a view of the array.
+    assert len(frames) == 1
+    assert np.shares_memory(np.frombuffer(frames[0], dtype=np.uint8), image)
+    assert len(header) < 1024
+
+    unpacked = msgpack_numpy.unpack_frames(header, frames)
+    assert np.shares_memory(unpacked["image"], image)
+    with pytest.raises(ValueError, match="Number of frames"):
+        msgpack_numpy.unpack_frames(header, [])
@@ -22,6 +22,10 @@ class WebsocketClientPolicy(_base_policy.BasePolicy):
         self._packer = msgpack_numpy.Packer()
         self._api_key = api_key
         self._ws, self._server_metadata = self._wait_for_server()
+        # Servers that support it get protocol 2 (out of band array frames), older servers keep protocol 1.
+        self._protocol = min(self._server_metadata.pop(msgpack_numpy.PROTOCOL_KEY, 1), msgpack_numpy.PROTOCOL_VERSION)
+        if self._protocol > 1:
+            self._ws.send(self._packer.pack({msgpack_numpy.PROTOCOL_KEY: self._protocol}))
 
     def get_server_metadata(self) -> Dict:
         return self._server_metadata
@@ -42,14 +46,27 @@ class WebsocketClientPolicy(_base_policy.BasePolicy):
 
     @override
     def infer(self, obs: Dict) -> Dict:  # noqa: UP006
-        data = self._packer.pack(obs)
-        self._ws.send(data)
+        if self._protocol > 1:
+            for frame in msgpack_numpy.pack_frames(obs):
+                self._ws.send(frame)
+        else:
+            self._ws.send(self._packer.pack(obs))
         response = self._ws.recv()
         if isinstance(response, str):
             # we're expecting bytes; if the server sends a string, it's an error.
             raise RuntimeError(f"Error in inference server:\n{response}")
+        if self._protocol > 1:
+            frames = [self._ws.recv() for _ in range(msgpack_numpy.num_frames(response))]
+            return msgpack_numpy.unpack_frames(response, frames)
         return msgpack_numpy.unpackb(response)
 
     @override
     def reset(self) -> None:
         pass
+
+    def fileno(self) -> int:
+        """File descriptor of the connection, e.g. to select() on it together with other sockets."""
+        return self._ws.socket.fileno()
+
+    def close(self) -> None:
+        self._ws.close()
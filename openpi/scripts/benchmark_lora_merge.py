@@ -0,0 +1,98 @@
+"""Measures the latency and memory of Pi0.sample_actions with LoRA adapters and with the adapters merged.
+
+Unmerged, every LoRA einsum and feed forward layer computes the low rank matmuls next to the base matmul. Merging folds
+the adapters into the base weights (see `Pi0Config.merge_lora_params`), which `create_trained_policy` does with
+`merge_lora=True`.
+"""
+
+import dataclasses
+import functools
+import logging
+import time
+
+from flax import nnx
+import jax
+import jax.numpy as jnp
+import numpy as np
+import tyro
+
+from openpi.models import model as _model
+from openpi.models import pi0
+from openpi.shared import download
+from openpi.shared import nnx_utils
+from openpi.training import config as _config
+
+
+@dataclasses.dataclass
+class Args:
+    # Training config name, must use LoRA.
+    config: str = "pi0_uav_low_mem_finetune"
+    # Checkpoint directory. Random weights are used if not provided.
+    checkpoint_dir: str | None = None
+    # Use the dummy gemma variants (random weights only), e.g. to run on a small machine.
+    dummy: bool = False
+
+    batch_size: int = 1
+    num_steps: int = 10
+    # Number of timed calls per model.
+    iterations: int = 20
+
+
+def _timed(fn, iterations: int) -> tuple[float, jax.Array]:
+    out = jax.block_until_ready(fn())  # Compile.
+    start = time.perf_counter()
+    for _ in range(iterations):
+        out = jax.block_until_ready(fn())
+    return (time.perf_counter() - start) / iterations * 1000, out
+
+
+def _device_memory_gb() -> float | None:
+    stats = jax.devices()[0].memory_stats()
+    return stats["bytes_in_use"] / 1024**3 if stats else None
+
+
+def main(args: Args) -> None:
+    model_config = _config.get_config(args.config).model
+    if not isinstance(model_config, pi0.Pi0Config):
+        raise ValueError(f"Config {args.config} is not a pi0 config.")
+
+    key = jax.random.key(0)
+    if args.checkpoint_dir is not None:
+        checkpoint_dir = download.maybe_download(args.checkpoint_dir)
+        params = _model.stream_params(checkpoint_dir / "params", dtype=jnp.bfloat16)
+    else:
+        if args.dummy:
+            model_config = dataclasses.replace(
+                model_config, paligemma_variant="dummy_lora", action_expert_variant="dummy_lora"
+            )
+        params = nnx.state(model_config.create(key)).to_pure_dict()
+        params = jax.tree.map(lambda x: x.astype(jnp.bfloat16), params)
+    merged_config = model_config.without_lora()
+    if merged_config == model_config:
+        raise ValueError(f"Config {args.config} does not use LoRA.")
+
+    obs = model_config.fake_obs(args.batch_size)
+    results = {}
+    for name, config, model_params in [
+        ("LoRA", model_config, params),
+        ("merged", merged_config, model_config.merge_lora_params(params)),
+    ]:
+        model = config.load(model_params)
+        sample_actions = nnx_utils.module_jit(model.sample_actions)
+        call = functools.partial(sample_actions, key, obs, num_steps=args.num_steps)
+        latency_ms, actions = _timed(call, args.iterations)
+        params_gb = sum(x.nbytes for x in jax.tree.leaves(model_params)) / 1024**3
+        results[name] = (latency_ms, params_gb, _device_memory_gb(), np.asarray(actions))
+        del model, sample_actions, call
+
+    for name, (latency_ms, params_gb, memory_gb, _) in results.items():
+        memory = "n/a" if memory_gb is None else f"{memory_gb:.2f} GB"
+        logging.info(f"{name:>6}: {latency_ms:8.1f} ms/call, {params_gb:6.3f} GB of params, device memory {memory}")
+    speedup = results["LoRA"][0] / results["merged"][0]
+    difference = np.max(np.abs(results["merged"][3] - results["LoRA"][3]))
+    logging.info(f"Speedup: {speedup:.2f}x, max abs difference of the actions: {difference:.2e}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, force=True)
+    main(tyro.cli(Args))
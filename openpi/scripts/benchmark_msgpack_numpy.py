@@ -0,0 +1,104 @@
+"""Measures the throughput of msgpack_numpy protocol 1 (arrays inside the msgpack stream) and protocol 2 (arrays as
+out of band frames), for the codec alone and for a round trip through WebsocketPolicyServer on localhost.
+
+The observation mimics the UAV policy inputs: a batch of camera images, a state vector and a prompt. The server echoes
+the images back, so every round trip moves the image bytes twice.
+"""
+
+import dataclasses
+import logging
+import socket
+import threading
+import time
+
+import numpy as np
+from openpi_client import base_policy as _base_policy
+from openpi_client import msgpack_numpy
+from openpi_client import websocket_client_policy
+import tyro
+import websockets.sync.client
+
+from openpi.serving import websocket_policy_server
+
+
+@dataclasses.dataclass
+class Args:
+    # Image batch of the observation.
+    num_images: int = 3
+    height: int = 224
+    width: int = 224
+    # Number of timed encode/decode calls and round trips per protocol.
+    iterations: int = 100
+
+
+class _EchoPolicy(_base_policy.BasePolicy):
+    def infer(self, obs: dict) -> dict:
+        return {"images": obs["images"], "actions": np.zeros((10, 4), dtype=np.float32)}
+
+
+def _throughput(fn, num_bytes: int, iterations: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return num_bytes * iterations / (time.perf_counter() - start)
+
+
+def _codec(obs: dict, protocol: int):
+    if protocol == 1:
+        return lambda: msgpack_numpy.unpackb(msgpack_numpy.packb(obs))
+
+    def roundtrip():
+        # Frames arrive as bytes on the other end.
+        header, *frames = msgpack_numpy.pack_frames(obs)
+        return msgpack_numpy.unpack_frames(header, [bytes(frame) for frame in frames])
+
+    return roundtrip
+
+
+def _serve() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        port = sock.getsockname()[1]
+    server = websocket_policy_server.WebsocketPolicyServer(_EchoPolicy(), "localhost", port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return port
+
+
+def _protocol_1_client(port: int):
+    # A client that predates protocol negotiation.
+    conn = websockets.sync.client.connect(f"ws://localhost:{port}", compression=None, max_size=None)
+    conn.recv()
+
+    def infer(obs: dict) -> dict:
+        conn.send(msgpack_numpy.packb(obs))
+        return msgpack_numpy.unpackb(conn.recv())
+
+    return infer
+
+
+def main(args: Args) -> None:
+    obs = {
+        "images": np.random.randint(0, 256, (args.num_images, args.height, args.width, 3), dtype=np.uint8),
+        "state": np.random.rand(8).astype(np.float32),
+        "prompt": "fly to the red building",
+    }
+    num_bytes = obs["images"].nbytes
+    logging.info(f"Observation: {num_bytes / 1e6:.2f} MB of images")
+
+    for protocol in (1, 2):
+        rate = _throughput(_codec(obs, protocol), num_bytes, args.iterations)
+        logging.info(f"protocol {protocol} codec:     {rate / 1e9:6.2f} GB/s")
+
+    port = _serve()
+    v2_client = websocket_client_policy.WebsocketClientPolicy("localhost", port)
+    clients = {1: _protocol_1_client(port), 2: v2_client.infer}
+    for protocol, infer in clients.items():
+        # Images are sent to the server and back.
+        rate = _throughput(lambda infer=infer: infer(obs), 2 * num_bytes, args.iterations)
+        logging.info(f"protocol {protocol} websocket: {rate / 1e9:6.2f} GB/s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, force=True)
+    main(tyro.cli(Args))
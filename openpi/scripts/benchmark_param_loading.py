@@ -0,0 +1,86 @@
+"""Measures the load time and peak host memory of restoring the params of a checkpoint for inference.
+
+Compares `restore_params`, which restores the whole params tree on the host before moving it to the device, with
+`stream_params`, which reads, casts and moves one array at a time (`create_trained_policy(stream_params=True)`).
+Every loader runs in a fresh process so that the peak RSS only covers its own allocations.
+"""
+
+import dataclasses
+import logging
+import multiprocessing
+import pathlib
+import tempfile
+import time
+
+from flax import nnx
+import jax
+import jax.numpy as jnp
+import orbax.checkpoint as ocp
+import tyro
+
+from openpi.models import model as _model
+from openpi.shared import download
+from openpi.training import config as _config
+
+LOADERS = {"restore_params": _model.restore_params, "stream_params": _model.stream_params}
+
+
+@dataclasses.dataclass
+class Args:
+    # Training config name (only used to create random params).
+    config: str = "pi0_uav_low_mem_finetune"
+    # Checkpoint directory. Random params are saved to a temporary directory if not provided.
+    checkpoint_dir: str | None = None
+    # Use the dummy gemma variants for the random params, e.g. to run on a small machine.
+    dummy: bool = False
+    # Cast the params to bfloat16, like `create_trained_policy` does.
+    bfloat16: bool = True
+
+
+def _peak_rss_gb() -> float:
+    # Unlike ru_maxrss, the high water mark of the process is not inherited from the parent of a spawned process.
+    with pathlib.Path("/proc/self/status").open() as f:
+        line = next(line for line in f if line.startswith("VmHWM:"))
+    return int(line.split()[1]) / 1024**2
+
+
+def _load(loader: str, params_path: pathlib.Path, bfloat16: bool) -> tuple[float, float, float]:  # noqa: FBT001
+    jax.devices()  # Initialize the backend outside of the measurement.
+    rss_before = _peak_rss_gb()
+    start = time.perf_counter()
+    params = LOADERS[loader](params_path, dtype=jnp.bfloat16 if bfloat16 else None)
+    jax.block_until_ready(params)
+    load_time = time.perf_counter() - start
+    params_gb = sum(x.nbytes for x in jax.tree.leaves(params)) / 1024**3
+    return load_time, _peak_rss_gb() - rss_before, params_gb
+
+
+def _save_random_params(args: Args, directory: pathlib.Path) -> pathlib.Path:
+    model_config = _config.get_config(args.config).model
+    if args.dummy:
+        model_config = dataclasses.replace(model_config, paligemma_variant="dummy", action_expert_variant="dummy")
+    params = nnx.state(model_config.create(jax.random.key(0))).to_pure_dict()
+    with ocp.PyTreeCheckpointer() as ckptr:
+        ckptr.save(directory / "params", {"params": params})
+    return directory / "params"
+
+
+def main(args: Args) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.checkpoint_dir is not None:
+            params_path = download.maybe_download(args.checkpoint_dir) / "params"
+        else:
+            params_path = _save_random_params(args, pathlib.Path(tmp_dir))
+
+        context = multiprocessing.get_context("spawn")
+        for loader in LOADERS:
+            with context.Pool(1) as pool:
+                load_time, peak_gb, params_gb = pool.apply(_load, (loader, params_path, args.bfloat16))
+            logging.info(
+                f"{loader:>15}: {load_time:6.1f} s, peak RSS +{peak_gb:5.2f} GB for {params_gb:5.2f} GB of params"
+            )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, force=True)
+    main(tyro.cli(Args))
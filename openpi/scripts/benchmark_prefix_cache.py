@@ -0,0 +1,80 @@
+"""Measures the latency of Pi0.sample_actions with and without reusing the embeddings of static images.
+
+In the UAV evaluation the reference image (and the unused right wrist slot) stay the same for a whole episode, so
+their SigLIP embeddings only need to be computed once per episode (see `Policy(static_images=...)`).
+"""
+
+import dataclasses
+import logging
+import time
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+import tyro
+
+from openpi.models import model as _model
+from openpi.models import pi0
+from openpi.shared import download
+from openpi.shared import nnx_utils
+from openpi.training import config as _config
+
+
+@dataclasses.dataclass
+class Args:
+    # Training config name.
+    config: str = "pi0_uav_low_mem_finetune"
+    # Checkpoint directory. Random weights are used if not provided.
+    checkpoint_dir: str | None = None
+    # Use the dummy gemma variants (random weights only), e.g. to run on a small machine.
+    dummy: bool = False
+    # Images that stay the same over an episode.
+    static_images: tuple[str, ...] = ("left_wrist_0_rgb", "right_wrist_0_rgb")
+
+    batch_size: int = 1
+    num_steps: int = 10
+    # Number of timed calls per mode.
+    iterations: int = 20
+
+
+def _timed(fn, iterations: int) -> tuple[float, jax.Array]:
+    out = jax.block_until_ready(fn())  # Compile.
+    start = time.perf_counter()
+    for _ in range(iterations):
+        out = jax.block_until_ready(fn())
+    return (time.perf_counter() - start) / iterations * 1000, out
+
+
+def main(args: Args) -> None:
+    model_config = _config.get_config(args.config).model
+    if not isinstance(model_config, pi0.Pi0Config):
+        raise ValueError(f"Config {args.config} is not a pi0 config.")
+
+    key = jax.random.key(0)
+    if args.checkpoint_dir is not None:
+        checkpoint_dir = download.maybe_download(args.checkpoint_dir)
+        model = model_config.load(_model.restore_params(checkpoint_dir / "params", dtype=jnp.bfloat16))
+    else:
+        if args.dummy:
+            model_config = dataclasses.replace(model_config, paligemma_variant="dummy", action_expert_variant="dummy")
+        model = model_config.create(key)
+
+    obs = model_config.fake_obs(args.batch_size)
+    sample_actions = nnx_utils.module_jit(model.sample_actions)
+    embed_images = nnx_utils.module_jit(model.embed_images, static_argnames="names")
+
+    full_ms, expected = _timed(lambda: sample_actions(key, obs, num_steps=args.num_steps), args.iterations)
+    embed_ms, image_tokens = _timed(lambda: embed_images(obs, names=args.static_images), args.iterations)
+    cached_ms, actual = _timed(
+        lambda: sample_actions(key, obs, num_steps=args.num_steps, image_tokens=image_tokens), args.iterations
+    )
+
+    logging.info(f"Full prefix:           {full_ms:8.1f} ms/call")
+    logging.info(f"Cached static images:  {cached_ms:8.1f} ms/call ({full_ms / cached_ms:.2f}x)")
+    logging.info(f"Embed static images:   {embed_ms:8.1f} ms/episode")
+    logging.info(f"Max abs difference:    {float(np.max(np.abs(np.asarray(actual) - np.asarray(expected)))):.2e}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, force=True)
+    main(tyro.cli(Args))
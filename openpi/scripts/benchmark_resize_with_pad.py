@@ -0,0 +1,56 @@
+"""Measures the throughput of `openpi_client.image_tools.resize_with_pad` on batches of camera frames.
+
+Compares it with the previous implementation, which resized the images one after the other and pasted each onto a new
+zero image before stacking them.
+"""
+
+import dataclasses
+import logging
+import time
+
+import numpy as np
+from openpi_client import image_tools
+from openpi_client import image_tools_test
+import tyro
+
+
+@dataclasses.dataclass
+class Args:
+    batch_size: int = 8
+    # Input frame size.
+    frame_height: int = 720
+    frame_width: int = 1280
+    # Model input size.
+    height: int = 224
+    width: int = 224
+    # Number of timed calls per implementation.
+    iterations: int = 20
+
+
+def _resize_with_pad_per_image(images: np.ndarray, height: int, width: int) -> np.ndarray:
+    return np.stack([image_tools_test.resize_with_pad_reference(image, height, width) for image in images])
+
+
+def _timed(fn, iterations: int) -> tuple[float, np.ndarray]:
+    out = fn()  # Warm up.
+    start = time.perf_counter()
+    for _ in range(iterations):
+        out = fn()
+    return (time.perf_counter() - start) / iterations, out
+
+
+def main(args: Args) -> None:
+    rng = np.random.default_rng(0)
+    images = rng.integers(0, 256, (args.batch_size, args.frame_height, args.frame_width, 3), dtype=np.uint8)
+
+    per_image_s, expected = _timed(lambda: _resize_with_pad_per_image(images, args.height, args.width), args.iterations)
+    batched_s, actual = _timed(lambda: image_tools.resize_with_pad(images, args.height, args.width), args.iterations)
+
+    logging.info(f"Per image: {args.batch_size / per_image_s:8.1f} images/s")
+    logging.info(f"Batched:   {args.batch_size / batched_s:8.1f} images/s ({per_image_s / batched_s:.2f}x)")
+    logging.info(f"Identical: {np.array_equal(actual, expected)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, force=True)
+    main(tyro.cli(Args))
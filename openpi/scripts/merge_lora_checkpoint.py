@@ -0,0 +1,67 @@
+"""Merges the LoRA adapters of a trained pi0 checkpoint into the base weights.
+
+The merged checkpoint holds the params of the model without adapters (e.g. "gemma_2b" instead of "gemma_2b_lora") and
+a copy of the norm stats. `create_trained_policy(merge_lora=True)` merges the adapters at load time, a merged checkpoint
+saves that step and the adapter params on disk, e.g.:
+
+    uv run scripts/merge_lora_checkpoint.py --checkpoint-dir checkpoints/pi0_uav_low_mem_finetune/uav/29999
+
+Load the merged checkpoint with `create_trained_policy(..., merge_lora=True)` as well, so that the model is created
+without adapters.
+"""
+
+import dataclasses
+import logging
+import pathlib
+import shutil
+
+import jax
+import numpy as np
+import orbax.checkpoint as ocp
+import tyro
+
+from openpi.models import model as _model
+from openpi.models import pi0
+from openpi.shared import download
+from openpi.training import config as _config
+
+
+@dataclasses.dataclass
+class Args:
+    # Checkpoint directory of the trained model.
+    checkpoint_dir: str
+    # Training config name.
+    config: str = "pi0_uav_low_mem_finetune"
+    # Output directory. Defaults to the checkpoint directory with a "_merged" suffix.
+    output_dir: str | None = None
+
+
+def main(args: Args) -> None:
+    model_config = _config.get_config(args.config).model
+    if not isinstance(model_config, pi0.Pi0Config):
+        raise ValueError(f"Config {args.config} is not a pi0 config.")
+
+    checkpoint_dir = download.maybe_download(args.checkpoint_dir)
+    output_dir = pathlib.Path(args.output_dir or f"{str(checkpoint_dir).rstrip('/')}_merged").resolve()
+    if output_dir.exists():
+        raise FileExistsError(f"Output directory {output_dir} already exists.")
+
+    logging.info(f"Loading params from {checkpoint_dir}")
+    params = _model.restore_params(checkpoint_dir / "params", restore_type=np.ndarray)
+    merged = jax.tree.map(np.asarray, model_config.merge_lora_params(params))
+    # Make sure the merged params fit the model without adapters.
+    model_config.without_lora().load(merged)
+
+    with ocp.PyTreeCheckpointer() as ckptr:
+        ckptr.save(output_dir / "params", {"params": merged})
+    if (checkpoint_dir / "assets").exists():
+        shutil.copytree(checkpoint_dir / "assets", output_dir / "assets")
+
+    num_params = sum(x.size for x in jax.tree.leaves(params))
+    num_merged = sum(x.size for x in jax.tree.leaves(merged))
+    logging.info(f"Saved {output_dir}: {num_params / 1e6:.1f}M -> {num_merged / 1e6:.1f}M params")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, force=True)
+    main(tyro.cli(Args))
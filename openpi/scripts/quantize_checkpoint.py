@@ -0,0 +1,82 @@
+"""Converts a trained checkpoint for weight-only quantized inference.
+
+The gemma attention and feed forward weights and the SigLIP encoder block weights are quantized to int8 (or int4) with
+one scale per output channel (see `openpi.models.quantization`). The converted checkpoint holds the params and a copy
+of the norm stats, so it can be served with `create_trained_policy` and the same train config with the model's
+`quantization` set. LoRA adapters are merged into the base weights first (see `Pi0Config.merge_lora_params`), so
+checkpoints of LoRA configs are served with `merge_lora=True`. Example:
+
+    uv run scripts/quantize_checkpoint.py --checkpoint-dir checkpoints/pi0_uav_low_mem_finetune/uav/29999
+"""
+
+import dataclasses
+import logging
+import pathlib
+import shutil
+
+from flax import nnx
+import jax
+import jax.numpy as jnp
+import numpy as np
+import orbax.checkpoint as ocp
+import tyro
+
+from openpi.models import model as _model
+from openpi.models import pi0
+from openpi.models import quantization as _quantization
+from openpi.shared import array_typing as at
+from openpi.shared import download
+from openpi.training import config as _config
+
+
+@dataclasses.dataclass
+class Args:
+    # Checkpoint directory of the trained model.
+    checkpoint_dir: str
+    # Training config name.
+    config: str = "pi0_uav_low_mem_finetune"
+    quantization: _quantization.Quantization = "int8"
+    # Output directory. Defaults to the checkpoint directory with a "_<quantization>" suffix.
+    output_dir: str | None = None
+
+
+def _nbytes(params: at.Params) -> int:
+    # numpy counts a byte per int4 value, the device packs two into a byte.
+    return sum(x.size // 2 if x.dtype == jnp.int4 else x.nbytes for x in jax.tree.leaves(params))
+
+
+def main(args: Args) -> None:
+    model_config = _config.get_config(args.config).model
+    if not isinstance(model_config, pi0.Pi0Config):
+        raise ValueError(f"Config {args.config} is not a pi0 config.")
+
+    checkpoint_dir = download.maybe_download(args.checkpoint_dir)
+    output_dir = pathlib.Path(args.output_dir or f"{str(checkpoint_dir).rstrip('/')}_{args.quantization}").resolve()
+    if output_dir.exists():
+        raise FileExistsError(f"Output directory {output_dir} already exists.")
+
+    logging.info(f"Loading params from {checkpoint_dir}")
+    params = _model.restore_params(checkpoint_dir / "params", restore_type=np.ndarray)
+    # LoRA adapters can't be added to integer weights, they are merged into the base weights before quantizing.
+    params = jax.tree.map(np.asarray, model_config.merge_lora_params(params))
+    model_config = dataclasses.replace(model_config.without_lora(), quantization=args.quantization)
+    spec = nnx.state(nnx.eval_shape(model_config.create, jax.random.key(0))).to_pure_dict()
+    quantized = _quantization.quantize_params(params, spec, args.quantization)
+    # Make sure the converted params fit the quantized model.
+    model_config.load(quantized)
+
+    with ocp.PyTreeCheckpointer() as ckptr:
+        ckptr.save(output_dir / "params", {"params": quantized})
+    if (checkpoint_dir / "assets").exists():
+        shutil.copytree(checkpoint_dir / "assets", output_dir / "assets")
+
+    num_quantized = sum(1 for x in jax.tree.leaves(quantized) if jnp.issubdtype(x.dtype, jnp.integer))
+    logging.info(
+        f"Saved {output_dir}: {_nbytes(params) / 1024**3:.2f} GB -> {_nbytes(quantized) / 1024**3:.2f} GB of params "
+        f"({num_quantized} quantized weights)"
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, force=True)
+    main(tyro.cli(Args))
@@ -27,14 +27,17 @@ We follow this einsum axis naming convention:
 
 from collections.abc import Sequence
 import dataclasses
+import re
 from typing import Literal, TypeAlias
 
 import einops
+from flax import traverse_util
 import flax.linen as nn
 import jax
 import jax.numpy as jnp
 
 import openpi.models.lora as lora
+import openpi.models.quantization as _quantization
 import openpi.shared.array_typing as at
 import openpi.training.sharding as sharding
 
@@ -50,9 +53,11 @@ class Config:
     num_kv_heads: int
     head_dim: int
     lora_configs: dict[str, lora.LoRAConfig] = dataclasses.field(default_factory=dict)
+    # If not None, the attention and feed forward weights may be quantized (see `openpi.models.quantization`).
+    quantization: _quantization.Quantization | None = None
 
 
-Variant = Literal["dummy", "gemma_300m", "gemma_2b", "gemma_2b_lora"]
+Variant = Literal["dummy", "dummy_lora", "gemma_300m", "gemma_2b", "gemma_2b_lora"]
 
 
 def get_config(variant: Variant) -> Config:
@@ -66,6 +71,16 @@ def get_config(variant: Variant) -> Config:
             num_kv_heads=1,
             head_dim=16,
         )
+    if variant == "dummy_lora":
+        return Config(
+            width=64,
+            depth=4,
+            mlp_dim=128,
+            num_heads=8,
+            num_kv_heads=1,
+            head_dim=16,
+            lora_configs={"attn": lora.LoRAConfig(rank=4, alpha=8.0), "ffn": lora.LoRAConfig(rank=4, alpha=8.0)},
+        )
     if variant == "gemma_300m":
         # 311M params
         return Config(
@@ -109,6 +124,41 @@ def get_config(variant: Variant) -> Config:
     raise ValueError(f"Unknown variant: {variant}")
 
 
+# Eqns of the attention einsums, see `Attention`.
+_ATTENTION_EQNS = {
+    "qkv_einsum": "BSD,3KDH->3BSKH",
+    "q_einsum": "BTD,NDH->BTNH",
+    "kv_einsum": "BSD,2KDH->2BSKH",
+    "attn_vec_einsum": "BTNH,NHD->BTD",
+}
+
+
+def merge_lora_params(params: at.Params, configs: Sequence[Config]) -> at.Params:
+    """Folds the LoRA adapters in the params of a `Module` into the base weights.
+
+    The merged params belong to the same module without `lora_configs` (e.g. the "gemma_2b" variant for
+    "gemma_2b_lora"), which skips the low rank matmuls. Params without LoRA adapters are returned unchanged.
+    """
+    flat_params = traverse_util.flatten_dict(params)
+    for path in [path for path in flat_params if path[-1].endswith("lora_a")]:
+        *parent, name = path
+        lora_a = flat_params.pop(path)
+        lora_b = flat_params.pop((*parent, name.removesuffix("lora_a") + "lora_b"))
+        if name == "lora_a":
+            # Attention einsum, e.g. "layers/attn/q_einsum_1/lora_a" of the second expert.
+            weight_path = (*parent, "w")
+            einsum, expert = re.fullmatch(r"(.*?)(?:_(\d+))?", parent[-1]).groups()  # type: ignore[union-attr]
+            lora_config = configs[int(expert or 0)].lora_configs["attn"]
+            flat_params[weight_path] = lora.merge_einsum(
+                _ATTENTION_EQNS[einsum], flat_params[weight_path], lora_a, lora_b, lora_config
+            )
+        else:
+            # Feed forward weight, e.g. "layers/mlp_1/gating_einsum_lora_a".
+            weight_path = (*parent, name.removesuffix("_lora_a"))
+            flat_params[weight_path] = lora.merge_feed_forward(flat_params[weight_path], lora_a, lora_b)
+    return traverse_util.unflatten_dict(flat_params)
+
+
 @at.typecheck
 class RMSNorm(nn.Module):
     @nn.compact
@@ -171,6 +221,7 @@ class Attention(nn.Module):
                     name=_name("qkv_einsum", i),
                     init_fn=nn.initializers.lecun_normal(in_axis=-2, out_axis=-1, batch_axis=(0, 1)),
                     lora_config=config.lora_configs.get("attn"),
+                    quantization=config.quantization,
                 )
                 qkvs.append(qkv_einsum("BSD,3KDH->3BSKH", x))
             else:
@@ -179,6 +230,7 @@ class Attention(nn.Module):
                     name=_name("q_einsum", i),
                     init_fn=nn.initializers.lecun_normal(in_axis=-2, out_axis=-1, batch_axis=(0,)),
                     lora_config=config.lora_configs.get("attn"),
+                    quantization=config.quantization,
                 )
                 q = q_einsum("BTD,NDH->BTNH", x)
                 kv_einsum = lora.Einsum(
@@ -186,6 +238,7 @@ class Attention(nn.Module):
                     name=_name("kv_einsum", i),
                     init_fn=nn.initializers.lecun_normal(in_axis=-2, out_axis=-1, batch_axis=(0, 1)),
                     lora_config=config.lora_configs.get("attn"),
+                    quantization=config.quantization,
                 )
                 k, v = kv_einsum("BSD,2KDH->2BSKH", x)
                 qkvs.append((q, k, v))
@@ -232,6 +285,7 @@ class Attention(nn.Module):
                     name=_name("attn_vec_einsum", i),
                     init_fn=nn.initializers.lecun_normal(in_axis=(-3, -2), out_axis=-1),
                     lora_config=config.lora_configs.get("attn"),
+                    quantization=config.quantization,
                 )
                 out.append(out_einsum("BTNH,NHD->BTD", encoded[:, start:end]))
                 start = end
@@ -310,6 +364,7 @@ class Block(nn.Module):
                     hidden_dim=config.mlp_dim,
                     name=_name("mlp", i),
                     lora_config=config.lora_configs.get("ffn"),
+                    quantization=config.quantization,
                 )(x)
             out.append(x)
 
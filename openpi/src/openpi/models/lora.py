@@ -1,10 +1,13 @@
+import functools
 import math
 import re
 
 import flax.linen as nn
 import flax.struct as struct
+import jax
 import jax.numpy as jnp
 
+import openpi.models.quantization as _quantization
 import openpi.shared.array_typing as at
 
 
@@ -39,6 +42,8 @@ class Einsum(nn.Module):
     init_fn: nn.initializers.Initializer = nn.initializers.zeros
     # If not None, apply LoRA to the weight.
     lora_config: LoRAConfig | None = None
+    # If not None, the weight may be quantized (see `openpi.models.quantization`).
+    quantization: _quantization.Quantization | None = None
 
     def setup(self):
         self.w = self.param("w", self.init_fn, self.shape)
@@ -54,36 +59,21 @@ class Einsum(nn.Module):
     @nn.compact
     def __call__(self, eqn: str, x):
         dtype = x.dtype  # original dtype, could be half-precision
-        result = jnp.einsum(eqn, x, self.w.astype(dtype))
+        if self.quantization is None:
+            w = self.w.astype(dtype)
+        else:
+            shape = _quantization.scale_shape(self.shape, _quantization.einsum_contracting_axes(eqn))
+            w = _quantization.dequantize(self.w, self.param("w_scale", nn.initializers.ones, shape), dtype)
+        result = jnp.einsum(eqn, x, w)
 
         if config := self.lora_config:
-            eqn_a, eqn_b = self._make_lora_eqns(eqn)
+            eqn_a, eqn_b = _make_lora_eqns(eqn, config)
             lora = jnp.einsum(eqn_a, x, self.w_a.astype(dtype))
             lora = jnp.einsum(eqn_b, lora, self.w_b.astype(dtype))
             result = result + lora * config.scaling_value
 
         return result
 
-    def _make_lora_eqns(self, eqn: str) -> tuple[str, str]:
-        if "L" in eqn:
-            raise ValueError(f"L already in eqn: {eqn}")
-        if not (m := re.match("(.*),(.*)->(.*)", eqn)):
-            raise ValueError(f"Unsupported einsum eqn: {eqn}")
-        lhs, rhs, out = m.groups()
-
-        assert self.lora_config is not None
-        a_label, b_label = (rhs[x] for x in self.lora_config.axes)
-        label = self.lora_config.label
-
-        a_rhs = rhs.replace(b_label, label)
-        a_out = out.replace(b_label, label)
-        eqn_a = f"{lhs},{a_rhs}->{a_out}"
-
-        b_rhs = rhs.replace(a_label, label)
-        eqn_b = f"{a_out},{b_rhs}->{out}"
-
-        return eqn_a, eqn_b
-
 
 class FeedForward(nn.Module):
     """Feed forward module."""
@@ -92,6 +82,8 @@ class FeedForward(nn.Module):
     hidden_dim: int
     # If not None, apply LoRA to the weight.
     lora_config: LoRAConfig | None = None
+    # If not None, the weights may be quantized (see `openpi.models.quantization`).
+    quantization: _quantization.Quantization | None = None
 
     def setup(self):
         self.w_gating = self.param(
@@ -104,6 +96,11 @@ class FeedForward(nn.Module):
             nn.initializers.lecun_normal(in_axis=-2, out_axis=-1),
             (self.hidden_dim, self.features),
         )
+        self.w_gating_scale = None
+        self.w_linear_scale = None
+        if self.quantization is not None:
+            self.w_gating_scale = self.param("gating_einsum_scale", nn.initializers.ones, (2, 1, self.hidden_dim))
+            self.w_linear_scale = self.param("linear_scale", nn.initializers.ones, (1, self.features))
         self.w_gating_lora = None
         self.w_linear_lora = None
         if self.lora_config:
@@ -123,26 +120,92 @@ class FeedForward(nn.Module):
     @nn.compact
     def __call__(self, x):
         dtype = x.dtype  # original dtype, could be half-precision
+        w_gating = self._weight(self.w_gating, self.w_gating_scale, dtype)
         ff_gate = self._dot(
             x,
-            self.w_gating[0],
+            w_gating[0],
             None if self.w_gating_lora is None else (self.w_gating_lora[0][0], self.w_gating_lora[1][0]),
         )
         gate_value = nn.gelu(ff_gate)
 
         ff1 = self._dot(
             x,
-            self.w_gating[1],
+            w_gating[1],
             None if self.w_gating_lora is None else (self.w_gating_lora[0][1], self.w_gating_lora[1][1]),
         )
         activations = gate_value * ff1
 
-        outputs = self._dot(activations, self.w_linear, self.w_linear_lora)
+        outputs = self._dot(activations, self._weight(self.w_linear, self.w_linear_scale, dtype), self.w_linear_lora)
         assert outputs.dtype == dtype
         return outputs
 
+    def _weight(self, w: at.Array, scale: at.Array | None, dtype) -> at.Array:
+        if scale is None:
+            return w.astype(dtype)
+        return _quantization.dequantize(w, scale, dtype)
+
     def _dot(self, x: at.Array, w: at.Array, lora_weights: tuple[at.Array, at.Array] | None) -> at.Array:
         base = jnp.dot(x, w.astype(x.dtype))
         if lora_weights is None:
             return base
         return base + jnp.dot(jnp.dot(x, lora_weights[0].astype(x.dtype)), lora_weights[1].astype(x.dtype))
+
+
+def merge_einsum(eqn: str, w: at.Array, lora_a: at.Array, lora_b: at.Array, config: LoRAConfig) -> at.Array:
+    """Folds the LoRA weights of an `Einsum` called with `eqn` into its weight.
+
+    The result replaces `w` in the same `Einsum` without LoRA, which then skips the low rank einsums. Leading axes that
+    the weights have on top of the eqn (e.g. the layers of a scanned module) are batched.
+    """
+    eqn_a, eqn_b = _make_lora_eqns(eqn, config)
+    lhs, a_rhs, a_out = _split_eqn(eqn_a)
+    _, b_rhs, out = _split_eqn(eqn_b)
+    _, rhs, _ = _split_eqn(eqn)
+    # Labels that only one of the LoRA einsums contracts are summed over that LoRA weight alone.
+    a_labels = "".join(label for label in a_rhs if label in lhs + a_out)
+    b_labels = "".join(label for label in b_rhs if label in a_out + out)
+    return _merge(f"{a_rhs}->{a_labels},{b_rhs}->{b_labels},{rhs}", w, lora_a, lora_b, config.scaling_value)
+
+
+def merge_feed_forward(w: at.Array, lora_a: at.Array, lora_b: at.Array) -> at.Array:
+    """Folds the LoRA weights of a `FeedForward` weight (e.g. "gating_einsum") into it, like `merge_einsum`."""
+    return _merge("ij->ij,jk->jk,ik", w, lora_a, lora_b, 1.0)
+
+
+@functools.partial(jax.jit, static_argnums=(0, 4))
+def _merge(eqns: str, w: at.Array, lora_a: at.Array, lora_b: at.Array, scaling: float) -> at.Array:
+    if not jnp.issubdtype(w.dtype, jnp.floating):
+        raise ValueError(f"Cannot merge LoRA weights into a weight of dtype {w.dtype}, merge before quantizing.")
+    reduce_a, reduce_b, rhs = eqns.split(",")
+    if w.ndim > len(rhs):
+        # Merge one slice (e.g. layer) at a time, so the float32 temporaries stay small.
+        return jax.lax.map(lambda ws: _merge(eqns, *ws, scaling), (w, lora_a, lora_b))
+    a = jnp.einsum(reduce_a, lora_a.astype(jnp.float32))
+    b = jnp.einsum(reduce_b, lora_b.astype(jnp.float32))
+    delta = jnp.einsum(f"{reduce_a.split('->')[1]},{reduce_b.split('->')[1]}->{rhs}", a, b)
+    return (w.astype(jnp.float32) + delta * scaling).astype(w.dtype)
+
+
+def _make_lora_eqns(eqn: str, config: LoRAConfig) -> tuple[str, str]:
+    if "L" in eqn:
+        raise ValueError(f"L already in eqn: {eqn}")
+    lhs, rhs, out = _split_eqn(eqn)
+
+    a_label, b_label = (rhs[x] for x in config.axes)
+    label = config.label
+
+    a_rhs = rhs.replace(b_label, label)
+    a_out = out.replace(b_label, label)
+    eqn_a = f"{lhs},{a_rhs}->{a_out}"
+
+    b_rhs = rhs.replace(a_label, label)
+    eqn_b = f"{a_out},{b_rhs}->{out}"
+
+    return eqn_a, eqn_b
+
+
+def _split_eqn(eqn: str) -> tuple[str, str, str]:
+    if not (m := re.match("(.*),(.*)->(.*)", eqn)):
+        raise ValueError(f"Unsupported einsum eqn: {eqn}")
+    lhs, rhs, out = m.groups()
+    return lhs, rhs, out
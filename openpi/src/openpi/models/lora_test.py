@@ -1,6 +1,8 @@
 import flax.linen as nn
 import jax
 import jax.numpy as jnp
+import numpy as np
+import pytest
 
 import openpi.models.lora as lora
 
@@ -92,3 +94,43 @@ def test_lora_ffn_same_output():
     output_lora = ffn_lora.apply(params_lora, x)
 
     assert jnp.allclose(output, output_lora)
+
+
+@pytest.mark.parametrize(
+    ("eqn", "shape", "x_shape"),
+    [
+        ("BSD,3KDH->3BSKH", (3, 8, 32, 4), (8, 64, 32)),
+        # The second LoRA einsum of the attention output contracts the heads of lora_b alone.
+        ("BTNH,NHD->BTD", (4, 8, 32), (8, 16, 4, 8)),
+    ],
+)
+def test_merge_einsum(eqn: str, shape: tuple[int, ...], x_shape: tuple[int, ...]):
+    x = jax.random.normal(jax.random.key(1), x_shape)
+    config = lora.LoRAConfig(rank=2, alpha=4.0, init_fn=nn.initializers.normal(stddev=0.1))
+    einsum = lora.Einsum(shape)
+    einsum_lora = lora.Einsum(shape, init_fn=nn.initializers.lecun_normal(), lora_config=config)
+
+    params = einsum_lora.init(jax.random.key(0), eqn, x)["params"]
+    w = lora.merge_einsum(eqn, params["w"], params["lora_a"], params["lora_b"], config)
+
+    expected = einsum_lora.apply({"params": params}, eqn, x)
+    np.testing.assert_allclose(einsum.apply({"params": {"w": w}}, eqn, x), expected, atol=1e-5)
+
+
+def test_merge_ffn():
+    ffn = lora.FeedForward(features=8, hidden_dim=32)
+    ffn_lora = lora.FeedForward(
+        features=8,
+        hidden_dim=32,
+        lora_config=lora.LoRAConfig(rank=2, init_fn=nn.initializers.normal(stddev=0.1)),
+    )
+    x = jax.random.normal(jax.random.key(1), (2, 8))
+
+    params = ffn_lora.init(jax.random.key(0), x)["params"]
+    merged = {
+        name: lora.merge_feed_forward(params[name], params[f"{name}_lora_a"], params[f"{name}_lora_b"])
+        for name in ("gating_einsum", "linear")
+    }
+
+    expected = ffn_lora.apply({"params": params}, x)
+    np.testing.assert_allclose(ffn.apply({"params": merged}, x), expected, atol=1e-5)
@@ -14,6 +14,7 @@ import jax
 import jax.numpy as jnp
 import numpy as np
 import orbax.checkpoint as ocp
+import tensorstore as ts
 
 from openpi.shared import image_tools
 import openpi.shared.array_typing as at
@@ -285,7 +286,8 @@ def restore_params(
     Args:
         params_path: The local path to the checkpoint directory.
         restore_type: The type to restore the params as. Can be set to `np.ndarray` to load the params as a numpy array.
-        dtype: The dtype to restore all params as. If not provided, will use the original dtype from the checkpoint.
+        dtype: The dtype to restore all floating point params as. If not provided, will use the original dtype from
+            the checkpoint.
         sharding: The sharding to use for the params. If not provided, the params will be replicated across all devices.
 
     Returns:
@@ -295,6 +297,10 @@ def restore_params(
     if not params_path.exists():
         raise FileNotFoundError(f"Model params not found at: {params_path}")
 
+    def restore_dtype(array_metadata: ocp.metadata.ArrayMetadata) -> jnp.dtype | None:
+        # Integer arrays are quantized weights (see `openpi.models.quantization`), they keep their dtype.
+        return dtype if jnp.issubdtype(array_metadata.dtype, jnp.floating) else None
+
     if restore_type is jax.Array and sharding is None:
         mesh = jax.sharding.Mesh(jax.devices(), ("x",))
         sharding = jax.sharding.NamedSharding(mesh, jax.sharding.PartitionSpec())
@@ -308,11 +314,67 @@ def restore_params(
             ocp.args.PyTreeRestore(
                 item=item,
                 restore_args=jax.tree.map(
-                    lambda _: ocp.ArrayRestoreArgs(sharding=sharding, restore_type=restore_type, dtype=dtype), item
+                    lambda meta: ocp.ArrayRestoreArgs(
+                        sharding=sharding, restore_type=restore_type, dtype=restore_dtype(meta)
+                    ),
+                    item,
                 ),
             ),
         )["params"]
 
+    return _to_pure_dict(params)
+
+
+def stream_params(
+    params_path: pathlib.Path | str,
+    *,
+    dtype: jnp.dtype | None = None,
+    sharding: jax.sharding.Sharding | None = None,
+) -> at.Params:
+    """Restores the params of a checkpoint for inference, one array at a time.
+
+    `restore_params` reads the whole tree into host memory before moving it to the device, so the host briefly holds
+    the params twice. Here every array is read from a memory map of the checkpoint files, cast to `dtype` and put on
+    the device before the next one is read. Works with local checkpoints in the default orbax format (OCDBT and zarr),
+    which includes the ones saved with `save_state` and the pre-trained checkpoints released for openpi.
+
+    Args:
+        params_path: The local path to the checkpoint directory.
+        dtype: The dtype to restore all floating point params as. If not provided, will use the original dtype from
+            the checkpoint.
+        sharding: The sharding to use for the params. If not provided, the params will be replicated across all devices.
+
+    Returns:
+        The restored params.
+    """
+    params_path = pathlib.Path(params_path).resolve()
+    if not params_path.exists():
+        raise FileNotFoundError(f"Model params not found at: {params_path}")
+
+    if sharding is None:
+        mesh = jax.sharding.Mesh(jax.devices(), ("x",))
+        sharding = jax.sharding.NamedSharding(mesh, jax.sharding.PartitionSpec())
+
+    with ocp.PyTreeCheckpointer() as ckptr:
+        metadata = ckptr.metadata(params_path)["params"]
+
+    context = ts.Context({"file_io_memmap": True})
+
+    def load(array_metadata: ocp.metadata.ArrayMetadata) -> jax.Array:
+        spec = {
+            "driver": "zarr",
+            "kvstore": {"driver": "ocdbt", "base": f"{params_path.as_uri()}/", "path": array_metadata.name},
+        }
+        array = ts.open(spec, open=True, read=True, context=context).result().read().result()
+        # Integer arrays are quantized weights (see `openpi.models.quantization`), they keep their dtype.
+        if dtype is not None and jnp.issubdtype(array.dtype, jnp.floating):
+            array = array.astype(dtype)
+        return jax.device_put(array, sharding)
+
+    return _to_pure_dict(jax.tree.map(load, metadata))
+
+
+def _to_pure_dict(params: at.Params) -> at.Params:
     # If the params were saved with `save_state` during openpi training, every key path will end with "value", which is
     # added by `nnx.State`. We remove the "value" suffix here and always return what NNX calls a "pure dict".
     flat_params = traverse_util.flatten_dict(params)
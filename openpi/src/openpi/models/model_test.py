@@ -1,5 +1,10 @@
+import pathlib
+
 from flax import nnx
 import jax
+import jax.numpy as jnp
+import numpy as np
+import orbax.checkpoint as ocp
 import pytest
 
 from openpi.models import model as _model
@@ -92,3 +97,39 @@ def test_model_restore():
 
     actions = model.sample_actions(key, obs, num_steps=10)
     assert actions.shape == (batch_size, model.action_horizon, model.action_dim)
+
+
+def test_stream_params(tmp_path: pathlib.Path):
+    # Same layout as `save_state`: the params item holds an `nnx.State`, so every key path ends with "value".
+    params = {
+        "img": {"kernel": {"value": np.random.randn(2, 3, 4).astype(np.float32)}},
+        "llm": {"embedding": {"value": np.random.randn(5, 4).astype(np.float32)}},
+    }
+    with ocp.PyTreeCheckpointer() as ckptr:
+        ckptr.save(tmp_path / "params", {"params": params})
+
+    expected = _model.restore_params(tmp_path / "params", dtype=jnp.bfloat16)
+    streamed = _model.stream_params(tmp_path / "params", dtype=jnp.bfloat16)
+
+    assert jax.tree.structure(streamed) == jax.tree.structure(expected)
+    for actual, desired in zip(jax.tree.leaves(streamed), jax.tree.leaves(expected), strict=True):
+        assert actual.dtype == jnp.bfloat16
+        np.testing.assert_array_equal(np.asarray(actual), np.asarray(desired))
+
+
+def test_restore_params_keeps_integer_dtypes(tmp_path: pathlib.Path):
+    # Quantized weights are stored as integers next to their floating point scales.
+    params = {
+        "w": {"value": np.random.randint(-127, 128, (4, 8)).astype(np.int8)},
+        "w_scale": {"value": np.random.rand(1, 8).astype(np.float32)},
+    }
+    with ocp.PyTreeCheckpointer() as ckptr:
+        ckptr.save(tmp_path / "params", {"params": params})
+
+    for restored in [
+        _model.restore_params(tmp_path / "params", dtype=jnp.bfloat16),
+        _model.stream_params(tmp_path / "params", dtype=jnp.bfloat16),
+    ]:
+        assert restored["w"].dtype == jnp.int8
+        assert restored["w_scale"].dtype == jnp.bfloat16
+        np.testing.assert_array_equal(np.asarray(restored["w"]), params["w"]["value"])
@@ -1,3 +1,4 @@
+from collections.abc import Sequence
 import dataclasses
 import logging
 
@@ -10,6 +11,8 @@ from typing_extensions import override
 
 from openpi.models import model as _model
 import openpi.models.gemma as _gemma
+import openpi.models.quantization as _quantization
+import openpi.models.sampling as _sampling
 import openpi.models.siglip as _siglip
 from openpi.shared import array_typing as at
 import openpi.shared.nnx_utils as nnx_utils
@@ -69,6 +72,8 @@ class Pi0Config(_model.BaseModelConfig):
     dtype: str = "bfloat16"
     paligemma_variant: _gemma.Variant = "gemma_2b"
     action_expert_variant: _gemma.Variant = "gemma_300m"
+    # Weight-only quantization for inference, the checkpoint must be converted with `scripts/quantize_checkpoint.py`.
+    quantization: _quantization.Quantization | None = None
 
     # Set the model specific defaults.
     action_dim: int = 32
@@ -109,6 +114,27 @@ class Pi0Config(_model.BaseModelConfig):
 
         return observation_spec, action_spec
 
+    def without_lora(self) -> "Pi0Config":
+        """Returns the config of the model with the LoRA adapters merged into the base weights.
+
+        Its params are the result of `merge_lora_params`. The "_lora" gemma variants only add the adapters to the
+        variant of the same name.
+        """
+        return dataclasses.replace(
+            self,
+            paligemma_variant=self.paligemma_variant.removesuffix("_lora"),
+            action_expert_variant=self.action_expert_variant.removesuffix("_lora"),
+        )
+
+    def merge_lora_params(self, params: at.Params) -> at.Params:
+        """Folds the LoRA adapters of the model params into the base weights, for the model of `without_lora()`.
+
+        Params that have no adapters (e.g. of an already merged checkpoint) are returned unchanged.
+        """
+        configs = [_gemma.get_config(self.paligemma_variant), _gemma.get_config(self.action_expert_variant)]
+        llm = _gemma.merge_lora_params(params["PaliGemma"]["llm"], configs)
+        return {**params, "PaliGemma": {**params["PaliGemma"], "llm": llm}}
+
     def get_freeze_filter(self) -> nnx.filterlib.Filter:
         """Returns the freeze filter based on the model config."""
         filters = []
@@ -144,8 +170,12 @@ class Pi0Config(_model.BaseModelConfig):
 class Pi0(_model.BaseModel):
     def __init__(self, config: Pi0Config, rngs: nnx.Rngs):
         super().__init__(config.action_dim, config.action_horizon, config.max_token_len)
-        paligemma_config = _gemma.get_config(config.paligemma_variant)
-        action_expert_config = _gemma.get_config(config.action_expert_variant)
+        paligemma_config = dataclasses.replace(
+            _gemma.get_config(config.paligemma_variant), quantization=config.quantization
+        )
+        action_expert_config = dataclasses.replace(
+            _gemma.get_config(config.action_expert_variant), quantization=config.quantization
+        )
         # TODO: rewrite gemma in NNX. For now, use bridge.
         llm = nnx_bridge.ToNNX(
             _gemma.Module(
@@ -161,6 +191,7 @@ class Pi0(_model.BaseModel):
                 pool_type="none",
                 scan=True,
                 dtype_mm=config.dtype,
+                quantization=config.quantization,
             )
         )
         img.lazy_init(next(iter(config.fake_obs().images.values())), train=False, rngs=rngs)
@@ -171,27 +202,42 @@ class Pi0(_model.BaseModel):
         self.action_time_mlp_out = nnx.Linear(action_expert_config.width, action_expert_config.width, rngs=rngs)
         self.action_out_proj = nnx.Linear(action_expert_config.width, config.action_dim, rngs=rngs)
 
+    def embed_images(self, obs: _model.Observation, names: Sequence[str]) -> dict[str, at.Float[at.Array, "b n emb"]]:
+        """Embeds the given images with SigLIP.
+
+        Images that stay the same over many calls (e.g. a reference image that is fixed for a whole episode) can be
+        embedded once and passed back to `sample_actions` as `image_tokens`. Only the image embeddings are reusable: the
+        prefix uses full attention between all image and language tokens, so its KV cache depends on every image and is
+        recomputed whenever one of them changes.
+        """
+        obs = _model.preprocess_observation(None, obs, train=False, image_keys=list(obs.images))
+        return {name: self.PaliGemma.img(obs.images[name], train=False)[0] for name in names}
+
     @at.typecheck
     def embed_prefix(
-        self, obs: _model.Observation
+        self, obs: _model.Observation, image_tokens: dict[str, at.Float[at.Array, "b n emb"]] | None = None
     ) -> tuple[at.Float[at.Array, "b s emb"], at.Bool[at.Array, "b s"], at.Bool[at.Array, " s"]]:
         input_mask = []
         ar_mask = []
         tokens = []
-        # embed images
+        image_tokens = image_tokens or {}
+        # embed images, unless they were embedded by `embed_images` already
         for name in obs.images:
-            image_tokens, _ = self.PaliGemma.img(obs.images[name], train=False)
+            if name in image_tokens:
+                image_tokens_ = image_tokens[name]
+            else:
+                image_tokens_, _ = self.PaliGemma.img(obs.images[name], train=False)
 
-            tokens.append(image_tokens)
+            tokens.append(image_tokens_)
             input_mask.append(
                 einops.repeat(
                     obs.image_masks[name],
                     "b -> b s",
-                    s=image_tokens.shape[1],
+                    s=image_tokens_.shape[1],
                 )
             )
             # image tokens attend to each other
-            ar_mask += [False] * image_tokens.shape[1]
+            ar_mask += [False] * image_tokens_.shape[1]
 
         # add language (aka tokenized inputs)
         if obs.tokenized_prompt is not None:
@@ -272,22 +318,31 @@ class Pi0(_model.BaseModel):
         observation: _model.Observation,
         *,
         num_steps: int | at.Int[at.Array, ""] = 10,
+        sampler: _sampling.Sampler = "euler",
+        tolerance: float | at.Float[at.Array, ""] = 1e-2,
+        image_tokens: dict[str, at.Float[at.Array, "b n emb"]] | None = None,
     ) -> _model.Actions:
-        observation = _model.preprocess_observation(None, observation, train=False)
+        """Samples an action chunk by integrating the flow from noise, see `sampling` for the available samplers.
+
+        `sampler` selects the traced code path and must be static under jit, `tolerance` only applies to "adaptive".
+        """
+        # image slots that are masked out for the whole batch may be left out of the observation altogether, which skips
+        # them in both the vision tower and the prefix (see `Policy`). they do not advance the positions either way.
+        observation = _model.preprocess_observation(
+            None, observation, train=False, image_keys=list(observation.images.keys())
+        )
         # note that we use the convention more common in diffusion literature, where t=1 is noise and t=0 is the target
         # distribution. yes, this is the opposite of the pi0 paper, and I'm sorry.
-        dt = -1.0 / num_steps
         batch_size = observation.state.shape[0]
         noise = jax.random.normal(rng, (batch_size, self.action_horizon, self.action_dim))
 
         # first fill KV cache with a forward pass of the prefix
-        prefix_tokens, prefix_mask, prefix_ar_mask = self.embed_prefix(observation)
+        prefix_tokens, prefix_mask, prefix_ar_mask = self.embed_prefix(observation, image_tokens)
         prefix_attn_mask = make_attn_mask(prefix_mask, prefix_ar_mask)
         positions = jnp.cumsum(prefix_mask, axis=1) - 1
         _, kv_cache = self.PaliGemma.llm([prefix_tokens, None], mask=prefix_attn_mask, positions=positions)
 
-        def step(carry):
-            x_t, time = carry
+        def velocity(x_t, time):
             suffix_tokens, suffix_mask, suffix_ar_mask = self.embed_suffix(
                 observation, x_t, jnp.broadcast_to(time, batch_size)
             )
@@ -312,14 +367,6 @@ class Pi0(_model.BaseModel):
                 [None, suffix_tokens], mask=full_attn_mask, positions=positions, kv_cache=kv_cache
             )
             assert prefix_out is None
-            v_t = self.action_out_proj(suffix_out[:, -self.action_horizon :])
-
-            return x_t + dt * v_t, time + dt
-
-        def cond(carry):
-            x_t, time = carry
-            # robust to floating-point error
-            return time >= -dt / 2
+            return self.action_out_proj(suffix_out[:, -self.action_horizon :])
 
-        x_0, _ = jax.lax.while_loop(cond, step, (noise, 1.0))
-        return x_0
+        return _sampling.sample(sampler, velocity, noise, num_steps=num_steps, tolerance=tolerance)
@@ -1,7 +1,14 @@
+import dataclasses
+
 import flax.nnx as nnx
 import jax
+import jax.numpy as jnp
+import numpy as np
+import pytest
 
 import openpi.models.pi0 as _pi0
+import openpi.models.quantization as _quantization
+from openpi.shared import nnx_utils
 
 
 def _get_frozen_state(config: _pi0.Pi0Config) -> nnx.State:
@@ -44,3 +51,74 @@ def test_pi0_all_lora():
     assert len(state) == 17
     assert all("lora" not in p for p in state)
     assert all("llm" in p for p in state)
+
+
+@pytest.fixture(scope="module")
+def dummy_model() -> tuple[_pi0.Pi0Config, _pi0.Pi0]:
+    # float32, so that reductions over a different number of (masked) tokens agree to tight tolerances
+    config = _pi0.Pi0Config(dtype="float32", paligemma_variant="dummy", action_expert_variant="dummy")
+    return config, config.create(jax.random.key(0))
+
+
+def test_pi0_sample_actions_image_tokens(dummy_model):
+    config, model = dummy_model
+    key = jax.random.key(0)
+    obs = config.fake_obs(batch_size=2)
+
+    static_images = ("left_wrist_0_rgb", "right_wrist_0_rgb")
+    image_tokens = nnx_utils.module_jit(model.embed_images, static_argnames="names")(obs, names=static_images)
+    assert set(image_tokens) == set(static_images)
+
+    sample_actions = nnx_utils.module_jit(model.sample_actions)
+    expected = sample_actions(key, obs, num_steps=3)
+    actual = sample_actions(key, obs, num_steps=3, image_tokens=image_tokens)
+    np.testing.assert_allclose(actual, expected, atol=1e-5)
+
+
+def test_pi0_sample_actions_without_masked_image(dummy_model):
+    config, model = dummy_model
+    key = jax.random.key(0)
+    obs = config.fake_obs(batch_size=2)
+    obs = dataclasses.replace(obs, image_masks={**obs.image_masks, "right_wrist_0_rgb": jnp.zeros(2, dtype=bool)})
+    compact_obs = dataclasses.replace(
+        obs,
+        images={name: image for name, image in obs.images.items() if name != "right_wrist_0_rgb"},
+        image_masks={name: mask for name, mask in obs.image_masks.items() if name != "right_wrist_0_rgb"},
+    )
+
+    sample_actions = nnx_utils.module_jit(model.sample_actions)
+    expected = sample_actions(key, obs, num_steps=3)
+    actual = sample_actions(key, compact_obs, num_steps=3)
+    np.testing.assert_allclose(actual, expected, atol=1e-5)
+
+
+def test_pi0_quantized(dummy_model):
+    config, model = dummy_model
+    key = jax.random.key(0)
+    obs = config.fake_obs(batch_size=2)
+
+    quantized_config = dataclasses.replace(config, quantization="int8")
+    spec = nnx.state(nnx.eval_shape(quantized_config.create, key)).to_pure_dict()
+    params = jax.tree.map(np.asarray, nnx.state(model).to_pure_dict())
+    quantized_model = quantized_config.load(_quantization.quantize_params(params, spec, "int8"))
+    assert jnp.dtype(jnp.int8) in {x.dtype for x in jax.tree.leaves(nnx.state(quantized_model))}
+
+    expected = nnx_utils.module_jit(model.sample_actions)(key, obs, num_steps=3)
+    actual = nnx_utils.module_jit(quantized_model.sample_actions)(key, obs, num_steps=3)
+    np.testing.assert_allclose(actual, expected, atol=0.1)
+
+
+def test_pi0_merge_lora():
+    config = _pi0.Pi0Config(dtype="float32", paligemma_variant="dummy_lora", action_expert_variant="dummy_lora")
+    key = jax.random.key(0)
+    obs = config.fake_obs(batch_size=2)
+    model = config.create(key)
+
+    merged_config = config.without_lora()
+    assert merged_config.paligemma_variant == "dummy"
+    merged_model = merged_config.load(config.merge_lora_params(nnx.state(model).to_pure_dict()))
+    assert not any("lora" in str(path) for path in nnx.state(merged_model).flat_state())
+
+    expected = nnx_utils.module_jit(model.sample_actions)(key, obs, num_steps=3)
+    actual = nnx_utils.module_jit(merged_model.sample_actions)(key, obs, num_steps=3)
+    np.testing.assert_allclose(actual, expected, atol=1e-4)
@@ -0,0 +1,131 @@
+"""Weight-only quantization for inference.
+
+Quantized models store the weights of the large matmuls (the gemma attention and feed forward einsums and the SigLIP
+encoder blocks) as int8 or int4 together with a float scale per output channel. The modules dequantize a weight right
+before the matmul that consumes it (`w.astype(dtype) * scale`), which XLA fuses into the matmul, so only the integer
+weights are kept in device memory. Activations stay in the model dtype.
+
+A model created from a config with `quantization` set only has the additional scale params (initialized to one) and
+otherwise behaves like the unquantized model. `quantize_params` converts the params of an unquantized checkpoint
+(see `scripts/quantize_checkpoint.py`), the integer dtype of the converted weights then determines the storage.
+"""
+
+from collections.abc import Sequence
+import re
+from typing import Any, Literal, TypeAlias
+
+from flax import traverse_util
+import flax.linen as nn
+import jax
+import jax.numpy as jnp
+import numpy as np
+
+import openpi.shared.array_typing as at
+
+Quantization: TypeAlias = Literal["int8", "int4"]
+
+# Storage dtype and largest quantized magnitude (symmetric, so -128 and -8 are never used).
+_FORMATS: dict[str, tuple[Any, int]] = {"int8": (jnp.int8, 127), "int4": (jnp.int4, 7)}
+
+# Scale params are named after their weight with a "_scale" suffix. `nn.Dense` and `nn.DenseGeneral` keep theirs in a
+# `ScaledDotGeneral` submodule named "kernel_scale".
+SCALE_SUFFIX = "_scale"
+
+
+def scale_shape(shape: Sequence[int], contracting_axes: Sequence[int]) -> tuple[int, ...]:
+    """Shape of the scales of a weight: one per output channel, i.e. the contracting axes are reduced to one."""
+    contracting_axes = [axis % len(shape) for axis in contracting_axes]
+    return tuple(1 if axis in contracting_axes else dim for axis, dim in enumerate(shape))
+
+
+def einsum_contracting_axes(eqn: str) -> tuple[int, ...]:
+    """Axes of the weight (second operand) that `eqn` contracts."""
+    if not (m := re.match("(.*),(.*)->(.*)", eqn)):
+        raise ValueError(f"Unsupported einsum eqn: {eqn}")
+    lhs, rhs, out = m.groups()
+    return tuple(axis for axis, label in enumerate(rhs) if label in lhs and label not in out)
+
+
+def dequantize(w: at.Array, scale: at.Array, dtype: Any) -> at.Array:
+    return w.astype(dtype) * scale.astype(dtype)
+
+
+class ScaledDotGeneral(nn.Module):
+    """`dot_general_cls` for `nn.Dense` and `nn.DenseGeneral` that scales the kernel before the matmul.
+
+    The dense layers have already cast the (integer) kernel to their dtype when they call it.
+    """
+
+    @nn.compact
+    def __call__(self, lhs, rhs, dimension_numbers, precision=None, preferred_element_type=None):
+        (_, rhs_contracting), _ = dimension_numbers
+        scale = self.param("scale", nn.initializers.ones, scale_shape(rhs.shape, rhs_contracting))
+        return jax.lax.dot_general(
+            lhs,
+            dequantize(rhs, scale, rhs.dtype),
+            dimension_numbers,
+            precision=precision,
+            preferred_element_type=preferred_element_type,
+        )
+
+
+def dense_kwargs(quantization: Quantization | None) -> dict[str, Any]:
+    """Kwargs for `nn.Dense` and `nn.DenseGeneral` to support quantized kernels."""
+    if quantization is None:
+        return {}
+    return {"dot_general_cls": _scaled_dot_general}
+
+
+def attention_kwargs(quantization: Quantization | None) -> dict[str, Any]:
+    """Kwargs for `nn.MultiHeadDotProductAttention` to support quantized kernels."""
+    if quantization is None:
+        return {}
+    return {"qkv_dot_general_cls": _scaled_dot_general, "out_dot_general_cls": _scaled_dot_general}
+
+
+def _scaled_dot_general() -> ScaledDotGeneral:
+    return ScaledDotGeneral(name="kernel" + SCALE_SUFFIX)
+
+
+def quantize(w: np.ndarray, shape: Sequence[int], quantization: Quantization) -> tuple[np.ndarray, np.ndarray]:
+    """Quantizes a weight symmetrically, with one scale per entry of an array of the given (scale) shape."""
+    dtype, max_value = _FORMATS[quantization]
+    w = np.asarray(w, dtype=np.float32)
+    axes = tuple(axis for axis, (dim, scale_dim) in enumerate(zip(w.shape, shape, strict=True)) if scale_dim != dim)
+    scale = np.max(np.abs(w), axis=axes, keepdims=True) / max_value
+    scale = np.where(scale == 0, 1.0, scale).astype(np.float32)
+    q = np.clip(np.round(w / scale), -max_value, max_value).astype(dtype)
+    return q, scale
+
+
+def quantize_params(params: at.Params, spec: at.Params, quantization: Quantization) -> at.Params:
+    """Quantizes the weights of unquantized params.
+
+    Args:
+        params: Params of the unquantized model (pure dict).
+        spec: Params (or their shapes) of the quantized model, e.g. of `nnx.eval_shape(config.create, key)`. Every
+            scale param selects the weight to quantize.
+        quantization: The integer format.
+
+    Returns:
+        The params of the quantized model. Params other than the quantized weights are passed through.
+    """
+    flat_params = traverse_util.flatten_dict(params)
+    flat_spec = traverse_util.flatten_dict(spec)
+    for path, scale in flat_spec.items():
+        if (weight_path := _scaled_weight(path)) is None:
+            continue
+        if weight_path not in flat_params:
+            raise ValueError(f"Missing weight {'/'.join(weight_path)} for scale {'/'.join(path)}")
+        flat_params[weight_path], flat_params[path] = quantize(flat_params[weight_path], scale.shape, quantization)
+    return traverse_util.unflatten_dict(flat_params)
+
+
+def _scaled_weight(path: tuple[str, ...]) -> tuple[str, ...] | None:
+    """Path of the weight that the param at `path` scales, or None if it is not a scale."""
+    *parent, name = path
+    if name.endswith(SCALE_SUFFIX):
+        return (*parent, name.removesuffix(SCALE_SUFFIX))
+    if name == "scale" and parent and parent[-1].endswith(SCALE_SUFFIX):
+        return (*parent[:-1], parent[-1].removesuffix(SCALE_SUFFIX))
+    return None
@@ -0,0 +1,77 @@
+import flax.linen as nn
+import jax
+import jax.numpy as jnp
+import numpy as np
+import pytest
+
+import openpi.models.lora as lora
+import openpi.models.quantization as quantization
+import openpi.models.siglip as siglip
+
+
+def _quantized_params(module: nn.Module, quantized_module: nn.Module, q: quantization.Quantization, *args):
+    key = jax.random.key(0)
+    params = jax.tree.map(np.asarray, module.init(key, *args)["params"])
+    spec = quantized_module.init(key, *args)["params"]
+    return params, {"params": quantization.quantize_params(params, spec, q)}
+
+
+def test_einsum_contracting_axes():
+    assert quantization.einsum_contracting_axes("BSD,3KDH->3BSKH") == (2,)
+    assert quantization.einsum_contracting_axes("BTNH,NHD->BTD") == (0, 1)
+    assert quantization.scale_shape((3, 8, 32, 4), (2,)) == (3, 8, 1, 4)
+
+
+@pytest.mark.parametrize(("q", "max_value"), [("int8", 127), ("int4", 7)])
+def test_quantize(q: quantization.Quantization, max_value: int):
+    w = np.random.randn(4, 16, 8).astype(np.float32)
+    qw, scale = quantization.quantize(w, (4, 1, 8), q)
+
+    assert qw.dtype == jnp.dtype(q)
+    assert scale.shape == (4, 1, 8)
+    assert np.abs(qw.astype(np.int32)).max() == max_value
+    # Rounding errors are at most half a quantization step.
+    assert np.all(np.abs(qw.astype(np.float32) * scale - w) <= scale / 2 + 1e-6)
+
+
+def test_quantized_einsum():
+    shape = (3, 8, 32, 4)  # (3KDH)
+    x = jax.random.normal(jax.random.key(1), (8, 64, 32))  # (BSD)
+    eqn = "BSD,3KDH->3BSKH"
+
+    einsum = lora.Einsum(shape, init_fn=nn.initializers.lecun_normal())
+    quantized_einsum = lora.Einsum(shape, quantization="int8")
+    params, quantized_params = _quantized_params(einsum, quantized_einsum, "int8", eqn, x)
+
+    assert quantized_params["params"]["w"].dtype == jnp.int8
+    assert quantized_params["params"]["w_scale"].shape == (3, 8, 1, 4)
+    expected = einsum.apply({"params": params}, eqn, x)
+    np.testing.assert_allclose(quantized_einsum.apply(quantized_params, eqn, x), expected, atol=0.05)
+
+
+def test_quantized_ffn():
+    x = jax.random.normal(jax.random.key(1), (2, 16, 8))
+    ffn = lora.FeedForward(features=8, hidden_dim=32)
+    quantized_ffn = lora.FeedForward(features=8, hidden_dim=32, quantization="int8")
+    params, quantized_params = _quantized_params(ffn, quantized_ffn, "int8", x)
+
+    assert quantized_params["params"]["gating_einsum_scale"].shape == (2, 1, 32)
+    assert quantized_params["params"]["linear_scale"].shape == (1, 8)
+    expected = ffn.apply({"params": params}, x)
+    np.testing.assert_allclose(quantized_ffn.apply(quantized_params, x), expected, atol=0.05)
+
+
+def test_quantized_siglip_block():
+    x = jax.random.normal(jax.random.key(1), (2, 16, 32))
+    block = siglip.Encoder1DBlock(mlp_dim=64, num_heads=4)
+    quantized_block = siglip.Encoder1DBlock(mlp_dim=64, num_heads=4, quantization="int8")
+    params, quantized_params = _quantized_params(block, quantized_block, "int8", x)
+
+    attention = quantized_params["params"]["MultiHeadDotProductAttention_0"]
+    assert attention["query"]["kernel"].dtype == jnp.int8
+    assert attention["query"]["kernel_scale"]["scale"].shape == (1, 4, 8)
+    assert attention["out"]["kernel_scale"]["scale"].shape == (1, 1, 32)
+    assert quantized_params["params"]["MlpBlock_0"]["Dense_0"]["kernel_scale"]["scale"].shape == (1, 64)
+    expected, _ = block.apply({"params": params}, x)
+    actual, _ = quantized_block.apply(quantized_params, x)
+    np.testing.assert_allclose(actual, expected, atol=0.05)
@@ -0,0 +1,109 @@
+"""Integrators for sampling from flow matching models.
+
+Samplers integrate a velocity field from t=1 (noise) to t=0 (the target distribution), following the convention of
+`Pi0.sample_actions`. Every velocity evaluation is a full forward pass of the action expert, so the samplers trade the
+number of evaluations against accuracy:
+
+- "euler": `num_steps` Euler steps, one evaluation each. This is what pi0 was trained and evaluated with (10 steps).
+- "heun": `num_steps` Heun steps (second order), two evaluations each.
+- "adaptive": Euler steps of size 1/`num_steps` until the velocity stops changing, then a single Euler step to t=0.
+"""
+
+from collections.abc import Callable
+from typing import Literal, TypeAlias
+
+import jax
+import jax.numpy as jnp
+
+from openpi.shared import array_typing as at
+
+Sampler: TypeAlias = Literal["euler", "heun", "adaptive"]
+
+# Maps (x_t, time) to the velocity at x_t. `time` is a scalar.
+VelocityFn: TypeAlias = Callable[
+    [at.Float[at.Array, "b ah ad"], at.Float[at.ArrayLike, ""]], at.Float[at.Array, "b ah ad"]
+]
+
+
+def euler(velocity_fn: VelocityFn, noise: at.Float[at.Array, "b ah ad"], *, num_steps: int | at.Int[at.Array, ""]):
+    dt = -1.0 / num_steps
+
+    def step(carry):
+        x_t, time = carry
+        return x_t + dt * velocity_fn(x_t, time), time + dt
+
+    def cond(carry):
+        _, time = carry
+        # robust to floating-point error
+        return time >= -dt / 2
+
+    x_0, _ = jax.lax.while_loop(cond, step, (noise, 1.0))
+    return x_0
+
+
+def heun(velocity_fn: VelocityFn, noise: at.Float[at.Array, "b ah ad"], *, num_steps: int | at.Int[at.Array, ""]):
+    dt = -1.0 / num_steps
+
+    def step(carry):
+        x_t, time = carry
+        v_t = velocity_fn(x_t, time)
+        # correct the Euler prediction with the velocity at its end point
+        v_next = velocity_fn(x_t + dt * v_t, time + dt)
+        return x_t + dt * (v_t + v_next) / 2, time + dt
+
+    def cond(carry):
+        _, time = carry
+        return time >= -dt / 2
+
+    x_0, _ = jax.lax.while_loop(cond, step, (noise, 1.0))
+    return x_0
+
+
+def adaptive(
+    velocity_fn: VelocityFn,
+    noise: at.Float[at.Array, "b ah ad"],
+    *,
+    num_steps: int | at.Int[at.Array, ""],
+    tolerance: float | at.Float[at.Array, ""],
+):
+    """Euler sampling that exits early once the flow is straight.
+
+    Along a straight path the velocity is constant and a single Euler step to t=0 is exact. Once the RMS change of the
+    velocity between two consecutive steps drops below `tolerance` for every batch element, the remaining steps are
+    collapsed into one. Uses between 2 and `num_steps` velocity evaluations.
+    """
+    dt = -1.0 / num_steps
+
+    def step(carry):
+        x_t, time, v_prev = carry
+        v_t = velocity_fn(x_t, time)
+        update = jnp.sqrt(jnp.mean(jnp.square(v_t - v_prev), axis=(-2, -1)))
+        step_dt = jnp.where(jnp.all(update < tolerance), -time, dt)
+        return x_t + step_dt * v_t, time + step_dt, v_t
+
+    def cond(carry):
+        _, time, _ = carry
+        return time >= -dt / 2
+
+    # the first step never exits, there is no previous velocity to compare with
+    init = (noise, jnp.asarray(1.0, dtype=jnp.float32), jnp.full_like(noise, jnp.inf))
+    x_0, _, _ = jax.lax.while_loop(cond, step, init)
+    return x_0
+
+
+def sample(
+    sampler: Sampler,
+    velocity_fn: VelocityFn,
+    noise: at.Float[at.Array, "b ah ad"],
+    *,
+    num_steps: int | at.Int[at.Array, ""],
+    tolerance: float | at.Float[at.Array, ""],
+) -> at.Float[at.Array, "b ah ad"]:
+    """Integrates `velocity_fn` from `noise` at t=1 to t=0 with the given sampler."""
+    if sampler == "euler":
+        return euler(velocity_fn, noise, num_steps=num_steps)
+    if sampler == "heun":
+        return heun(velocity_fn, noise, num_steps=num_steps)
+    if sampler == "adaptive":
+        return adaptive(velocity_fn, noise, num_steps=num_steps, tolerance=tolerance)
+    raise ValueError(f"Unknown sampler: {sampler}")
@@ -0,0 +1,57 @@
+import jax
+import jax.numpy as jnp
+import numpy as np
+import pytest
+
+from openpi.models import sampling
+
+
+def _straight_flow(velocity):
+    # Constant velocity, i.e. a straight path
+    return lambda x_t, time: jnp.broadcast_to(velocity, x_t.shape)
+
+
+def _curved_flow(x_t, time):
+    # dx/dt = -x, exact solution x_0 = x_1 * e
+    return -x_t
+
+
+@pytest.mark.parametrize("sampler", ["euler", "heun", "adaptive"])
+def test_straight_flow(sampler: sampling.Sampler):
+    noise = jax.random.normal(jax.random.key(0), (2, 5, 3))
+    target = jnp.ones_like(noise)
+
+    velocity_fn = _straight_flow(noise - target)
+
+    x_0 = jax.jit(lambda x: sampling.sample(sampler, velocity_fn, x, num_steps=4, tolerance=1e-3))(noise)
+    np.testing.assert_allclose(x_0, target, atol=1e-5)
+
+
+def test_heun_more_accurate_than_euler():
+    noise = jax.random.normal(jax.random.key(0), (2, 5, 3))
+    expected = noise * np.e
+
+    euler_error = jnp.max(jnp.abs(sampling.euler(_curved_flow, noise, num_steps=5) - expected))
+    heun_error = jnp.max(jnp.abs(sampling.heun(_curved_flow, noise, num_steps=5) - expected))
+    assert heun_error < euler_error / 5
+
+
+def test_adaptive_exits_early():
+    noise = jax.random.normal(jax.random.key(0), (2, 5, 3))
+    calls = []
+
+    def velocity_fn(x_t, time):
+        jax.debug.callback(lambda: calls.append(None))
+        return _straight_flow(noise)(x_t, time)
+
+    sampling.adaptive(velocity_fn, noise, num_steps=10, tolerance=1e-3)
+    assert len(calls) == 2
+
+    # Without a straight flow it takes all steps and matches Euler.
+    x_0 = sampling.adaptive(_curved_flow, noise, num_steps=10, tolerance=1e-6)
+    np.testing.assert_allclose(x_0, sampling.euler(_curved_flow, noise, num_steps=10), atol=1e-5)
+
+
+def test_unknown_sampler():
+    with pytest.raises(ValueError, match="Unknown sampler"):
+        sampling.sample("rk4", _curved_flow, jnp.zeros((1, 1, 1)), num_steps=1, tolerance=0.0)  # type: ignore
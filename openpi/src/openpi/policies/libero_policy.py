@@ -8,12 +8,12 @@ from openpi.models import model as _model
 
 
 def make_libero_example() -> dict:
-    """Creates a random input example for the Libero policy."""
+    """Creates a random input example for the Libero policy (UAV inputs: current view, reference image, xyz yaw)."""
     return {
-        "observation/state": np.random.rand(8),
+        "observation/state": np.random.rand(4).astype(np.float32),
         "observation/image": np.random.randint(256, size=(224, 224, 3), dtype=np.uint8),
-        "observation/wrist_image": np.random.randint(256, size=(224, 224, 3), dtype=np.uint8),
-        "prompt": "do something",
+        "observation/ref_image": np.random.randint(256, size=(224, 224, 3), dtype=np.uint8),
+        "task": "do something",
     }
 
 
@@ -98,6 +98,11 @@ class LiberoInputs(transforms.DataTransformFn):
         if "task" in data:
             inputs["prompt"] = data["task"]
 
+        # Prompt tokens computed by the caller (once per episode during inference) are passed through as is.
+        for key in ("tokenized_prompt", "tokenized_prompt_mask"):
+            if key in data:
+                inputs[key] = data[key]
+
         return inputs
 
 
@@ -1,4 +1,5 @@
 from collections.abc import Sequence
+import hashlib
 import logging
 import pathlib
 import time
@@ -14,6 +15,7 @@ from typing_extensions import override
 
 from openpi import transforms as _transforms
 from openpi.models import model as _model
+from openpi.shared import aot
 from openpi.shared import array_typing as at
 from openpi.shared import nnx_utils
 
@@ -30,27 +32,64 @@ class Policy(BasePolicy):
         output_transforms: Sequence[_transforms.DataTransformFn] = (),
         sample_kwargs: dict[str, Any] | None = None,
         metadata: dict[str, Any] | None = None,
+        static_images: Sequence[str] = (),
+        action_steps: Sequence[int] | None = None,
+        action_dims: int | None = None,
+        executable_dir: pathlib.Path | str | None = None,
     ):
-        self._sample_actions = nnx_utils.module_jit(model.sample_actions)
+        self._sample_kwargs = sample_kwargs or {}
+        # String options (e.g. the pi0 sampler) select what gets traced, the rest are passed as traced values.
+        static_argnames = [name for name, value in self._sample_kwargs.items() if isinstance(value, str)]
+        self._sample_actions = nnx_utils.module_jit(model.sample_actions, static_argnames=static_argnames)
+        if executable_dir is not None:
+            # Use the executables `export_executable` compiled ahead of time, if there is one for the inputs.
+            self._sample_actions = aot.ExecutableStore(
+                self._sample_actions, executable_dir, name="sample_actions", static_argnames=static_argnames
+            )
         self._input_transform = _transforms.compose(transforms)
         self._output_transform = _transforms.compose(output_transforms)
         self._rng = rng or jax.random.key(0)
-        self._sample_kwargs = sample_kwargs or {}
         self._metadata = metadata or {}
 
+        # Model input images that rarely change between calls (e.g. a reference image that is fixed for a whole
+        # episode). Their embeddings are reused for as long as the images stay the same.
+        self._static_images = tuple(static_images)
+        if self._static_images:
+            if not hasattr(model, "embed_images"):
+                raise ValueError(f"{type(model).__name__} does not support static images.")
+            self._embed_images = nnx_utils.module_jit(model.embed_images, static_argnames="names")
+        self._image_tokens_key: tuple | None = None
+        self._image_tokens: dict[str, jax.Array] | None = None
+
+        # Parts of the action chunk the caller uses: the chunk steps and the leading action dimensions. The rest is
+        # dropped on the device, before the transfer to the host and the output transforms.
+        self._action_steps = None if action_steps is None else np.asarray(action_steps, dtype=np.int32)
+        if self._action_steps is not None and not np.all(
+            (self._action_steps >= 0) & (self._action_steps < model.action_horizon)
+        ):
+            raise ValueError(f"Action steps {action_steps} out of range for action horizon {model.action_horizon}.")
+        self._action_dims = action_dims
+
     @override
     def infer(self, obs: dict) -> dict:  # type: ignore[misc]
         # Make a copy since transformations may modify the inputs in place.
         inputs = jax.tree.map(lambda x: x, obs)
         inputs = self._input_transform(inputs)
+        static_key = self._static_key(inputs)
+        self._drop_masked_images([inputs])
         # Make a batch and convert to jax.Array.
         inputs = jax.tree.map(lambda x: jnp.asarray(x)[np.newaxis, ...], inputs)
 
         start_time = time.monotonic()
         self._rng, sample_rng = jax.random.split(self._rng)
+        observation = _model.Observation.from_dict(inputs)
         outputs = {
             "state": inputs["state"],
-            "actions": self._sample_actions(sample_rng, _model.Observation.from_dict(inputs), **self._sample_kwargs),
+            "actions": self._trim_actions(
+                self._sample_actions(
+                    sample_rng, observation, **self._sample_kwargs, **self._static_kwargs((static_key,), observation)
+                )
+            ),
         }
         # Unbatch and convert to np.ndarray.        # Unbatch and convert to np.ndarray.
         outputs = jax.tree.map(lambda x: np.asarray(x[0, ...]), outputs)
@@ -62,6 +101,95 @@ class Policy(BasePolicy):
         }
         return outputs
 
+    def infer_batch(self, obs_batch: Sequence[dict]) -> list[dict]:
+        """Runs `infer` on several unbatched observations with a single model call.
+
+        The input and output transforms operate on unbatched data, so they are applied per observation; only the
+        model call and the device-to-host transfer are batched. A new batch size triggers a new compilation.
+        """
+        inputs, observation, sample_kwargs = self._prepare_batch(obs_batch)
+
+        start_time = time.monotonic()
+        self._rng, sample_rng = jax.random.split(self._rng)
+        outputs = {
+            "state": inputs["state"],
+            "actions": self._trim_actions(self._sample_actions(sample_rng, observation, **sample_kwargs)),
+        }
+        outputs = jax.tree.map(np.asarray, outputs)
+        model_time = time.monotonic() - start_time
+
+        results = []
+        for i in range(len(obs_batch)):
+            # Unbatch and apply the output transforms.
+            result = self._output_transform(jax.tree.map(lambda x, i=i: x[i, ...], outputs))
+            result["policy_timing"] = {
+                "infer_ms": model_time * 1000,
+            }
+            results.append(result)
+        return results
+
+    def export_executable(self, obs_batch: Sequence[dict]) -> pathlib.Path:
+        """Compiles the model call for batches like `obs_batch` ahead of time and saves it to `executable_dir`.
+
+        Later policies created with the same model, options and `executable_dir` load the executable instead of
+        tracing and compiling on their first call with such a batch (or a single observation for a batch of one).
+        """
+        if not isinstance(self._sample_actions, aot.ExecutableStore):
+            raise ValueError("The policy was created without an executable_dir.")
+        _, observation, sample_kwargs = self._prepare_batch(obs_batch)
+        return self._sample_actions.export(self._rng, observation, **sample_kwargs)
+
+    def _prepare_batch(self, obs_batch: Sequence[dict]) -> tuple[dict, _model.Observation, dict[str, Any]]:
+        """Transforms and stacks unbatched observations, returns the inputs, the observation and the sample kwargs."""
+        # Make a copy since transformations may modify the inputs in place.
+        inputs = [self._input_transform(jax.tree.map(lambda x: x, obs)) for obs in obs_batch]
+        static_key = tuple(self._static_key(x) for x in inputs)
+        self._drop_masked_images(inputs)
+        # Stack into a batch and convert to jax.Array.
+        inputs = jax.tree.map(lambda *xs: jnp.asarray(np.stack(xs)), *inputs)
+        observation = _model.Observation.from_dict(inputs)
+        return inputs, observation, {**self._sample_kwargs, **self._static_kwargs(static_key, observation)}
+
+    @override
+    def reset(self) -> None:
+        self._image_tokens_key = None
+        self._image_tokens = None
+
+    def _trim_actions(self, actions: jax.Array) -> jax.Array:
+        if self._action_steps is not None:
+            actions = actions[:, self._action_steps]
+        if self._action_dims is not None:
+            actions = actions[..., : self._action_dims]
+        return actions
+
+    def _static_key(self, inputs: dict) -> tuple:
+        """Identifies the static images of one transformed (unbatched) observation by their content."""
+        return tuple(
+            hashlib.blake2b(np.ascontiguousarray(inputs["image"][name]).tobytes(), digest_size=16).digest()
+            for name in self._static_images
+        )
+
+    def _drop_masked_images(self, inputs: Sequence[dict]) -> None:
+        """Removes the image slots that are masked out in all of the transformed observations (e.g. a camera a robot
+        does not have), so the model skips them instead of embedding them only to mask them out of attention. Every
+        distinct set of remaining slots is compiled once.
+        """
+        for name in list(inputs[0]["image_mask"]):
+            if not any(np.any(x["image_mask"][name]) for x in inputs):
+                for x in inputs:
+                    del x["image"][name]
+                    del x["image_mask"][name]
+
+    def _static_kwargs(self, key: tuple, observation: _model.Observation) -> dict[str, Any]:
+        """Extra `sample_actions` kwargs with the embeddings of the static images, embedded again only on change."""
+        if not self._static_images:
+            return {}
+        if key != self._image_tokens_key:
+            names = tuple(name for name in self._static_images if name in observation.images)
+            self._image_tokens = self._embed_images(observation, names=names)
+            self._image_tokens_key = key
+        return {"image_tokens": self._image_tokens}
+
     @property
     def metadata(self) -> dict[str, Any]:
         return self._metadata
@@ -81,7 +209,20 @@ class PolicyRecorder(_base_policy.BasePolicy):
     @override
     def infer(self, obs: dict) -> dict:  # type: ignore[misc]
         results = self._policy.infer(obs)
+        self._record(obs, results)
+        return results
 
+    def infer_batch(self, obs_batch: Sequence[dict]) -> list[dict]:
+        results = self._policy.infer_batch(obs_batch)  # type: ignore[attr-defined]
+        for obs, result in zip(obs_batch, results, strict=True):
+            self._record(obs, result)
+        return results
+
+    @property
+    def metadata(self) -> dict[str, Any]:
+        return self._policy.metadata  # type: ignore[attr-defined]
+
+    def _record(self, obs: dict, results: dict) -> None:
         data = {"inputs": obs, "outputs": results}
         data = flax.traverse_util.flatten_dict(data, sep="/")
 
@@ -89,4 +230,3 @@ class PolicyRecorder(_base_policy.BasePolicy):
         self._record_step += 1
 
         np.save(output_path, np.asarray(data))
-        return results
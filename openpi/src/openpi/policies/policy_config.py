@@ -7,6 +7,7 @@ from typing import Any
 import jax.numpy as jnp
 
 import openpi.models.model as _model
+import openpi.models.pi0 as _pi0
 import openpi.policies.policy as _policy
 import openpi.shared.download as download
 from openpi.training import checkpoints as _checkpoints
@@ -35,6 +36,13 @@ def create_trained_policy(
     sample_kwargs: dict[str, Any] | None = None,
     default_prompt: str | None = None,
     norm_stats: dict[str, transforms.NormStats] | None = None,
+    static_images: Sequence[str] = (),
+    action_steps: Sequence[int] | None = None,
+    action_dims: int | None = None,
+    use_executables: bool = False,
+    params_dtype: jnp.dtype | None = jnp.bfloat16,
+    stream_params: bool = False,
+    merge_lora: bool = False,
 ) -> _policy.Policy:
     """Create a policy from a trained checkpoint.
 
@@ -48,12 +56,33 @@ def create_trained_policy(
             data if it doesn't already exist.
         norm_stats: The norm stats to use for the policy. If not provided, the norm stats will be loaded
             from the checkpoint directory.
+        static_images: Names of model input images that stay the same for many calls (e.g. for a whole episode).
+            Their embeddings are computed once and reused until the images change.
+        action_steps: If provided, only these steps of the action chunk are returned.
+        action_dims: If provided, only this many leading action dimensions are returned. Must cover the dimensions
+            the output transforms use.
+        use_executables: If true, the model call uses the executables exported with `Policy.export_executable` to
+            the "executables" directory of the checkpoint, if there is one for the inputs.
+        params_dtype: The dtype to load the params as. If None, the dtype of the checkpoint is kept.
+        stream_params: If true, the params are streamed to the device one array at a time (see
+            `openpi.models.model.stream_params`) instead of being restored on the host first. Only works with
+            checkpoints in the default orbax format (OCDBT).
+        merge_lora: If true, the LoRA adapters of a pi0 model are folded into the base weights, so that inference
+            skips the low rank matmuls. Also required for checkpoints merged with `scripts/merge_lora_checkpoint.py`.
     """
     repack_transforms = repack_transforms or transforms.Group()
     checkpoint_dir = download.maybe_download(str(checkpoint_dir))
 
     logging.info("Loading model...")
-    model = train_config.model.load(_model.restore_params(checkpoint_dir / "params", dtype=jnp.bfloat16))
+    if stream_params:
+        params = _model.stream_params(checkpoint_dir / "params", dtype=params_dtype)
+    else:
+        params = _model.restore_params(checkpoint_dir / "params", dtype=params_dtype)
+    model_config = train_config.model
+    if merge_lora and isinstance(model_config, _pi0.Pi0Config):
+        params = model_config.merge_lora_params(params)
+        model_config = model_config.without_lora()
+    model = model_config.load(params)
 
     data_config = train_config.data.create(train_config.assets_dirs, train_config.model)
     if norm_stats is None:
@@ -63,6 +92,11 @@ def create_trained_policy(
             raise ValueError("Asset id is required to load norm stats.")
         norm_stats = _checkpoints.load_norm_stats(checkpoint_dir / "assets", data_config.asset_id)
 
+    output_norm_stats = norm_stats
+    if action_dims is not None:
+        # The policy only returns the leading action dimensions, unnormalize them with the matching stats.
+        output_norm_stats = {**norm_stats, "actions": _leading_dims(norm_stats["actions"], action_dims)}
+
     return _policy.Policy(
         model,
         transforms=[
@@ -74,10 +108,26 @@ def create_trained_policy(
         ],
         output_transforms=[
             *data_config.model_transforms.outputs,
-            transforms.Unnormalize(norm_stats, use_quantiles=data_config.use_quantile_norm),
+            transforms.Unnormalize(output_norm_stats, use_quantiles=data_config.use_quantile_norm),
             *data_config.data_transforms.outputs,
             *repack_transforms.outputs,
         ],
         sample_kwargs=sample_kwargs,
         metadata=train_config.policy_metadata,
+        static_images=static_images,
+        action_steps=action_steps,
+        action_dims=action_dims,
+        executable_dir=checkpoint_dir / "executables" if use_executables else None,
+    )
+
+
+def _leading_dims(stats: transforms.NormStats, dims: int) -> transforms.NormStats:
+    """Returns the norm stats of the leading `dims` dimensions."""
+    if dims > stats.mean.shape[-1]:
+        raise ValueError(f"Action dims {dims} exceed the {stats.mean.shape[-1]} dimensions of the norm stats.")
+    return transforms.NormStats(
+        mean=stats.mean[..., :dims],
+        std=stats.std[..., :dims],
+        q01=None if stats.q01 is None else stats.q01[..., :dims],
+        q99=None if stats.q99 is None else stats.q99[..., :dims],
     )
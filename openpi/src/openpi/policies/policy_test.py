@@ -1,7 +1,12 @@
+import jax
+import jax.numpy as jnp
+import numpy as np
 from openpi_client import action_chunk_broker
 import pytest
 
+import openpi.models.pi0 as _pi0
 from openpi.policies import aloha_policy
+from openpi.policies import policy as _policy
 from openpi.policies import policy_config as _policy_config
 from openpi.training import config as _config
 
@@ -32,3 +37,100 @@ def test_broker():
     for _ in range(config.model.action_horizon):
         outputs = broker.infer(example)
         assert outputs["actions"].shape == (14,)
+
+
+@pytest.mark.manual
+def test_infer_batch():
+    config = _config.get_config("pi0_aloha_sim")
+    policy = _policy_config.create_trained_policy(config, "gs://openpi-assets/checkpoints/pi0_aloha_sim")
+
+    examples = [aloha_policy.make_aloha_example() for _ in range(3)]
+    results = policy.infer_batch(examples)
+
+    assert len(results) == len(examples)
+    for result in results:
+        assert result["actions"].shape == (config.model.action_horizon, 14)
+
+
+@pytest.mark.manual
+def test_infer_trimmed_actions():
+    config = _config.get_config("pi0_aloha_sim")
+    policy = _policy_config.create_trained_policy(
+        config, "gs://openpi-assets/checkpoints/pi0_aloha_sim", action_steps=[0, 9], action_dims=14
+    )
+
+    results = policy.infer(aloha_policy.make_aloha_example())
+    assert results["actions"].shape == (2, 14)
+
+
+@pytest.fixture(scope="module")
+def dummy_model() -> tuple[_pi0.Pi0Config, _pi0.Pi0]:
+    config = _pi0.Pi0Config(dtype="float32", paligemma_variant="dummy", action_expert_variant="dummy")
+    return config, config.create(jax.random.key(0))
+
+
+@pytest.fixture
+def zero_noise(monkeypatch):
+    # Every example starts from the same noise, so the output does not depend on how the rng is split over a batch.
+    monkeypatch.setattr(jax.random, "normal", lambda key, shape, dtype=jnp.float32: jnp.zeros(shape, dtype))
+
+
+def _dummy_examples(config: _pi0.Pi0Config, num_examples: int) -> list[dict]:
+    """Unbatched model inputs, the policy has no transforms. The states differ so that the examples do."""
+    obs = jax.tree.map(np.asarray, config.fake_obs(num_examples).to_dict())
+    obs["state"] = obs["state"] * np.arange(1, num_examples + 1, dtype=np.float32)[:, None]
+    return [jax.tree.map(lambda x, i=i: x[i], obs) for i in range(num_examples)]
+
+
+def test_infer_batch_matches_infer(dummy_model, zero_noise):
+    config, model = dummy_model
+    policy = _policy.Policy(model, sample_kwargs={"num_steps": 2})
+    examples = _dummy_examples(config, 3)
+
+    results = policy.infer_batch(examples)
+
+    assert len(results) == len(examples)
+    for example, result in zip(examples, results, strict=True):
+        expected = policy.infer(example)
+        assert result["actions"].shape == (config.action_horizon, config.action_dim)
+        np.testing.assert_allclose(result["actions"], expected["actions"], atol=1e-5)
+        np.testing.assert_array_equal(result["state"], example["state"])
+
+
+@pytest.mark.parametrize(
+    ("action_steps", "action_dims", "expected_shape"),
+    [([0, 9, 49], None, (3, 32)), (None, 4, (50, 4)), ([0, 9, 49], 4, (3, 4))],
+)
+def test_infer_trimmed_action_shapes(dummy_model, action_steps, action_dims, expected_shape):
+    config, model = dummy_model
+    policy = _policy.Policy(model, sample_kwargs={"num_steps": 2}, action_steps=action_steps, action_dims=action_dims)
+    examples = _dummy_examples(config, 2)
+
+    assert policy.infer(examples[0])["actions"].shape == expected_shape
+    for result in policy.infer_batch(examples):
+        assert result["actions"].shape == expected_shape
+
+
+def test_infer_trimmed_actions_dummy(dummy_model, zero_noise):
+    config, model = dummy_model
+    full = _policy.Policy(model, sample_kwargs={"num_steps": 2})
+    trimmed = _policy.Policy(model, sample_kwargs={"num_steps": 2}, action_steps=[0, 9], action_dims=4)
+    examples = _dummy_examples(config, 2)
+
+    expected = full.infer(examples[0])["actions"][[0, 9], :4]
+    np.testing.assert_allclose(trimmed.infer(examples[0])["actions"], expected, atol=1e-5)
+    for example, result in zip(examples, trimmed.infer_batch(examples), strict=True):
+        assert result["actions"].shape == (2, 4)
+        np.testing.assert_allclose(result["actions"], full.infer(example)["actions"][[0, 9], :4], atol=1e-5)
+
+
+def test_infer_trimmed_actions_out_of_range(dummy_model):
+    _, model = dummy_model
+    with pytest.raises(ValueError, match="out of range"):
+        _policy.Policy(model, action_steps=[model.action_horizon])
+
+
+def test_policy_recorder_metadata(dummy_model, tmp_path):
+    _, model = dummy_model
+    policy = _policy.PolicyRecorder(_policy.Policy(model, metadata={"name": "dummy"}), str(tmp_path))
+    assert policy.metadata == {"name": "dummy"}
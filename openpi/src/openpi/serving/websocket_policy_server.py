@@ -49,13 +49,20 @@ class WebsocketPolicyServer:
         logger.info(f"Connection from {websocket.remote_address} opened")
         packer = msgpack_numpy.Packer()
 
-        await websocket.send(packer.pack(self._metadata))
+        # Advertise the latest msgpack_numpy protocol. Clients that support it select it with their first message,
+        # older clients send observations right away and keep protocol 1.
+        metadata = {**self._metadata, msgpack_numpy.PROTOCOL_KEY: msgpack_numpy.PROTOCOL_VERSION}
+        await websocket.send(packer.pack(metadata))
+        protocol = 1
 
         prev_total_time = None
         while True:
             try:
                 start_time = time.monotonic()
-                obs = msgpack_numpy.unpackb(await websocket.recv())
+                obs = await _recv(websocket, protocol)
+                if protocol == 1 and _is_protocol_selection(obs):
+                    protocol = min(obs[msgpack_numpy.PROTOCOL_KEY], msgpack_numpy.PROTOCOL_VERSION)
+                    continue
 
                 infer_time = time.monotonic()
                 action = self._policy.infer(obs)
@@ -68,7 +75,7 @@ class WebsocketPolicyServer:
                     # We can only record the last total time since we also want to include the send time.
                     action["server_timing"]["prev_total_ms"] = prev_total_time * 1000
 
-                await websocket.send(packer.pack(action))
+                await _send(websocket, action, protocol, packer)
                 prev_total_time = time.monotonic() - start_time
 
             except websockets.ConnectionClosed:
@@ -83,6 +90,26 @@ class WebsocketPolicyServer:
                 raise
 
 
+async def _recv(websocket: _server.ServerConnection, protocol: int):
+    header = await websocket.recv()
+    if protocol == 1:
+        return msgpack_numpy.unpackb(header)
+    frames = [await websocket.recv() for _ in range(msgpack_numpy.num_frames(header))]
+    return msgpack_numpy.unpack_frames(header, frames)
+
+
+async def _send(websocket: _server.ServerConnection, obj, protocol: int, packer) -> None:
+    if protocol == 1:
+        await websocket.send(packer.pack(obj))
+        return
+    for frame in msgpack_numpy.pack_frames(obj):
+        await websocket.send(frame)
+
+
+def _is_protocol_selection(obj) -> bool:
+    return isinstance(obj, dict) and obj.keys() == {msgpack_numpy.PROTOCOL_KEY}
+
+
 def _health_check(connection: _server.ServerConnection, request: _server.Request) -> _server.Response | None:
     if request.path == "/healthz":
         return connection.respond(http.HTTPStatus.OK, "OK\n")
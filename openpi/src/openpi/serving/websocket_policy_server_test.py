@@ -0,0 +1,78 @@
+import select
+import socket
+import threading
+import time
+
+import numpy as np
+from openpi_client import base_policy as _base_policy
+from openpi_client import msgpack_numpy
+from openpi_client import websocket_client_policy
+import pytest
+import websockets.exceptions
+import websockets.sync.client
+
+from openpi.serving import websocket_policy_server
+
+
+class _EchoPolicy(_base_policy.BasePolicy):
+    def infer(self, obs: dict) -> dict:
+        return {"actions": obs["image"].astype(np.float32) / 255, "state": obs["state"]}
+
+
+@pytest.fixture(scope="module")
+def port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        port = sock.getsockname()[1]
+    server = websocket_policy_server.WebsocketPolicyServer(_EchoPolicy(), "localhost", port, metadata={"name": "echo"})
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    while True:
+        try:
+            socket.create_connection(("localhost", port)).close()
+            return port
+        except ConnectionRefusedError:
+            time.sleep(0.1)
+
+
+def _obs() -> dict:
+    return {"image": np.random.randint(0, 256, (2, 64, 64, 3), dtype=np.uint8), "state": np.arange(4.0)}
+
+
+def _check(obs: dict, result: dict):
+    np.testing.assert_array_equal(result["actions"], obs["image"].astype(np.float32) / 255)
+    np.testing.assert_array_equal(result["state"], obs["state"])
+    assert "infer_ms" in result["server_timing"]
+
+
+def test_client_protocol_2(port: int):
+    policy = websocket_client_policy.WebsocketClientPolicy("localhost", port)
+    assert policy.get_server_metadata() == {"name": "echo"}
+    assert policy._protocol == msgpack_numpy.PROTOCOL_VERSION  # noqa: SLF001
+
+    for _ in range(2):
+        obs = _obs()
+        _check(obs, policy.infer(obs))
+
+
+def test_client_fileno_and_close(port: int):
+    policy = websocket_client_policy.WebsocketClientPolicy("localhost", port)
+    # The server only ever answers requests, nothing is readable before the first one.
+    assert select.select([policy.fileno()], [], [], 0.1)[0] == []
+    obs = _obs()
+    _check(obs, policy.infer(obs))
+
+    policy.close()
+    with pytest.raises(websockets.exceptions.ConnectionClosed):
+        policy.infer(_obs())
+
+
+def test_client_protocol_1(port: int):
+    # Clients without protocol negotiation send protocol 1 messages right after receiving the metadata.
+    with websockets.sync.client.connect(f"ws://localhost:{port}", compression=None, max_size=None) as conn:
+        metadata = msgpack_numpy.unpackb(conn.recv())
+        assert metadata["name"] == "echo"
+
+        for _ in range(2):
+            obs = _obs()
+            conn.send(msgpack_numpy.packb(obs))
+            _check(obs, msgpack_numpy.unpackb(conn.recv()))
@@ -0,0 +1,176 @@
+"""Ahead-of-time compiled executables, serialized to disk.
+
+Tracing and compiling `Pi0.sample_actions` takes minutes, and a restarted inference process pays for it again before its
+first action. `ExecutableStore.export` lowers and compiles a function returned by `nnx_utils.module_jit` for concrete
+arguments and writes the executable to a directory (e.g. next to the checkpoint). A store over the same directory loads
+it in a later process and runs it directly whenever it is called with arguments of the same structure, shapes and
+dtypes, and falls back to the jitted function otherwise.
+
+On CPU, deserialized executables skip the while loops of the flow matching samplers with the default XLA runtime, so
+executables are only used there with XLA_FLAGS=--xla_cpu_use_thunk_runtime=false.
+"""
+
+import collections
+from collections.abc import Callable, Sequence
+import hashlib
+import logging
+import os
+import pathlib
+import pickle
+import time
+from typing import Any
+
+import jax
+from jax.experimental import serialize_executable
+
+from openpi.shared import array_typing as at
+
+logger = logging.getLogger("openpi")
+
+_CACHE_HIT_EVENT = "/jax/compilation_cache/cache_hits"
+_CACHE_MISS_EVENT = "/jax/compilation_cache/cache_misses"
+
+# Persistent compilation cache events recorded by JAX since `enable_compilation_cache` was first called.
+_cache_events: collections.Counter[str] = collections.Counter()
+
+
+def _count_cache_event(event: str, **kwargs) -> None:
+    if event in (_CACHE_HIT_EVENT, _CACHE_MISS_EVENT):
+        _cache_events[event] += 1
+
+
+def enable_compilation_cache(cache_dir: str = "~/.cache/jax") -> None:
+    """Persists the programs XLA compiles across processes (same location as the training script uses).
+
+    Just in time compilations of an `ExecutableStore` then log whether they were served from the cache.
+    """
+    jax.config.update("jax_compilation_cache_dir", str(pathlib.Path(cache_dir).expanduser()))
+    if not _cache_events:
+        # Registered once; the counter is non-empty from here on.
+        _cache_events.update({_CACHE_HIT_EVENT: 0, _CACHE_MISS_EVENT: 0})
+        jax.monitoring.register_event_listener(_count_cache_event)
+
+
+def executables_supported() -> bool:
+    """Whether executables can be serialized and loaded on the default backend."""
+    return jax.default_backend() != "cpu" or "--xla_cpu_use_thunk_runtime=false" in os.environ.get("XLA_FLAGS", "")
+
+
+def _describe(tree: Any) -> str:
+    leaves, treedef = jax.tree.flatten(tree)
+    avals = [jax.core.get_aval(x) for x in leaves]
+    return repr((treedef, [(aval.shape, str(aval.dtype), aval.weak_type) for aval in avals]))
+
+
+class ExecutableStore:
+    """Serialized executables of one jitted module method, keyed by the arguments they were compiled for.
+
+    Args:
+        fn: A function returned by `nnx_utils.module_jit`.
+        directory: Where the executables are stored.
+        name: Prefix of the executable file names.
+        static_argnames: The static argument names `fn` was jitted with.
+    """
+
+    def __init__(
+        self,
+        fn: Callable,
+        directory: pathlib.Path | str,
+        *,
+        name: str,
+        static_argnames: Sequence[str] = (),
+    ):
+        self._fn = fn
+        self._directory = pathlib.Path(directory)
+        self._name = name
+        self._static_argnames = frozenset(static_argnames)
+        # The module state is fixed, describe it only once.
+        self._state_description = _describe(fn.module_state)  # type: ignore[attr-defined]
+        self._executables: dict[str, Callable | None] = {}
+
+    def _split_kwargs(self, kwargs: dict[str, Any]) -> tuple[dict[str, Any], list[tuple[str, str]]]:
+        dynamic = {k: v for k, v in kwargs.items() if k not in self._static_argnames}
+        static = sorted((k, repr(v)) for k, v in kwargs.items() if k in self._static_argnames)
+        return dynamic, static
+
+    def _key(self, args: tuple, kwargs: dict[str, Any]) -> str:
+        dynamic, static = self._split_kwargs(kwargs)
+        description = (
+            self._state_description,
+            _describe((args, dynamic)),
+            static,
+            jax.__version__,
+            [device.device_kind for device in jax.devices()],
+        )
+        return hashlib.sha256(repr(description).encode()).hexdigest()[:16]
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self._directory / f"{self._name}_{key}.xla"
+
+    def export(self, *args, **kwargs) -> pathlib.Path:
+        """Compiles `fn` for the given arguments and saves the executable."""
+        if not executables_supported():
+            raise ValueError("Executables need XLA_FLAGS=--xla_cpu_use_thunk_runtime=false on CPU.")
+        key = self._key(args, kwargs)
+        start = time.monotonic()
+        # Lowering (and loading) unflattens dataclasses such as `Observation` with placeholder leaves, which fail their
+        # typecheck.
+        with at.disable_typechecking():
+            compiled = self._fn.lower(*args, **kwargs).compile()  # type: ignore[attr-defined]
+        compile_time = time.monotonic() - start
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(pickle.dumps(serialize_executable.serialize(compiled)))
+        tmp_path.replace(path)
+        logger.info(f"Exported {path} (compiled in {compile_time:.1f}s)")
+
+        self._executables[key] = compiled
+        return path
+
+    def _load(self, key: str) -> Callable | None:
+        if not executables_supported():
+            logger.info(f"Executables are not supported on CPU, compiling {self._name} just in time")
+            return None
+        path = self._path(key)
+        if not path.exists():
+            logger.info(f"No executable {path.name} in {self._directory}, compiling {self._name} just in time")
+            return None
+        start = time.monotonic()
+        try:
+            with at.disable_typechecking():
+                compiled = serialize_executable.deserialize_and_load(*pickle.loads(path.read_bytes()))
+        except Exception:
+            logger.warning(f"Unable to load {path}, compiling {self._name} just in time", exc_info=True)
+            return None
+        logger.info(f"Loaded executable {path.name} in {time.monotonic() - start:.1f}s")
+        return compiled
+
+    def __call__(self, *args, **kwargs):
+        key = self._key(args, kwargs)
+        if key not in self._executables:
+            self._executables[key] = self._load(key)
+            if self._executables[key] is None:
+                return self._compile_just_in_time(*args, **kwargs)
+        compiled = self._executables[key]
+        if compiled is None:
+            return self._fn(*args, **kwargs)
+        dynamic, _ = self._split_kwargs(kwargs)
+        return compiled(self._fn.module_state, *args, **dynamic)  # type: ignore[attr-defined]
+
+    def _compile_just_in_time(self, *args, **kwargs):
+        """Runs the first jitted call for new arguments and logs how long compiling it took."""
+        hits, misses = _cache_events[_CACHE_HIT_EVENT], _cache_events[_CACHE_MISS_EVENT]
+        start = time.monotonic()
+        # Dispatch is asynchronous, so this measures tracing and compiling (or the cache lookup), not running.
+        out = self._fn(*args, **kwargs)
+        compile_time = time.monotonic() - start
+        if _cache_events:
+            hits = _cache_events[_CACHE_HIT_EVENT] - hits
+            misses = _cache_events[_CACHE_MISS_EVENT] - misses
+            cache = f"compilation cache: {hits} hits, {misses} misses"
+        else:
+            cache = "compilation cache disabled"
+        logger.info(f"Compiled {self._name} just in time in {compile_time:.1f}s ({cache})")
+        return out
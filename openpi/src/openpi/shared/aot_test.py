@@ -0,0 +1,82 @@
+import pathlib
+
+import flax.nnx as nnx
+import jax
+import jax.numpy as jnp
+import numpy as np
+import pytest
+
+from openpi.shared import aot
+from openpi.shared import nnx_utils
+
+requires_executables = pytest.mark.skipif(
+    not aot.executables_supported(), reason="Executables are not supported on the default backend."
+)
+
+
+class _Model(nnx.Module):
+    def __init__(self, rngs: nnx.Rngs):
+        self.linear = nnx.Linear(3, 2, rngs=rngs)
+
+    def __call__(self, x: jax.Array, *, mode: str = "linear", scale: float = 1.0, num_steps: int = 3) -> jax.Array:
+        y = self.linear(x) * scale
+        if mode == "tanh":
+            # A loop with a traced trip count, like the samplers use.
+            return jax.lax.fori_loop(0, num_steps, lambda _, y: jnp.tanh(y), y)
+        return y
+
+
+def _store(model: _Model, directory: pathlib.Path) -> aot.ExecutableStore:
+    fn = nnx_utils.module_jit(model.__call__, static_argnames=["mode"])
+    return aot.ExecutableStore(fn, directory, name="model", static_argnames=["mode"])
+
+
+def test_missing_executable(tmp_path: pathlib.Path):
+    model = _Model(nnx.Rngs(0))
+    x = jnp.ones((4, 3))
+    np.testing.assert_allclose(_store(model, tmp_path)(x, mode="tanh"), model(x, mode="tanh"), atol=1e-6)
+
+
+@requires_executables
+def test_export_and_load(tmp_path: pathlib.Path):
+    model = _Model(nnx.Rngs(0))
+    x = jnp.ones((4, 3))
+    expected = model(x, mode="tanh", scale=2.0, num_steps=3)
+
+    path = _store(model, tmp_path).export(x, mode="tanh", scale=2.0, num_steps=3)
+    assert path.exists()
+
+    # A new store (e.g. in a restarted process) loads the executable instead of compiling.
+    store = _store(model, tmp_path)
+    np.testing.assert_allclose(store(x, mode="tanh", scale=2.0, num_steps=3), expected, atol=1e-6)
+    assert store._executables  # noqa: SLF001
+    assert all(compiled is not None for compiled in store._executables.values())  # noqa: SLF001
+
+    # The traced arguments can change, only their shapes and dtypes are fixed.
+    np.testing.assert_allclose(
+        store(x, mode="tanh", scale=0.5, num_steps=1), model(x, mode="tanh", scale=0.5, num_steps=1), atol=1e-6
+    )
+
+
+@requires_executables
+def test_fallback_to_jit(tmp_path: pathlib.Path):
+    model = _Model(nnx.Rngs(0))
+    store = _store(model, tmp_path)
+    store.export(jnp.ones((4, 3)), mode="tanh")
+
+    # Other shapes and static arguments are compiled just in time.
+    x = jnp.ones((2, 3))
+    np.testing.assert_allclose(store(x, mode="tanh"), model(x, mode="tanh"), atol=1e-6)
+    np.testing.assert_allclose(store(x, mode="linear"), model(x, mode="linear"), atol=1e-6)
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_logs_just_in_time_compilation(tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture):
+    model = _Model(nnx.Rngs(1))
+    store = _store(model, tmp_path)
+    x = jnp.ones((5, 3))
+
+    with caplog.at_level("INFO", logger="openpi"):
+        store(x, mode="tanh")
+        store(x, mode="tanh")
+    assert sum("Compiled model just in time" in record.message for record in caplog.records) == 1
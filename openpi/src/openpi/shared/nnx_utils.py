@@ -40,6 +40,10 @@ def module_jit(meth: Callable[P, R], *jit_args, **jit_kwargs) -> Callable[P, R]:
     def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
         return jitted_fn(state, *args, **kwargs)
 
+    # Ahead-of-time compilation (see `openpi.shared.aot`): the lowered and compiled function take the frozen module
+    # state as their first argument.
+    wrapper.lower = functools.partial(jitted_fn.lower, state)  # type: ignore[attr-defined]
+    wrapper.module_state = state  # type: ignore[attr-defined]
     return wrapper
 
 
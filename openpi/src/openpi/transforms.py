@@ -242,6 +242,11 @@ class TokenizePrompt(DataTransformFn):
     tokenizer: _tokenizer.PaligemmaTokenizer
 
     def __call__(self, data: DataDict) -> DataDict:
+        if "tokenized_prompt" in data:
+            # Already tokenized by the caller, e.g. once per episode during inference.
+            data.pop("prompt", None)
+            return data
+
         if (prompt := data.pop("prompt", None)) is None:
             raise ValueError("Prompt is required")
 
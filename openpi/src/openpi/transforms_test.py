@@ -62,6 +62,14 @@ def test_absolute_actions_noop():
     assert transform(item) is item
 
 
+def test_unnormalize_dims_mismatch():
+    stats = {"actions": _transforms.NormStats(mean=np.array([1.0, 2.0, 3.0]), std=np.array([2.0, 2.0, 2.0]))}
+    item = {"actions": np.array([[1.0, 1.0], [0.0, -1.0]])}
+
+    with pytest.raises(ValueError, match="broadcast"):
+        _transforms.Unnormalize(stats)(item)
+
+
 def test_make_bool_mask():
     assert _transforms.make_bool_mask(2, -2, 2) == (True, True, False, False, True, True)
     assert _transforms.make_bool_mask(2, 0, 2) == (True, True, True, True)
@@ -78,6 +86,17 @@ def test_tokenize_prompt():
     assert np.allclose(tok_mask, data["tokenized_prompt_mask"])
 
 
+def test_tokenize_prompt_pretokenized():
+    transform = _transforms.TokenizePrompt(_tokenizer.PaligemmaTokenizer(max_len=12))
+
+    tokens, token_masks = np.arange(12), np.ones(12, dtype=bool)
+    data = transform({"prompt": "Hello, world!", "tokenized_prompt": tokens, "tokenized_prompt_mask": token_masks})
+
+    assert "prompt" not in data
+    assert data["tokenized_prompt"] is tokens
+    assert data["tokenized_prompt_mask"] is token_masks
+
+
 def test_tokenize_no_prompt():
     transform = _transforms.TokenizePrompt(_tokenizer.PaligemmaTokenizer())
 